@@ -0,0 +1,19 @@
+"""
+ASGI config for document project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+import dotenv
+from django.core.asgi import get_asgi_application
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+dotenv.read_dotenv(os.path.join(BASE_DIR, '.env'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backoffice.settings.base')
+
+application = get_asgi_application()
@@ -1,19 +1,28 @@
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.db import connections, transaction
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import APIException
 from rest_framework.views import APIView
 
 
-class CorsAllowOriginMixin(APIView):
+class CorsHeadersMixin:
     ACCESS_CONTROL_ALLOW_ORIGIN = "Access-Control-Allow-Origin"
     ACCESS_CONTROL_ALLOW_METHODS = "Access-Control-Allow-Methods"
     ACCESS_CONTROL_ALLOW_HEADERS = "Access-Control-Allow-Headers"
+    ACCESS_CONTROL_EXPOSE_HEADERS = "Access-Control-Expose-Headers"
 
-    def finalize_response(self, request, response, *args, **kwargs):
-        response = super().finalize_response(request, response, *args, **kwargs)
+    cors_allowed_methods = ["GET", "POST"]
+    cors_allowed_headers = ["Content-Type"]
+    cors_exposed_headers = []
 
-        response[self.ACCESS_CONTROL_ALLOW_METHODS] = "GET, POST"
-        response[self.ACCESS_CONTROL_ALLOW_HEADERS] = "Content-Type"
+    def add_cors_headers(self, request, response):
+        response[self.ACCESS_CONTROL_ALLOW_METHODS] = ", ".join(self.cors_allowed_methods)
+        response[self.ACCESS_CONTROL_ALLOW_HEADERS] = ", ".join(self.cors_allowed_headers)
+        if self.cors_exposed_headers:
+            response[self.ACCESS_CONTROL_EXPOSE_HEADERS] = ", ".join(self.cors_exposed_headers)
 
         origin = request.META.get("HTTP_ORIGIN")
         if not origin:
@@ -27,3 +36,55 @@ class CorsAllowOriginMixin(APIView):
     def origin_found_in_white_lists(self, url):
         origins = [urlparse(o) for o in settings.OSIS_DOCUMENT_DOMAIN_LIST]
         return any(origin.scheme == url.scheme and origin.netloc == url.netloc for origin in origins)
+
+
+class NonAtomicRequestsMixin:
+    """
+    Serve a view outside of the request transaction (ATOMIC_REQUESTS), to spare the queries opening and closing it
+    when the view only reads.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    def get_exception_handler(self):
+        exception_handler = super().get_exception_handler()
+
+        def handle_exception(exc, context):
+            # The Django REST framework handler rolls back the ongoing atomic block, which is not the view's one here
+            needs_rollback = {db.alias: db.needs_rollback for db in connections.all() if db.in_atomic_block}
+            response = exception_handler(exc, context)
+            for alias, rollback in needs_rollback.items():
+                connections[alias].set_rollback(rollback)
+            return response
+
+        return handle_exception
+
+
+class CorsAllowOriginMixin(CorsHeadersMixin, APIView):
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return self.add_cors_headers(request, response)
+
+
+class AsyncCorsAllowOriginView(NonAtomicRequestsMixin, CorsHeadersMixin, View):
+    """
+    Base of the asynchronous views served in the ASGI deployment. As the Django REST framework views can't be
+    asynchronous, the API exceptions are rendered here the same way as the default exception handler does. Django
+    refuses to run an asynchronous view in a request transaction, but these views only read.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like the Django REST framework views, the API views are authenticated by their token, not by a session
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+        return self.add_cors_headers(request, response)
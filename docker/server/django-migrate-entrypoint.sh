@@ -0,0 +1,5 @@
+#!/bin/bash
+set -e
+
+echo "[OSIS-Document] Applying migrations"
+python manage.py migrate --noinput
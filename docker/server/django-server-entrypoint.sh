@@ -1,8 +1,18 @@
 #!/bin/bash
 
+# The mode may also be given by the .env file, which the environment of the container takes precedence over
+if [ -z "${DJANGO_SERVER_MODE}" ] && [ -f /app/.env ]; then
+  DJANGO_SERVER_MODE=$(sed -n "s/^DJANGO_SERVER_MODE=[\"']\?\([a-z]*\)[\"']\?\s*$/\1/p" /app/.env | tail -n 1)
+fi
+
+# The migrations are applied by the one-shot "migrate" service (docker/server/django-migrate-entrypoint.sh)
+if [ "${DJANGO_SERVER_MODE}" = "wsgi" ] || [ "${DJANGO_SERVER_MODE}" = "asgi" ]; then
+  echo "[OSIS-Document] Starting Gunicorn (${DJANGO_SERVER_MODE})"
+  exec gunicorn --config /app/docker/server/gunicorn.conf.py
+fi
+
 while true; do
   echo "[OSIS-Document] Re-starting Django runserver"
-  python manage.py migrate
   python manage.py runserver 0.0.0.0:9503
   sleep 2
-done
\ No newline at end of file
+done
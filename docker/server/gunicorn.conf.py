@@ -0,0 +1,46 @@
+# Gunicorn configuration of the production server (see the "Production Server" section of the README).
+# Every setting can be overridden through the environment of the server container or the .env file.
+import multiprocessing
+import os
+
+import dotenv
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+dotenv.read_dotenv(os.path.join(BASE_DIR, '.env'))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:9503')
+
+# "asgi" runs Uvicorn workers (required by the asynchronous views), "wsgi" runs threaded synchronous workers
+if os.environ.get('DJANGO_SERVER_MODE') == 'asgi':
+    wsgi_app = 'backoffice.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'backoffice.wsgi:application'
+    worker_class = 'gthread'
+
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Workers are recycled after a number of requests, to contain memory fragmentation (PDF and image processing)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# The conversion and merge endpoints may run LibreOffice for a while: a worker silent for longer is restarted
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# The application is loaded once in the master process and shared by the workers through copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # The exporter threads of OpenTelemetry don't survive the fork of the workers
+    if bool(os.environ.get('OTEL_ENABLED', False)):
+        from backoffice.settings import opentelemetry
+
+        opentelemetry.initialize()
+        opentelemetry.initialize_instrumentation()
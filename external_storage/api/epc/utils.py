@@ -23,8 +23,9 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
-from external_storage.api.raw_file import RawFileView
+from django.conf import settings
+from django.utils.module_loading import import_string
 
 
 def get_raw_file_view():
-    return RawFileView
+    return import_string(settings.EXTERNAL_STORAGE_RAW_FILE_VIEW)
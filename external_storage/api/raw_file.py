@@ -27,36 +27,36 @@
 from datetime import datetime
 from pathlib import Path
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.http import FileResponse
 from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
 from rest_framework.views import APIView
 
-from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
+from backoffice.settings.rest_framework.utils import AsyncCorsAllowOriginView, CorsAllowOriginMixin
+from osis_document.api.file_response import (
+    apply_range_request,
+    build_offloaded_file_response,
+    is_file_delivery_offloaded,
+    make_streaming_async,
+)
 from external_storage.exceptions import TokenNotFound, TokenExpired, FileReferenceNotFound
 from external_storage.models import Token
 
 
-class RawFileView(CorsAllowOriginMixin, APIView):
-    """Get raw file from a token"""
+class RawFileMixin:
+    """Serving of the file of a token, shared by the synchronous and asynchronous views"""
     name = 'raw-file'
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
-    authentication_classes = []
-    permission_classes = []
+    cors_allowed_headers = ["Content-Type", "Range", "If-Range"]
+    cors_exposed_headers = ["Accept-Ranges", "Content-Range", "Content-Length"]
 
-    def get(self, request, *args, **kwargs):
-        token = self._get_token(kwargs.get("token"))
+    def _check_token(self, token: Token):
         if not token:
             raise TokenNotFound()
 
         if self._is_expired(token):
             raise TokenExpired()
 
-        return self._serve_file(request, token)
-
-    def _get_token(self, token_str):
-        return Token.objects.filter(token=token_str).first()
-
     def _is_expired(self, token: Token):
         return token.expires_at < datetime.now()
 
@@ -68,7 +68,7 @@ class RawFileView(CorsAllowOriginMixin, APIView):
                 filename=token.metadata.get("name")
             )
 
-        response = self._build_file_response(token, **kwargs)
+        response = apply_range_request(request, self._build_file_response(token, **kwargs))
         domain_list = getattr(settings, "OSIS_DOCUMENT_DOMAIN_LIST", [])
         if domain_list:
             response["Content-Security-Policy"] = "frame-ancestors {};".format(" ".join(domain_list))
@@ -84,7 +84,51 @@ class RawFileView(CorsAllowOriginMixin, APIView):
         if not file_path.is_file():
             raise FileReferenceNotFound()
 
+        # The front server can only send the files of the root of the external storages
+        if is_file_delivery_offloaded() and settings.EXTERNAL_STORAGE_ROOT:
+            response = build_offloaded_file_response(
+                file_path=str(file_path),
+                internal_uri=settings.EXTERNAL_STORAGE_X_ACCEL_REDIRECT_PREFIX + self._get_relative_path(file_path),
+                **kwargs,
+            )
+            if response:
+                return response
+
         return FileResponse(
             file_path.open('rb'),
             **kwargs,
         )
+
+    @staticmethod
+    def _get_relative_path(file_path: Path) -> str:
+        try:
+            return file_path.relative_to(Path(settings.EXTERNAL_STORAGE_ROOT).resolve()).as_posix()
+        except ValueError:
+            # The file is outside of the root, it must not be sent by the front server
+            raise FileReferenceNotFound()
+
+
+class RawFileView(RawFileMixin, CorsAllowOriginMixin, APIView):
+    """Get raw file from a token"""
+    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        token = self._get_token(kwargs.get("token"))
+        self._check_token(token)
+        return self._serve_file(request, token)
+
+    def _get_token(self, token_str):
+        return Token.objects.filter(token=token_str).first()
+
+
+class AsyncRawFileView(RawFileMixin, AsyncCorsAllowOriginView):
+    """Get raw file from a token, without holding a thread while the file is sent (ASGI deployment only)"""
+
+    async def get(self, request, *args, **kwargs):
+        token = await Token.objects.filter(token=kwargs.get("token")).afirst()
+        self._check_token(token)
+        # The file is looked up and opened in a worker thread, so that the event loop is not blocked by the disk
+        response = await sync_to_async(self._serve_file, thread_sensitive=False)(request, token)
+        return make_streaming_async(response)
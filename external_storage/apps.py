@@ -38,3 +38,12 @@ class ExternalStorageConfig(AppConfig):
        settings.STUDENT_FILES_API_URL = os.environ.get('STUDENT_FILES_API_URL')
        settings.STUDENT_FILES_API_AUTHORIZATION_HEADER = os.environ.get('STUDENT_FILES_API_AUTHORIZATION_HEADER')
        settings.STUDENT_FILES_API_CALL_TIMEOUT = int(os.environ.get('STUDENT_FILES_API_CALL_TIMEOUT', 5))
+       settings.EXTERNAL_STORAGE_RAW_FILE_VIEW = os.environ.get(
+           'EXTERNAL_STORAGE_RAW_FILE_VIEW',
+           'external_storage.api.raw_file.RawFileView',
+       )
+       settings.EXTERNAL_STORAGE_X_ACCEL_REDIRECT_PREFIX = os.environ.get(
+           'EXTERNAL_STORAGE_X_ACCEL_REDIRECT_PREFIX',
+           '/protected-external-storage/',
+       )
+       settings.EXTERNAL_STORAGE_ROOT = os.environ.get('EXTERNAL_STORAGE_ROOT')
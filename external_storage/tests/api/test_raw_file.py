@@ -27,13 +27,18 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 from django.test import TestCase, override_settings
-from django.urls import reverse
+from django.urls import path, reverse
 from rest_framework.test import APIClient
 
+from external_storage.api.raw_file import AsyncRawFileView
 from external_storage.exceptions import TokenNotFound, FileReferenceNotFound
 from external_storage.models import Token
 from osis_document.exceptions import TokenExpired
 
+urlpatterns = [
+    path('file/<path:token>', AsyncRawFileView.as_view(), name=AsyncRawFileView.name),
+]
+
 
 class RawFileViewTestCase(TestCase):
     @classmethod
@@ -107,6 +112,52 @@ class RawFileViewTestCase(TestCase):
         body = b"".join(response.streaming_content)
         self.assertEqual(body, b"file for testing")
 
+    def test_range(self):
+        token = self._create_token()
+        url = reverse(self.url_pattern, kwargs={"token": token.token})
+        response = self.client.get(url, HTTP_RANGE="bytes=9-")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 9-15/16")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(body, b"testing")
+
+    @override_settings(
+        OSIS_DOCUMENT_FILE_DELIVERY="X_ACCEL_REDIRECT",
+        EXTERNAL_STORAGE_X_ACCEL_REDIRECT_PREFIX="/protected/",
+        EXTERNAL_STORAGE_ROOT=f"{Path(__file__).parent.parent}",
+    )
+    def test_with_x_accel_redirect(self):
+        token = self._create_token()
+        url = reverse(self.url_pattern, kwargs={"token": token.token})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/assets/file.txt")
+        self.assertEqual(response.content, b"")
+
+    @override_settings(
+        OSIS_DOCUMENT_FILE_DELIVERY="X_ACCEL_REDIRECT",
+        EXTERNAL_STORAGE_ROOT=f"{Path(__file__).parent}",
+    )
+    def test_with_x_accel_redirect_outside_of_the_root(self):
+        token = self._create_token()
+        url = reverse(self.url_pattern, kwargs={"token": token.token})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, FileReferenceNotFound.status_code)
+        self.assertFalse(response.has_header("X-Accel-Redirect"))
+
+    @override_settings(OSIS_DOCUMENT_FILE_DELIVERY="X_ACCEL_REDIRECT", EXTERNAL_STORAGE_ROOT=None)
+    def test_with_x_accel_redirect_without_root(self):
+        token = self._create_token()
+        url = reverse(self.url_pattern, kwargs={"token": token.token})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("X-Accel-Redirect"))
+        self.assertEqual(b"".join(response.streaming_content), b"file for testing")
+
     @override_settings(OSIS_DOCUMENT_DOMAIN_LIST=["https://example.com", "https://foo.bar"])
     def test_ok_with_download_and_content_security_policy_headers(self):
         token = self._create_token()
@@ -126,3 +177,23 @@ class RawFileViewTestCase(TestCase):
             "frame-ancestors https://example.com https://foo.bar;"
         )
         self.assertEqual(response["X-Frame-Options"], ";")
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncRawFileViewTestCase(TestCase):
+    def setUp(self):
+        self.token = RawFileViewTestCase._create_token(self)
+
+    async def test_get_file(self):
+        response = await self.async_client.get(reverse("raw-file", kwargs={"token": self.token.token}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        with open(self.token.metadata["path"], "rb") as file:
+            self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), file.read())
+
+    async def test_token_not_found(self):
+        response = await self.async_client.get(reverse("raw-file", kwargs={"token": "unknown"}))
+
+        self.assertEqual(response.status_code, TokenNotFound.status_code)
+        self.assertEqual(response.json()["detail"], TokenNotFound.default_detail)
@@ -28,7 +28,7 @@ from django.template.defaultfilters import filesizeformat
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from osis_document.models import Token, Upload, PostProcessing, PostProcessAsync
+from osis_document.models import Blob, Token, Upload, PostProcessing, PostProcessAsync, UploadSession
 
 
 class UploadAdmin(admin.ModelAdmin):
@@ -39,11 +39,13 @@ class UploadAdmin(admin.ModelAdmin):
         'status',
         'display_size',
         'mimetype',
+        'last_verified_at',
     ]
     date_hierarchy = 'uploaded_at'
     list_filter = [
         'status',
         'mimetype',
+        'verification_status',
     ]
 
     def file_button(self, obj):
@@ -71,6 +73,30 @@ class TokenAdmin(admin.ModelAdmin):
     ]
 
 
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = [
+        'uuid',
+        'name',
+        'created_at',
+        'received',
+        'size',
+        'expires_at',
+    ]
+    date_hierarchy = 'created_at'
+
+
+class BlobAdmin(admin.ModelAdmin):
+    list_display = [
+        'hash',
+        'name',
+        'size',
+        'infected',
+        'last_stored_at',
+    ]
+    list_filter = ['infected']
+    search_fields = ['hash', 'name']
+
+
 class PostProcessingAdmin(admin.ModelAdmin):
     list_display = [
         'uuid',
@@ -94,5 +120,7 @@ class PostProcessAsyncAdmin(admin.ModelAdmin):
 
 admin.site.register(Upload, UploadAdmin)
 admin.site.register(Token, TokenAdmin)
+admin.site.register(UploadSession, UploadSessionAdmin)
+admin.site.register(Blob, BlobAdmin)
 admin.site.register(PostProcessing, PostProcessingAdmin)
 admin.site.register(PostProcessAsync, PostProcessAsyncAdmin)
@@ -0,0 +1,265 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import mimetypes
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from osis_document.enums import FileDelivery
+
+# Beyond this number of ranges, the Range header is ignored and the whole file is served
+MAX_RANGES = 20
+
+RANGE_SPEC_RE = re.compile(r'^(\d*)-(\d*)$')
+
+
+def is_file_delivery_offloaded() -> bool:
+    return settings.OSIS_DOCUMENT_FILE_DELIVERY != FileDelivery.DJANGO.name
+
+
+def build_offloaded_file_response(
+    file_path: str,
+    internal_uri: str,
+    as_attachment: bool = False,
+    filename: str = '',
+) -> Optional[HttpResponse]:
+    """
+    Build an empty response delegating the transfer of the file to the front server (X-Accel-Redirect for nginx,
+    X-Sendfile for Apache or lighttpd), with the same headers as a FileResponse. Return None if the file can't be
+    delegated, in which case it must be served by Django.
+    """
+    filename = filename or os.path.basename(file_path)
+    content_type, encoding = mimetypes.guess_type(filename)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    if settings.OSIS_DOCUMENT_FILE_DELIVERY == FileDelivery.X_ACCEL_REDIRECT.name:
+        response['X-Accel-Redirect'] = quote(internal_uri)
+    else:
+        try:
+            file_path.encode('latin-1')
+        except UnicodeEncodeError:
+            # The path can't be sent as is in a header
+            return None
+        response['X-Sendfile'] = file_path
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return response
+
+
+def set_validators(response, etag: Optional[str], last_modified: Optional[datetime]):
+    """
+    Add the ETag and Last-Modified validators to the response, and require clients to revalidate their cached copy
+    (with a conditional request) before reusing it.
+    """
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def get_not_modified_response(request, etag: Optional[str], last_modified: Optional[datetime]):
+    """
+    Evaluate the conditional headers of the request (If-None-Match, If-Modified-Since, ...) against the validators of
+    the current representation and return a 304 (or 412) response if they apply, None otherwise.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def parse_range_header(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a "bytes" Range header (RFC 9110) and return the sorted list of the satisfiable ranges, as inclusive
+    (start, end) offsets, overlapping ranges being merged. Return None if the header must be ignored (unknown unit,
+    invalid syntax or too many ranges) and an empty list if none of the ranges can be satisfied.
+    """
+    unit, _, range_set = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not range_set:
+        return None
+    specs = [spec.strip() for spec in range_set.split(',') if spec.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_SPEC_RE.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range: the last N bytes
+            suffix_length = int(last)
+            if suffix_length == 0 or size == 0:
+                continue
+            ranges.append((max(size - suffix_length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    merged_ranges = []
+    for start, end in sorted(ranges):
+        if merged_ranges and start <= merged_ranges[-1][1] + 1:
+            merged_ranges[-1] = (merged_ranges[-1][0], max(end, merged_ranges[-1][1]))
+        else:
+            merged_ranges.append((start, end))
+    return merged_ranges
+
+
+def if_range_matches(request, response) -> bool:
+    """Check the If-Range precondition against the validators (strong ETag or Last-Modified) of the response"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Weak entity tags can never be used in an If-Range
+        return not if_range.startswith('W/') and response.get('ETag') == if_range
+    if_range_date = parse_http_date_safe(if_range)
+    last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+    return if_range_date is not None and if_range_date == last_modified
+
+
+def _read_range(file, start: int, end: int, block_size: int) -> Iterator[bytes]:
+    file.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = file.read(min(block_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def apply_range_request(request, response: FileResponse):
+    """
+    Given a full file response, honour the Range and If-Range headers of the request by returning the requested byte
+    ranges (a 206 response, multipart if several ranges are requested) or a 416 response if they can't be satisfied.
+    """
+    response['Accept-Ranges'] = 'bytes'
+    range_header = request.META.get('HTTP_RANGE')
+    file = getattr(response, 'file_to_stream', None)
+    if (
+        not range_header
+        or request.method not in ('GET', 'HEAD')
+        or response.status_code != 200
+        or file is None
+        or not response.has_header('Content-Length')
+        or not if_range_matches(request, response)
+    ):
+        return response
+
+    size = int(response['Content-Length'])
+    ranges = parse_range_header(range_header, size)
+    if ranges is None:
+        return response
+
+    if not ranges:
+        # Only the file is closed: closing the response would signal the end of the request (and close the database
+        # connection) while it is still being handled
+        file.close()
+        unsatisfiable_response = HttpResponse(status=416)
+        unsatisfiable_response['Content-Range'] = 'bytes */{}'.format(size)
+        unsatisfiable_response['Accept-Ranges'] = 'bytes'
+        return unsatisfiable_response
+
+    response.status_code = 206
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+        response['Content-Length'] = end - start + 1
+        response.streaming_content = _read_range(file, start, end, response.block_size)
+        return response
+
+    boundary = uuid.uuid4().hex
+    content_type = response['Content-Type']
+    parts = [
+        (
+            (
+                '--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).format(boundary=boundary, content_type=content_type, start=start, end=end, size=size).encode(),
+            start,
+            end,
+        )
+        for start, end in ranges
+    ]
+    closing = '\r\n--{}--\r\n'.format(boundary).encode()
+
+    def multipart_content():
+        for index, (part_header, start, end) in enumerate(parts):
+            yield (b'\r\n' if index else b'') + part_header
+            yield from _read_range(file, start, end, response.block_size)
+        yield closing
+
+    response['Content-Type'] = 'multipart/byteranges; boundary={}'.format(boundary)
+    response['Content-Length'] = (
+        sum(len(part_header) + end - start + 1 for part_header, start, end in parts)
+        + 2 * (len(parts) - 1)
+        + len(closing)
+    )
+    response.streaming_content = multipart_content()
+    return response
+
+
+async def _iterate_in_thread(iterator) -> AsyncIterator[bytes]:
+    iterator = iter(iterator)
+    end = object()
+    while True:
+        # The file is read in a worker thread, so the event loop is never blocked by the disk
+        chunk = await sync_to_async(next, thread_sensitive=False)(iterator, end)
+        if chunk is end:
+            return
+        yield chunk
+
+
+def make_streaming_async(response):
+    """
+    Make the content of a streaming response asynchronous, so that the ASGI server can serve it chunk by chunk instead
+    of loading the whole synchronous content in memory.
+    """
+    if getattr(response, 'streaming', False) and not response.is_async:
+        response.streaming_content = _iterate_in_thread(response.streaming_content)
+    return response
@@ -23,12 +23,23 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+import json
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core import signing
 from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.files.base import ContentFile
 from django.utils.translation import gettext_lazy as _
-from osis_document.models import Token, Upload, OsisDocumentFileExtensionValidator, OsisDocumentMimeMatchValidator
-from osis_document.enums import DocumentExpirationPolicy
+from osis_document.models import (
+    Token,
+    Upload,
+    UploadSession,
+    OsisDocumentFileExtensionValidator,
+    OsisDocumentMimeMatchValidator,
+)
+from osis_document import stateless_tokens
+from osis_document.enums import DocumentExpirationPolicy, TokenAccess
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
@@ -44,6 +55,33 @@ class RequestUploadResponseSerializer(serializers.Serializer):
     token = serializers.CharField(help_text="A writing token for the uploaded file")
 
 
+class UploadSessionRequestSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255, help_text="The name of the file")
+    mimetype = serializers.CharField(max_length=255, help_text="The MIME type of the file")
+    size = serializers.IntegerField(min_value=1, help_text="The size of the file (in bytes)")
+
+    def validate_name(self, value):
+        OsisDocumentFileExtensionValidator()(ContentFile(b'', name=value))
+        return value
+
+    def validate_size(self, value):
+        if settings.OSIS_DOCUMENT_MAX_UPLOAD_SIZE is not None and value > settings.OSIS_DOCUMENT_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(_("The file is too large"))
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            'uuid',
+            'size',
+            'chunk_size',
+            'received',
+            'expires_at',
+        ]
+
+
 class ConfirmUploadResponseSerializer(serializers.Serializer):
     uuid = serializers.UUIDField(help_text="The uuid of the persisted file upload")
 
@@ -79,6 +117,16 @@ class ContentTypeSerializer(serializers.Serializer):
     )
 
     def to_internal_value(self, data):
+        # When confirming several uploads at once, each distinct related model is only resolved once
+        related_models = self.context.get('related_models')
+        if related_models is None:
+            return self.resolve(data)
+        key = json.dumps(data, sort_keys=True)
+        if key not in related_models:
+            related_models[key] = self.resolve(data)
+        return related_models[key]
+
+    def resolve(self, data):
         # Get the content type
         content_type = ContentType(
             app_label=data['app'],
@@ -157,6 +205,18 @@ class ConfirmUploadRequestSerializer(serializers.Serializer):
         return internal_value
 
 
+class ConfirmUploadBatchItemSerializer(ConfirmUploadRequestSerializer):
+    token = serializers.CharField(help_text="A writing token of the upload to confirm")
+
+
+class ConfirmUploadBatchRequestSerializer(serializers.Serializer):
+    uploads = ConfirmUploadBatchItemSerializer(
+        help_text="The uploads to confirm, with the same parameters as when confirming a single upload",
+        many=True,
+        allow_empty=False,
+    )
+
+
 class MetadataSerializer(serializers.Serializer):
     size = serializers.IntegerField(help_text="The size, in bytes, of the file")
     mimetype = serializers.CharField(help_text="The file's mimetype")
@@ -188,8 +248,12 @@ class SaveEditorResponseSerializer(serializers.Serializer):
 
 class TokenListSerializer(serializers.ListSerializer):
     def create(self, validated_data):
-        tokens = [Token(**(self.child.complete_new_validated_data(token))) for token in validated_data]
-        return Token.objects.bulk_create(tokens)
+        tokens = [self.child.build_token(token) for token in validated_data]
+        # The stateless read tokens are not stored
+        Token.objects.save_many([
+            token for token, data in zip(tokens, validated_data) if not self.child.is_stateless(data)
+        ])
+        return tokens
 
 
 class TokenSerializer(serializers.ModelSerializer):
@@ -213,9 +277,24 @@ class TokenSerializer(serializers.ModelSerializer):
         validated_data['token'] = signing.dumps(str(validated_data['upload_id']))
         return validated_data
 
+    @staticmethod
+    def is_stateless(validated_data):
+        return stateless_tokens.is_enabled() and validated_data.get('access') == TokenAccess.READ.name
+
+    def build_token(self, validated_data):
+        if self.is_stateless(validated_data):
+            return Token.objects.build_read_token(
+                upload_id=validated_data['upload_id'],
+                for_modified_upload=validated_data.get('for_modified_upload', False),
+                expires_at=validated_data.get('expires_at'),
+            )
+        return Token(**self.complete_new_validated_data(validated_data))
+
     def create(self, validated_data):
-        validated_data = self.complete_new_validated_data(validated_data)
-        return super().create(validated_data)
+        token = self.build_token(validated_data)
+        if not self.is_stateless(validated_data):
+            Token.objects.save_many([token])
+        return token
 
 
 class PostProcessingSerializer(serializers.Serializer):
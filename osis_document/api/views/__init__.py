@@ -24,22 +24,35 @@
 #
 # ##############################################################################
 from .editor import SaveEditorView
+from .file_bundle import FileBundleView
 from .metadata import MetadataView, ChangeMetadataView, MetadataListView
 from .post_processing import PostProcessingView, GetProgressAsyncPostProcessingView
 from .raw_file import RawFileView
 from .rotate import RotateImageView
 from .security import DeclareFileAsInfectedView
 from .token import GetTokenView, GetTokenListView
-from .upload import ConfirmUploadView, RequestUploadView, DeclareFilesAsDeletedView
+from .upload import ConfirmUploadView, ConfirmUploadBatchView, RequestUploadView, DeclareFilesAsDeletedView
+from .upload_session import (
+    CreateUploadSessionView,
+    FinalizeUploadSessionView,
+    UploadChunkView,
+    UploadSessionView,
+)
 from .duplicate import UploadDuplicationView
 
 __all__ = [
     "RawFileView",
+    "FileBundleView",
     "MetadataView",
     "MetadataListView",
     "ChangeMetadataView",
     "ConfirmUploadView",
+    "ConfirmUploadBatchView",
     "RequestUploadView",
+    "CreateUploadSessionView",
+    "UploadSessionView",
+    "UploadChunkView",
+    "FinalizeUploadSessionView",
     "GetTokenView",
     "GetTokenListView",
     "RotateImageView",
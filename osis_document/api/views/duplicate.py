@@ -34,6 +34,7 @@ from osis_document.api import serializers
 from backoffice.settings.rest_framework.permissions import APIKeyPermission
 from drf_spectacular.openapi import AutoSchema
 from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
+from osis_document.blob_storage import is_blob_name
 from osis_document.enums import DocumentError
 from osis_document.models import Upload, ModifiedUpload
 
@@ -106,12 +107,14 @@ class UploadDuplicationView(CorsAllowOriginMixin, CreateAPIView):
             upload.uuid = uuid.uuid4()
             upload._state.adding = True
 
-            with upload.file.open() as file:
-                upload.file.save(
-                    name=input_data['upload_path_by_uuid'].get(original_upload_uuid, upload.file.name),
-                    content=file,
-                    save=False,
-                )
+            # The contents shared by the content-addressed storage are referenced instead of being copied
+            if not is_blob_name(upload.file.name):
+                with upload.file.open() as file:
+                    upload.file.save(
+                        name=input_data['upload_path_by_uuid'].get(original_upload_uuid, upload.file.name),
+                        content=file,
+                        save=False,
+                    )
 
         duplicate_uploads = Upload.objects.bulk_create(uploads)
 
@@ -132,12 +135,16 @@ class UploadDuplicationView(CorsAllowOriginMixin, CreateAPIView):
                 modified_upload.pk = None
                 modified_upload._state.adding = True
 
-                with modified_upload.file.open() as file:
-                    modified_upload.file.save(
-                        name=input_data['upload_path_by_uuid'].get(original_upload_uuid, modified_upload.file.name),
-                        content=file,
-                        save=False,
-                    )
+                if not is_blob_name(modified_upload.file.name):
+                    with modified_upload.file.open() as file:
+                        modified_upload.file.save(
+                            name=input_data['upload_path_by_uuid'].get(
+                                original_upload_uuid,
+                                modified_upload.file.name,
+                            ),
+                            content=file,
+                            save=False,
+                        )
 
                 modified_upload.upload = duplicate_upload_by_original_uuid[original_upload_uuid]
 
@@ -28,10 +28,10 @@ from io import BytesIO
 
 import filetype
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.http import Http404
 from django.utils.translation import gettext_lazy as _
 from drf_spectacular.openapi import AutoSchema
 from rest_framework import status
-from rest_framework.generics import get_object_or_404
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -40,7 +40,9 @@ from osis_document.api import serializers
 from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
 from osis_document.enums import TokenAccess
 from osis_document.exceptions import MimeMismatch
+from osis_document.integrity import invalidate_verified_hash
 from osis_document.models import Token, Upload, ModifiedUpload
+from osis_document.upload_handlers import IngestUploadMixin, read_head
 from osis_document.utils import calculate_hash, get_token
 
 
@@ -58,7 +60,7 @@ class SaveEditorSchema(AutoSchema):  # pragma: no cover
         return responses
 
 
-class SaveEditorView(CorsAllowOriginMixin, APIView):
+class SaveEditorView(IngestUploadMixin, CorsAllowOriginMixin, APIView):
     """Receive a file (from VueJS), rotate its pages if needed and replace corresponding upload"""
 
     name = 'save-editor'
@@ -68,10 +70,10 @@ class SaveEditorView(CorsAllowOriginMixin, APIView):
     schema = SaveEditorSchema()
 
     def post(self, request, *args, **kwargs):
-        token = get_object_or_404(
-            Token.objects.writing_not_expired(),
-            token=self.kwargs['token'],
-        )
+        # The writing token is consumed at once, so that it is only used once whatever the token store
+        token = Token.objects.consume_writing([self.kwargs['token']]).get(self.kwargs['token'])
+        if token is None:
+            raise Http404
         upload = token.upload
 
         if upload.mimetype != 'application/pdf':
@@ -102,9 +104,7 @@ class SaveEditorView(CorsAllowOriginMixin, APIView):
             )
 
         # Process file: calculate hash and save it to db
-        bytesa = file.file.read(4096)
-        file.file.seek(0)
-        fileguess = filetype.guess(bytesa)
+        fileguess = filetype.guess(read_head(file))
         if fileguess.mime != file.content_type or file.content_type != 'application/pdf':
             raise MimeMismatch
 
@@ -116,18 +116,22 @@ class SaveEditorView(CorsAllowOriginMixin, APIView):
                     upload=upload,
                 )
             modified_upload.size = file.size
+            if modified_upload.file:
+                invalidate_verified_hash(modified_upload.file)
             modified_upload.file.save(upload.file.name, file)
             modified_upload.save()
 
-            upload.metadata['modified_hash'] = calculate_hash(file)
-            upload.save(update_fields=['metadata'])
+            Upload.objects.update_metadata(upload.uuid, {'modified_hash': calculate_hash(file)})
         else:
-            upload.file.save(upload.file.name, file)
-            upload.size = file.size
-            upload.metadata['hash'] = calculate_hash(file)
-            upload.save()
+            invalidate_verified_hash(upload.file)
+            upload.file.save(upload.file.name, file, save=False)
+            Upload.objects.update_metadata(
+                upload.uuid,
+                {'hash': calculate_hash(file)},
+                file=upload.file,
+                size=file.size,
+            )
 
         # Regenerate new token
-        token.delete()
         token = get_token(upload.uuid, access=TokenAccess.WRITE.name, for_modified_upload=token.for_modified_upload)
         return Response({'token': token}, status=status.HTTP_200_OK)
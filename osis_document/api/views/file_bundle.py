@@ -0,0 +1,181 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import contextlib
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.views import APIView
+
+from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin, NonAtomicRequestsMixin
+from osis_document.api.views.raw_file import get_readable_upload
+from osis_document.api.zip_stream import ZipStream
+from osis_document.enums import DocumentError
+from osis_document.exceptions import (
+    FileInfectedException,
+    FileReferenceNotFound,
+    HashMismatch,
+    TokenExpired,
+    TokenNotFound,
+)
+from osis_document.integrity import is_recently_verified, open_verified_file
+from osis_document.models import Token
+
+MANIFEST_NAME = 'manifest.json'
+
+# Errors reported in the manifest for the files which can't be added to the bundle
+BUNDLE_ERRORS = {
+    TokenNotFound: DocumentError.TOKEN_NOT_FOUND.name,
+    TokenExpired: DocumentError.TOKEN_EXPIRED.name,
+    FileReferenceNotFound: DocumentError.UPLOAD_NOT_FOUND.name,
+    FileInfectedException: DocumentError.INFECTED.name,
+    HashMismatch: DocumentError.HASH_MISMATCH.name,
+}
+
+
+def get_bundle_error(exception: APIException) -> str:
+    """Return the error of the manifest for an exception (or a subclass) of BUNDLE_ERRORS, a generic one otherwise"""
+    for exception_class in type(exception).__mro__:
+        if exception_class in BUNDLE_ERRORS:
+            return BUNDLE_ERRORS[exception_class]
+    return DocumentError.UPLOAD_NOT_FOUND.name
+
+
+class FileBundleSchema(AutoSchema):  # pragma: no cover
+    def get_operation_id(self, path, method):
+        return 'getFileBundle'
+
+    def get_request_body(self, path, method):
+        self.request_media_types = self.map_parsers(path, method)
+        return {
+            'content': {
+                ct: {
+                    'schema': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'string',
+                            'description': 'The file token',
+                        },
+                    },
+                }
+                for ct in self.request_media_types
+            }
+        }
+
+    def get_responses(self, path, method):
+        responses = super().get_responses(path, method)
+        responses['200'] = {
+            "description": "A ZIP archive of the files, with a manifest giving the name or the error of each token",
+            "content": {"application/zip": {"schema": {"type": "string", "format": "binary"}}},
+        }
+        return responses
+
+
+class FileBundleView(NonAtomicRequestsMixin, CorsAllowOriginMixin, APIView):
+    """Get a ZIP archive of the raw files of several read tokens"""
+
+    name = 'file-bundle'
+    authentication_classes = []
+    permission_classes = []
+    cors_exposed_headers = ["Content-Disposition"]
+    schema = FileBundleSchema()
+
+    def post(self, request, *args, **kwargs):
+        token_values = self._get_token_values(request.data)
+        tokens = Token.objects.resolve_many(token_values)
+        response = StreamingHttpResponse(
+            self._stream_bundle(token_values, tokens),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = content_disposition_header(as_attachment=True, filename='documents.zip')
+        return response
+
+    def _get_token_values(self, data):
+        field = serializers.ListField(
+            child=serializers.CharField(),
+            allow_empty=False,
+            max_length=settings.OSIS_DOCUMENT_FILE_BUNDLE_MAX_FILES,
+        )
+        # Duplicated tokens are only added once to the bundle
+        return list(dict.fromkeys(field.run_validation(data)))
+
+    def _stream_bundle(self, token_values, tokens):
+        zip_stream = ZipStream()
+        manifest = {}
+        used_names = set()
+        for token_value in token_values:
+            token = tokens.get(token_value)
+            try:
+                upload = get_readable_upload(token)
+                file = upload.get_file(modified=token.for_modified_upload)
+                if is_recently_verified(upload.get_version(modified=token.for_modified_upload)):
+                    content = file.open('rb')
+                else:
+                    # The hash is checked while the file is added to the bundle, instead of reading it beforehand
+                    content = open_verified_file(file, upload.get_hash(modified=token.for_modified_upload))
+            except APIException as e:
+                manifest[token_value] = {'error': DocumentError.get_dict_error(get_bundle_error(e))}
+                continue
+            except OSError:
+                manifest[token_value] = {'error': DocumentError.get_dict_error(DocumentError.UPLOAD_NOT_FOUND.name)}
+                continue
+
+            name = self._get_entry_name(upload.metadata.get('name') or file.name, used_names)
+            try:
+                with contextlib.closing(content):
+                    # Already compressed formats are stored as is
+                    yield from zip_stream.write_file(
+                        name,
+                        content,
+                        size=file.size,
+                        compress=not (upload.mimetype == 'application/pdf' or upload.mimetype.startswith('image/')),
+                    )
+            except HashMismatch as e:
+                # The entry is left out of the archive, its name can be given to another file
+                used_names.discard(name)
+                manifest[token_value] = {'error': DocumentError.get_dict_error(get_bundle_error(e))}
+                continue
+            manifest[token_value] = {'name': name}
+
+        yield from zip_stream.write_bytes(MANIFEST_NAME, json.dumps(manifest, cls=DjangoJSONEncoder).encode())
+        yield from zip_stream.close()
+
+    @staticmethod
+    def _get_entry_name(name, used_names):
+        base, extension = os.path.splitext(os.path.basename(name.replace('\\', '/')) or 'file')
+        entry_name = base + extension
+        counter = 1
+        while entry_name in used_names or entry_name == MANIFEST_NAME:
+            counter += 1
+            entry_name = '{} ({}){}'.format(base, counter, extension)
+        used_names.add(entry_name)
+        return entry_name
@@ -24,21 +24,31 @@
 #
 # ##############################################################################
 import hashlib
+import json
 
-from django.db.models.functions import Now
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django.http import Http404, JsonResponse
 from drf_spectacular.openapi import AutoSchema
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
 from osis_document.exceptions import FileReferenceNotFound, HashMismatch
 from osis_document.api import serializers
-from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
+from osis_document.api.file_response import get_not_modified_response, set_validators
+from backoffice.settings.rest_framework.utils import (
+    AsyncCorsAllowOriginView,
+    CorsAllowOriginMixin,
+    NonAtomicRequestsMixin,
+)
 from osis_document.enums import DocumentError, FileStatus
+from osis_document.integrity import is_recently_verified, is_valid_checksum
+from osis_document.metadata_cache import acache_metadata, aget_cached_metadata, cache_metadata, get_cached_metadata
 from osis_document.models import Token, Upload
-from osis_document.utils import get_upload_metadata
+from osis_document.utils import get_file_url, get_upload_metadata
 
 
 class MetadataSchema(AutoSchema):  # pragma: no cover
@@ -61,36 +71,120 @@ class MetadataSchema(AutoSchema):  # pragma: no cover
         return responses
 
 
-class MetadataView(CorsAllowOriginMixin, APIView):
-    """Get metadata for an upload given a token"""
+def get_metadata_cache_entry(metadata, upload, is_checked):
+    """
+    Build the cached entry of the metadata of an upload, without the token-specific URL which is added back when it is
+    served. Only the entries cached once the file has been checked spare its check when the metadata of the upload are
+    requested alone.
+    """
+    return {
+        'metadata': {key: value for key, value in metadata.items() if key != 'url'},
+        'validators': get_metadata_validators(upload),
+        'is_checked': is_checked,
+    }
 
-    name = 'get-metadata'
-    authentication_classes = []
-    permission_classes = []
-    schema = MetadataSchema()
 
-    def get(self, *args, **kwargs):
-        token = self.kwargs['token']
-        upload = Upload.objects.from_token(token)
-        if not upload:
-            raise FileReferenceNotFound()
+def get_metadata_from_cache_entry(entry, token):
+    return {**entry['metadata'], 'url': get_file_url(token)}
 
-        if not self._is_valid_checksum(upload):
-            raise HashMismatch()
 
-        metadata = self._build_metadata_response(upload, token)
-        return Response(metadata)
+def get_metadata_validators(upload):
+    # Any change of the upload (file or metadata) updates its modification date
+    version = '{}:{}'.format(upload.get_hash(), upload.modified_at.isoformat())
+    etag = 'W/"{}"'.format(hashlib.sha256(version.encode()).hexdigest()[:32])
+    return etag, upload.modified_at
+
+
+class MetadataMixin:
+    """Metadata of the upload of a token, shared by the synchronous and asynchronous views"""
+
+    name = 'get-metadata'
+    cors_allowed_headers = ["Content-Type", "If-None-Match", "If-Modified-Since"]
+    cors_exposed_headers = ["ETag", "Last-Modified"]
+    use_metadata_cache = True
+
+    def _get_checked_entry(self, cached_entries, token):
+        # The cached metadata are served without checking the file again until they expire or the upload is changed
+        entry = cached_entries.get(token) if self.use_metadata_cache else None
+        return entry if entry and entry['is_checked'] else None
 
     def _is_valid_checksum(self, upload):
-        with upload.file.open() as file:
-            file_hash = hashlib.sha256(file.read()).hexdigest()
-        return upload.get_hash() == file_hash
+        return is_recently_verified(upload) or is_valid_checksum(upload.file, upload.get_hash())
 
     def _build_metadata_response(self, upload, token):
         return get_upload_metadata(token, upload, upload.file.name)
 
 
+class MetadataView(NonAtomicRequestsMixin, MetadataMixin, CorsAllowOriginMixin, APIView):
+    """Get metadata for an upload given a token"""
+
+    authentication_classes = []
+    permission_classes = []
+    schema = MetadataSchema()
+
+    def get(self, *args, **kwargs):
+        token = self.kwargs['token']
+        entry = self._get_checked_entry(get_cached_metadata([token]), token)
+        if entry is None:
+            upload = Upload.objects.from_token(token)
+            if not upload:
+                raise FileReferenceNotFound()
+            validators = get_metadata_validators(upload)
+        else:
+            validators = entry['validators']
+
+        # The client already has the current metadata: the file does not need to be read
+        not_modified_response = get_not_modified_response(self.request, *validators)
+        if not_modified_response:
+            return not_modified_response
+
+        if entry is None:
+            if not self._is_valid_checksum(upload):
+                raise HashMismatch()
+            metadata = self._build_metadata_response(upload, token)
+            if self.use_metadata_cache:
+                entry = get_metadata_cache_entry(metadata, upload, is_checked=True)
+                cache_metadata(token, upload.token_expires_at, upload.uuid, entry)
+        else:
+            metadata = get_metadata_from_cache_entry(entry, token)
+        return set_validators(Response(metadata), *validators)
+
+
+class AsyncMetadataView(MetadataMixin, AsyncCorsAllowOriginView):
+    """Get metadata for an upload given a token (ASGI deployment only)"""
+
+    async def get(self, request, *args, **kwargs):
+        token = self.kwargs['token']
+        entry = self._get_checked_entry(await aget_cached_metadata([token]), token)
+        if entry is None:
+            upload = await Upload.objects.afrom_token(token)
+            if not upload:
+                raise FileReferenceNotFound()
+            validators = get_metadata_validators(upload)
+        else:
+            validators = entry['validators']
+
+        not_modified_response = get_not_modified_response(request, *validators)
+        if not_modified_response:
+            return not_modified_response
+
+        if entry is None:
+            # The file is read in a worker thread, so that the event loop is not blocked by the disk
+            if not await sync_to_async(self._is_valid_checksum, thread_sensitive=False)(upload):
+                raise HashMismatch()
+            metadata = self._build_metadata_response(upload, token)
+            if self.use_metadata_cache:
+                entry = get_metadata_cache_entry(metadata, upload, is_checked=True)
+                await acache_metadata(token, upload.token_expires_at, upload.uuid, entry)
+        else:
+            metadata = get_metadata_from_cache_entry(entry, token)
+        return set_validators(JsonResponse(metadata, encoder=JSONEncoder), *validators)
+
+
 class MetadataSampleFileView(MetadataView):
+    # The name of the metadata depends on whether the file exists, which may change at any time
+    use_metadata_cache = False
+
     def _is_valid_checksum(self, upload):
         if self.__is_file_exist_on_disk(upload):
             return super()._is_valid_checksum(upload)
@@ -106,8 +200,8 @@ class MetadataSampleFileView(MetadataView):
         return get_upload_metadata(token, upload, filename)
 
     def __is_file_exist_on_disk(self, upload) -> bool:
-        file_field = upload.get_file()
-        return file_field.storage.exists(file_field.name)
+        from osis_document.sample_files import is_file_exist_on_disk
+        return is_file_exist_on_disk(upload.get_file())
 
 
 class MetadataListSchema(AutoSchema):  # pragma: no cover
@@ -157,30 +251,33 @@ class MetadataListSchema(AutoSchema):  # pragma: no cover
         return operation
 
 
-class MetadataListView(CorsAllowOriginMixin, APIView):
-    """Get metadata of uploads whose tokens are specified"""
+class MetadataListMixin:
+    """Metadata of the uploads of several tokens, shared by the synchronous and asynchronous views"""
 
     name = 'get-several-metadata'
-    authentication_classes = []
-    permission_classes = []
-    schema = MetadataListSchema()
+    use_metadata_cache = True
 
-    def post(self, *args, **kwargs):
-        metadata = {
+    def _get_default_metadata(self, token_values):
+        return {
             token: {'error': DocumentError.get_dict_error(DocumentError.TOKEN_NOT_FOUND.name)}
-            for token in self.request.data
+            for token in token_values
         }
 
-        tokens = Token.objects.filter(
-            token__in=self.request.data,
-            expires_at__gt=Now(),
-        ).exclude(
-            upload__status=FileStatus.DELETED.name
-        ).select_related('upload')
+    def _get_tokens(self, token_values):
+        return self._filter_readable_tokens(Token.objects.resolve_many(token_values))
 
-        for token in tokens:
-            metadata[token.token] = self._build_metadata_response(token)
-        return Response(metadata)
+    async def _aget_tokens(self, token_values):
+        return self._filter_readable_tokens(await Token.objects.aresolve_many(token_values))
+
+    @staticmethod
+    def _filter_readable_tokens(tokens):
+        # The stateless read tokens are not stored, their expiration date can only be checked once they are resolved
+        now = timezone.now()
+        return [
+            token
+            for token in tokens.values()
+            if token.expires_at > now and token.upload.status != FileStatus.DELETED.name
+        ]
 
     def _build_metadata_response(self, token):
         return get_upload_metadata(
@@ -189,7 +286,56 @@ class MetadataListView(CorsAllowOriginMixin, APIView):
             filename=token.upload.file.name,
         )
 
+
+class MetadataListView(NonAtomicRequestsMixin, MetadataListMixin, CorsAllowOriginMixin, APIView):
+    """Get metadata of uploads whose tokens are specified"""
+
+    authentication_classes = []
+    permission_classes = []
+    schema = MetadataListSchema()
+
+    def post(self, *args, **kwargs):
+        metadata = self._get_default_metadata(self.request.data)
+        cached_entries = get_cached_metadata(self.request.data) if self.use_metadata_cache else {}
+        for token, entry in cached_entries.items():
+            metadata[token] = get_metadata_from_cache_entry(entry, token)
+
+        # Only the tokens missing from the cache are looked up in the database
+        missing_tokens = [token for token in self.request.data if token not in cached_entries]
+        for token in self._get_tokens(missing_tokens):
+            metadata[token.token] = self._build_metadata_response(token)
+            if self.use_metadata_cache:
+                entry = get_metadata_cache_entry(metadata[token.token], token.upload, is_checked=False)
+                cache_metadata(token.token, token.expires_at, token.upload_id, entry)
+        return Response(metadata)
+
+
+class AsyncMetadataListView(MetadataListMixin, AsyncCorsAllowOriginView):
+    """Get metadata of uploads whose tokens are specified (ASGI deployment only)"""
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            token_values = json.loads(request.body)
+        except ValueError as e:
+            raise ParseError(str(e))
+
+        metadata = self._get_default_metadata(token_values)
+        cached_entries = await aget_cached_metadata(token_values) if self.use_metadata_cache else {}
+        for token, entry in cached_entries.items():
+            metadata[token] = get_metadata_from_cache_entry(entry, token)
+
+        missing_tokens = [token for token in token_values if token not in cached_entries]
+        for token in await self._aget_tokens(missing_tokens):
+            metadata[token.token] = self._build_metadata_response(token)
+            if self.use_metadata_cache:
+                entry = get_metadata_cache_entry(metadata[token.token], token.upload, is_checked=False)
+                await acache_metadata(token.token, token.expires_at, token.upload_id, entry)
+        return JsonResponse(metadata, encoder=JSONEncoder)
+
+
 class MetadataSampleFileListView(MetadataListView):
+    use_metadata_cache = False
+
     def _build_metadata_response(self, token):
         if self.__is_file_exist_on_disk(token.upload):
             return super()._build_metadata_response(token)
@@ -204,8 +350,8 @@ class MetadataSampleFileListView(MetadataListView):
         )
 
     def __is_file_exist_on_disk(self, upload) -> bool:
-        file_field = upload.get_file()
-        return file_field.storage.exists(file_field.name)
+        from osis_document.sample_files import is_file_exist_on_disk
+        return is_file_exist_on_disk(upload.get_file())
 
 
 class ChangeMetadataSchema(AutoSchema):  # pragma: no cover
@@ -249,17 +395,18 @@ class ChangeMetadataView(CorsAllowOriginMixin, APIView):
     ]
 
     def post(self, *args, **kwargs):
-        token = get_object_or_404(
-            Token.objects.writing_not_expired(),
-            token=self.kwargs['token'],
-        )
+        token = Token.objects.get_writing(self.kwargs['token'])
+        if token is None:
+            raise Http404
+
+        if not isinstance(self.request.data, dict):
+            raise ParseError("The metadata changes must be given as an object")
 
         if any(read_only_field in self.request.data for read_only_field in self.READ_ONLY_METADATA_FIELDS):
             raise PermissionDenied
 
-        upload = token.upload
-        upload.metadata.update(self.request.data)
-        upload.save()
+        # The changes are merged by the database, so that concurrent changes of other keys are not lost
+        upload = Upload.objects.update_metadata(token.upload_id, dict(self.request.data.items()))
 
         metadata = self._build_metadata_response(upload, token)
         return Response(metadata, status=status.HTTP_200_OK)
@@ -287,5 +434,5 @@ class ChangeMetadataSampleFileListView(ChangeMetadataView):
         )
 
     def __is_file_exist_on_disk(self, upload) -> bool:
-        file_field = upload.get_file()
-        return file_field.storage.exists(file_field.name)
+        from osis_document.sample_files import is_file_exist_on_disk
+        return is_file_exist_on_disk(upload.get_file())
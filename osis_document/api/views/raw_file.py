@@ -23,19 +23,35 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
-import hashlib
+import contextlib
 from datetime import datetime
+from typing import Optional
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.http import FileResponse
 from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
 from rest_framework.schemas.openapi import AutoSchema
 from rest_framework.views import APIView
 
-from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
+from backoffice.settings.rest_framework.utils import (
+    AsyncCorsAllowOriginView,
+    CorsAllowOriginMixin,
+    NonAtomicRequestsMixin,
+)
+from osis_document.api.file_response import (
+    apply_range_request,
+    build_offloaded_file_response,
+    get_not_modified_response,
+    is_file_delivery_offloaded,
+    make_streaming_async,
+    set_validators,
+)
+from osis_document.blob_storage import is_local_storage
 from osis_document.enums import FileStatus
 from osis_document.exceptions import FileInfectedException, TokenNotFound, TokenExpired, FileReferenceNotFound, \
     HashMismatch
+from osis_document.integrity import is_recently_verified, is_valid_checksum, open_verified_file
 from osis_document.models import Upload, Token
 
 
@@ -49,44 +65,54 @@ class RawFileSchema(AutoSchema):  # pragma: no cover
         return responses
 
 
-class RawFileView(CorsAllowOriginMixin, APIView):
-    """Get raw file from a token"""
-    name = 'raw-file'
-    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
-    authentication_classes = []
-    permission_classes = []
-    schema = RawFileSchema()
-
-    def get(self, request, *args, **kwargs):
-        token = self._get_token(kwargs.get("token"))
-        if not token:
-            raise TokenNotFound()
-
-        if self._is_expired(token):
-            raise TokenExpired()
+def get_readable_upload(token: Optional[Token]) -> Upload:
+    """Return the upload which can be read with the token, or raise the exception describing why it can't be read"""
+    if not token:
+        raise TokenNotFound()
 
-        upload = Upload.objects.from_token(token.token)
-        if not upload:
-            raise FileReferenceNotFound()
+    if token.expires_at < datetime.now():
+        raise TokenExpired()
 
-        if upload.status == FileStatus.INFECTED.name:
-            raise FileInfectedException()
+    upload = token.upload
+    if upload.status == FileStatus.DELETED.name:
+        raise FileReferenceNotFound()
 
-        if not self._is_valid_checksum(upload, token):
-            raise HashMismatch()
+    if upload.status == FileStatus.INFECTED.name:
+        raise FileInfectedException()
 
-        return self._serve_file(request, upload, token)
+    return upload
 
-    def _get_token(self, token_str):
-        return Token.objects.filter(token=token_str).first()
 
-    def _is_expired(self, token):
-        return token.expires_at < datetime.now()
+class RawFileMixin:
+    """Serving of the raw file of a token, shared by the synchronous and asynchronous views"""
+    name = 'raw-file'
+    cors_allowed_headers = ["Content-Type", "Range", "If-Range", "If-None-Match", "If-Modified-Since"]
+    cors_exposed_headers = ["Accept-Ranges", "Content-Range", "Content-Length", "ETag", "Last-Modified"]
+
+    def _get_validators(self, upload, token):
+        etag = '"{}"'.format(upload.get_hash(modified=token.for_modified_upload))
+        last_modified = upload.modified_at
+        if token.for_modified_upload:
+            with contextlib.suppress(Upload.modified_upload.RelatedObjectDoesNotExist):
+                last_modified = upload.modified_upload.modified_at
+        return etag, last_modified
+
+    def _check_integrity_while_streaming(self):
+        # The hash can't be computed while serving byte ranges or when the file is served by the front server, so in
+        # these cases it is checked beforehand
+        return (
+            settings.OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK
+            and 'HTTP_RANGE' not in self.request.META
+            and not is_file_delivery_offloaded()
+        )
 
     def _is_valid_checksum(self, upload, token):
-        with upload.get_file(modified=token.for_modified_upload).open() as file:
-            file_hash = hashlib.sha256(file.read()).hexdigest()
-        return upload.get_hash(modified=token.for_modified_upload) == file_hash
+        if is_recently_verified(upload.get_version(modified=token.for_modified_upload)):
+            return True
+        return is_valid_checksum(
+            upload.get_file(modified=token.for_modified_upload),
+            upload.get_hash(modified=token.for_modified_upload),
+        )
 
     def _serve_file(self, request, upload, token):
         kwargs = {}
@@ -94,6 +120,8 @@ class RawFileView(CorsAllowOriginMixin, APIView):
             kwargs = dict(as_attachment=True, filename=upload.metadata.get("name"))
 
         response = self._build_file_response(upload, token, **kwargs)
+        set_validators(response, *self._get_validators(upload, token))
+        response = apply_range_request(request, response)
         domain_list = getattr(settings, "OSIS_DOCUMENT_DOMAIN_LIST", [])
         if domain_list:
             response["Content-Security-Policy"] = "frame-ancestors {};".format(" ".join(domain_list))
@@ -101,10 +129,68 @@ class RawFileView(CorsAllowOriginMixin, APIView):
         return response
 
     def _build_file_response(self, upload, token, **kwargs):
-        return FileResponse(
-            upload.get_file(modified=token.for_modified_upload).open("rb"),
-            **kwargs,
-        )
+        file = upload.get_file(modified=token.for_modified_upload)
+        # Only the files having a path on the local disk can be sent by the front server
+        if is_file_delivery_offloaded() and is_local_storage(file.storage):
+            response = build_offloaded_file_response(
+                file_path=file.path,
+                internal_uri=settings.OSIS_DOCUMENT_X_ACCEL_REDIRECT_PREFIX + file.name,
+                **kwargs,
+            )
+            if response:
+                return response
+        if self._check_integrity_while_streaming():
+            return FileResponse(
+                open_verified_file(file, upload.get_hash(modified=token.for_modified_upload)),
+                **kwargs,
+            )
+        return FileResponse(file.open("rb"), **kwargs)
+
+
+class RawFileView(NonAtomicRequestsMixin, RawFileMixin, CorsAllowOriginMixin, APIView):
+    """Get raw file from a token"""
+    renderer_classes = [JSONRenderer, TemplateHTMLRenderer]
+    authentication_classes = []
+    permission_classes = []
+    schema = RawFileSchema()
+
+    def get(self, request, *args, **kwargs):
+        token = self._get_token(kwargs.get("token"))
+        upload = get_readable_upload(token)
+
+        # The client already has the current version of the file: neither the file nor its hash need to be read
+        not_modified_response = get_not_modified_response(request, *self._get_validators(upload, token))
+        if not_modified_response:
+            return not_modified_response
+
+        # With the streaming integrity check, the hash is checked while the file is served
+        if not self._check_integrity_while_streaming() and not self._is_valid_checksum(upload, token):
+            raise HashMismatch()
+
+        return self._serve_file(request, upload, token)
+
+    def _get_token(self, token_str):
+        return Token.objects.resolve(token_str)
+
+
+class AsyncRawFileView(RawFileMixin, AsyncCorsAllowOriginView):
+    """Get raw file from a token, without holding a thread while the file is sent (ASGI deployment only)"""
+
+    async def get(self, request, *args, **kwargs):
+        token = await Token.objects.aresolve(kwargs.get("token"))
+        upload = get_readable_upload(token)
+
+        not_modified_response = get_not_modified_response(request, *self._get_validators(upload, token))
+        if not_modified_response:
+            return not_modified_response
+
+        # The file is read in a worker thread, so that the event loop is not blocked by the disk
+        is_valid_checksum = sync_to_async(self._is_valid_checksum, thread_sensitive=False)
+        if not self._check_integrity_while_streaming() and not await is_valid_checksum(upload, token):
+            raise HashMismatch()
+
+        response = await sync_to_async(self._serve_file, thread_sensitive=False)(request, upload, token)
+        return make_streaming_async(response)
 
 
 class RawSampleFileView(RawFileView):
@@ -117,14 +203,12 @@ class RawSampleFileView(RawFileView):
         if self.__is_file_exist_on_disk(upload, token):
             return super()._build_file_response(upload, token, **kwargs)
 
-        from osis_document.utils import get_sample_file_resolver
-        file_path = get_sample_file_resolver(upload.mimetype)
-        file_obj = open(file_path, 'rb')
+        from osis_document.sample_files import open_sample_file
         return FileResponse(
-            file_obj,
+            open_sample_file(upload.mimetype),
             **kwargs
         )
 
     def __is_file_exist_on_disk(self, upload, token) -> bool:
-        file_field = upload.get_file(modified=token.for_modified_upload)
-        return file_field.storage.exists(file_field.name)
+        from osis_document.sample_files import is_file_exist_on_disk
+        return is_file_exist_on_disk(upload.get_file(modified=token.for_modified_upload))
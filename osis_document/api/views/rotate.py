@@ -24,20 +24,20 @@
 #
 # ##############################################################################
 
-import hashlib
 from io import BytesIO
 
 from PIL import Image
 from django.core.files.base import ContentFile
+from django.http import Http404
 from django.utils.translation import gettext_lazy as _
 from osis_document.api import serializers
 from drf_spectacular.openapi import AutoSchema
 from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
 from osis_document.enums import TokenAccess
-from osis_document.models import Token
-from osis_document.utils import get_token
+from osis_document.integrity import invalidate_verified_hash
+from osis_document.models import Token, Upload
+from osis_document.utils import calculate_hash, get_token
 from rest_framework import status
-from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -65,10 +65,10 @@ class RotateImageView(CorsAllowOriginMixin, APIView):
     schema = RotateImageSchema()
 
     def post(self, *args, **kwargs):
-        token = get_object_or_404(
-            Token.objects.writing_not_expired(),
-            token=self.kwargs['token'],
-        )
+        # The writing token is consumed at once, so that it is only used once whatever the token store
+        token = Token.objects.consume_writing([self.kwargs['token']]).get(self.kwargs['token'])
+        if token is None:
+            raise Http404
         upload = token.upload
 
         if upload.mimetype.split('/')[0] != 'image':
@@ -80,16 +80,10 @@ class RotateImageView(CorsAllowOriginMixin, APIView):
         image = image.rotate(-self.request.data.get('rotate', 0), expand=True)
         image.save(rotated_photo, original_format)
 
-        upload.file.save(upload.file.name, ContentFile(rotated_photo.getvalue()))
-
-        hash = hashlib.sha256()
-        with upload.file.open('rb') as file:
-            for chunk in file.chunks():
-                hash.update(chunk)
-        upload.metadata['hash'] = hash.hexdigest()
-        upload.save()
+        invalidate_verified_hash(upload.file)
+        upload.file.save(upload.file.name, ContentFile(rotated_photo.getvalue()), save=False)
+        Upload.objects.update_metadata(upload.uuid, {'hash': calculate_hash(upload.file)}, file=upload.file)
 
         # Regenerate new token
-        token.delete()
         token = get_token(upload.uuid, access=TokenAccess.WRITE.name)
         return Response({'token': token}, status=status.HTTP_200_OK)
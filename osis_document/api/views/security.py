@@ -27,6 +27,8 @@ from osis_document.api import serializers
 from backoffice.settings.rest_framework.permissions import APIKeyPermission
 from drf_spectacular.openapi import AutoSchema
 from osis_document.enums import FileStatus
+from osis_document.metadata_cache import invalidate_metadata
+from osis_document.models import Blob, Upload
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -62,6 +64,10 @@ class DeclareFileAsInfectedView(APIView):
         input_serializer_data.is_valid(raise_exception=True)
         validated_data = input_serializer_data.validated_data
         upload = validated_data.get('path')
-        upload.status = FileStatus.INFECTED.name
-        upload.save()
+        # The content may be shared by several uploads with the content-addressed storage
+        infected_uploads = Upload.objects.filter(file=upload.file.name)
+        infected_uuids = list(infected_uploads.values_list('uuid', flat=True))
+        infected_uploads.update(status=FileStatus.INFECTED.name)
+        Blob.objects.filter(name=upload.file.name).update(infected=True)
+        invalidate_metadata(*infected_uuids)
         return Response({'uuid': upload.uuid}, status.HTTP_202_ACCEPTED)
@@ -39,8 +39,10 @@ from backoffice.settings.rest_framework.permissions import APIKeyPermission
 from drf_spectacular.openapi import AutoSchema
 from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
 from osis_document.enums import FileStatus
+from osis_document.metadata_cache import invalidate_metadata
 from osis_document.models import Upload
-from osis_document.utils import calculate_hash, confirm_upload, get_token
+from osis_document.upload_handlers import IngestUploadMixin
+from osis_document.utils import calculate_hash, confirm_upload, confirm_uploads, get_token
 
 
 class RequestUploadSchema(AutoSchema):  # pragma: no cover
@@ -71,7 +73,7 @@ class UploadUserThrottle(UserRateThrottle):
         return settings.OSIS_DOCUMENT_UPLOAD_LIMIT
 
 
-class RequestUploadView(CorsAllowOriginMixin, APIView):
+class RequestUploadView(IngestUploadMixin, CorsAllowOriginMixin, APIView):
     """Receive a file (from VueJS) and create a temporary upload object"""
 
     name = 'request-upload'
@@ -141,6 +143,67 @@ class ConfirmUploadView(CorsAllowOriginMixin, APIView):
         return Response({'uuid': uuid}, status.HTTP_201_CREATED)
 
 
+class ConfirmUploadBatchSchema(AutoSchema):  # pragma: no cover
+    serializer_mapping = {
+        'POST': serializers.ConfirmUploadBatchRequestSerializer,
+    }
+
+    def get_operation_id(self):
+        return 'confirmUploads'
+
+    def get_responses(self, path, method):
+        responses = super().get_responses(path, method)
+        responses['201'] = {
+            'description': 'Association between the tokens and the uuids of the confirmed uploads',
+            'content': {
+                'application/json': {
+                    'schema': {
+                        'type': 'object',
+                        'additionalProperties': {
+                            'oneOf': [
+                                {'$ref': '#/components/schemas/ConfirmUploadResponse'},
+                                {'$ref': '#/components/schemas/ErrorWithStatus'},
+                            ],
+                        },
+                    },
+                },
+            },
+        }
+        return responses
+
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        operation['security'] = [{"ApiKeyAuth": []}]
+        return operation
+
+
+class ConfirmUploadBatchView(CorsAllowOriginMixin, APIView):
+    """Given several writing tokens and server-to-server request, persist the matching uploads at once"""
+
+    name = 'confirm-uploads'
+    authentication_classes = []
+    permission_classes = [APIKeyPermission]
+    schema = ConfirmUploadBatchSchema()
+
+    def post(self, *args, **kwargs):
+        input_serializer = serializers.ConfirmUploadBatchRequestSerializer(
+            data=self.request.data,
+            context={'related_models': {}},
+        )
+        input_serializer.is_valid(raise_exception=True)
+        results = confirm_uploads([
+            {
+                'token': confirmation['token'],
+                'upload_to': confirmation.get('upload_to'),
+                'document_expiration_policy': confirmation.get('document_expiration_policy'),
+                'metadata': confirmation.get('metadata'),
+                'model_instance': confirmation.get('related_model', {}).get('instance'),
+            }
+            for confirmation in input_serializer.validated_data['uploads']
+        ])
+        return Response(results, status.HTTP_201_CREATED)
+
+
 class DeclareFilesAsDeletedSchema(AutoSchema):  # pragma: no cover
     serializer_mapping = {
         'POST': serializers.DeclareFilesAsDeletedSerializer,
@@ -184,4 +247,5 @@ class DeclareFilesAsDeletedView(CorsAllowOriginMixin, APIView):
                 seconds=settings.OSIS_DOCUMENT_DELETED_UPLOAD_MAX_AGE
             ),
         )
+        invalidate_metadata(*validated_data['files'])
         return Response(status=status.HTTP_204_NO_CONTENT)
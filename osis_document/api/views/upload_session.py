@@ -0,0 +1,119 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.conf import settings
+from drf_spectacular.openapi import AutoSchema
+from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from backoffice.settings.rest_framework.utils import CorsAllowOriginMixin
+from osis_document import upload_sessions
+from osis_document.api import serializers
+from osis_document.api.views.upload import UploadUserThrottle
+from osis_document.models import UploadSession
+from osis_document.utils import get_token
+
+
+class CreateUploadSessionSchema(AutoSchema):  # pragma: no cover
+    serializer_mapping = {
+        'POST': (serializers.UploadSessionRequestSerializer, serializers.UploadSessionSerializer),
+    }
+
+    def get_operation_id(self):
+        return 'createUploadSession'
+
+
+class CreateUploadSessionView(CorsAllowOriginMixin, APIView):
+    """Start an upload sent in several chunks (from VueJS), which can be resumed after a network failure"""
+
+    name = 'create-upload-session'
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [UploadUserThrottle]
+    parser_classes = [JSONParser]
+    schema = CreateUploadSessionSchema()
+
+    def post(self, request, *args, **kwargs):
+        serializer = serializers.UploadSessionRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status.HTTP_400_BAD_REQUEST)
+        session = UploadSession.objects.create(
+            chunk_size=settings.OSIS_DOCUMENT_UPLOAD_CHUNK_SIZE,
+            **serializer.validated_data,
+        )
+        return Response(serializers.UploadSessionSerializer(session).data, status.HTTP_201_CREATED)
+
+
+class UploadSessionView(CorsAllowOriginMixin, APIView):
+    """Get the progress of an upload session, to know from which chunk to resume it"""
+
+    name = 'upload-session'
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        session = upload_sessions.get_session(self.kwargs['pk'])
+        return Response(serializers.UploadSessionSerializer(session).data)
+
+
+class UploadChunkView(CorsAllowOriginMixin, APIView):
+    """Receive a chunk of an upload session, as the raw body of the request"""
+
+    name = 'upload-chunk'
+    authentication_classes = []
+    permission_classes = []
+    cors_allowed_methods = ["PUT"]
+
+    def put(self, request, *args, **kwargs):
+        session = upload_sessions.get_session(self.kwargs['pk'])
+        # The body is read directly, without parsing it, up to one byte more than a chunk to detect larger ones
+        data = request.read(session.chunk_size + 1)
+        session = upload_sessions.write_chunk(session.uuid, self.kwargs['index'], data)
+        return Response(serializers.UploadSessionSerializer(session).data)
+
+
+class FinalizeUploadSessionSchema(AutoSchema):  # pragma: no cover
+    serializer_mapping = {
+        'POST': serializers.RequestUploadResponseSerializer,
+    }
+
+    def get_operation_id(self):
+        return 'finalizeUploadSession'
+
+
+class FinalizeUploadSessionView(CorsAllowOriginMixin, APIView):
+    """Create the temporary upload object of a complete upload session, as if it had been sent at once"""
+
+    name = 'finalize-upload-session'
+    authentication_classes = []
+    permission_classes = []
+    schema = FinalizeUploadSessionSchema()
+
+    def post(self, request, *args, **kwargs):
+        upload = upload_sessions.finalize(self.kwargs['pk'])
+        # Create a writing token to allow persistance
+        return Response({'token': get_token(upload.uuid)}, status.HTTP_201_CREATED)
@@ -0,0 +1,96 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import zipfile
+from typing import BinaryIO, Iterator, List, Optional
+
+# Size of the chunks read from the files added to the archive
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipWriteBuffer:
+    """Unseekable file object receiving the archive, emptied each time the archive data is sent"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    ZIP archive built on the fly: each method yields the archive data as soon as it is produced, so that the memory
+    used does not depend on the size of the archive. As the output is not seekable, the sizes and checksums of the
+    entries are written after their content (data descriptors).
+    """
+
+    def __init__(self):
+        self._buffer = _ZipWriteBuffer()
+        self._zip_file = zipfile.ZipFile(self._buffer, mode='w', allowZip64=True)
+
+    def write_file(self, name: str, file: BinaryIO, size: Optional[int] = None, compress=True) -> Iterator[bytes]:
+        """
+        Add the content of the file to the archive. If reading the file fails, the data already sent can't be taken
+        back, but the entry is left out of the central directory of the archive, so that it is not part of it.
+        """
+        zip_info = zipfile.ZipInfo(name)
+        zip_info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        # The expected size is needed to know whether the entry needs ZIP64 extensions
+        zip_info.file_size = size or 0
+        try:
+            with self._zip_file.open(zip_info, mode='w', force_zip64=size is None) as entry:
+                for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                    entry.write(chunk)
+                    yield from self._flush()
+        except Exception:
+            self._zip_file.filelist.remove(zip_info)
+            del self._zip_file.NameToInfo[name]
+            # The data of the entry is still sent, as the positions of the next entries include it
+            yield from self._flush()
+            raise
+        yield from self._flush()
+
+    def write_bytes(self, name: str, data: bytes, compress=True) -> Iterator[bytes]:
+        self._zip_file.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        yield from self._flush()
+
+    def close(self) -> Iterator[bytes]:
+        self._zip_file.close()
+        yield from self._flush()
+
+    def _flush(self) -> Iterator[bytes]:
+        data = self._buffer.pop()
+        if data:
+            yield data
@@ -37,6 +37,8 @@ class OsisDocumentConfig(AppConfig):
     verbose_name = _("Documents")
 
     def ready(self):
+        from osis_document.enums import FileDelivery
+
         settings.OSIS_DOCUMENT_API_SHARED_SECRET = os.environ.get('OSIS_DOCUMENT_API_SHARED_SECRET')
         if settings.OSIS_DOCUMENT_API_SHARED_SECRET is None:
             raise ImproperlyConfigured("You sould set OSIS_DOCUMENT_API_SHARED_SECRET")
@@ -52,6 +54,21 @@ class OsisDocumentConfig(AppConfig):
         ).split()
         settings.OSIS_DOCUMENT_UPLOAD_LIMIT = os.environ.get('OSIS_DOCUMENT_UPLOAD_LIMIT', '10/minute')
         settings.OSIS_DOCUMENT_TOKEN_MAX_AGE = int(os.environ.get('OSIS_DOCUMENT_TOKEN_MAX_AGE', 60 * 15))
+        settings.OSIS_DOCUMENT_STATELESS_READ_TOKENS = os.environ.get(
+            'OSIS_DOCUMENT_STATELESS_READ_TOKENS',
+            'False',
+        ).lower() == 'true'
+        settings.OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW = int(os.environ.get(
+            'OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW',
+            0,
+        ))
+        settings.OSIS_DOCUMENT_TOKEN_STORE = os.environ.get(
+            'OSIS_DOCUMENT_TOKEN_STORE',
+            'osis_document.token_stores.DatabaseTokenStore',
+        )
+        settings.OSIS_DOCUMENT_TOKEN_STORE_CACHE = os.environ.get('OSIS_DOCUMENT_TOKEN_STORE_CACHE', 'default')
+        settings.OSIS_DOCUMENT_TOKEN_CACHE_SIZE = int(os.environ.get('OSIS_DOCUMENT_TOKEN_CACHE_SIZE', 1024))
+        settings.OSIS_DOCUMENT_TOKEN_CACHE_TTL = int(os.environ.get('OSIS_DOCUMENT_TOKEN_CACHE_TTL', 60))
         settings.OSIS_DOCUMENT_TEMP_UPLOAD_MAX_AGE = int(os.environ.get('OSIS_DOCUMENT_TEMP_UPLOAD_MAX_AGE', 60 * 15))
         settings.OSIS_DOCUMENT_EXPORT_EXPIRATION_POLICY_AGE = int(os.environ.get(
             'OSIS_DOCUMENT_EXPORT_EXPIRATION_POLICY_AGE',
@@ -73,3 +90,85 @@ class OsisDocumentConfig(AppConfig):
             'osis_document.api.views.metadata.ChangeMetadataView',
         )
         settings.TEMPLATES_RAW_FILE_DIR = os.environ.get('TEMPLATES_RAW_FILE_DIR', None)
+        settings.OSIS_DOCUMENT_SAMPLE_FILE_CACHE_MAX_FILE_SIZE = int(os.environ.get(
+            'OSIS_DOCUMENT_SAMPLE_FILE_CACHE_MAX_FILE_SIZE',
+            10 * 1024 * 1024,
+        ))
+        settings.OSIS_DOCUMENT_MISSING_FILE_CACHE_TTL = int(os.environ.get(
+            'OSIS_DOCUMENT_MISSING_FILE_CACHE_TTL',
+            30,
+        ))
+        settings.OSIS_DOCUMENT_MISSING_FILE_CACHE_SIZE = int(os.environ.get(
+            'OSIS_DOCUMENT_MISSING_FILE_CACHE_SIZE',
+            1024,
+        ))
+        settings.OSIS_DOCUMENT_VERIFIED_HASH_CACHE_TTL = int(os.environ.get(
+            'OSIS_DOCUMENT_VERIFIED_HASH_CACHE_TTL',
+            60 * 60,
+        ))
+        settings.OSIS_DOCUMENT_VERIFIED_HASH_CACHE_SIZE = int(os.environ.get(
+            'OSIS_DOCUMENT_VERIFIED_HASH_CACHE_SIZE',
+            1024,
+        ))
+        settings.OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK = os.environ.get(
+            'OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK',
+            'False',
+        ).lower() == 'true'
+        settings.OSIS_DOCUMENT_FILE_DELIVERY = os.environ.get('OSIS_DOCUMENT_FILE_DELIVERY', FileDelivery.DJANGO.name)
+        if settings.OSIS_DOCUMENT_FILE_DELIVERY not in FileDelivery.get_names():
+            raise ImproperlyConfigured(
+                "OSIS_DOCUMENT_FILE_DELIVERY should be one of {}".format(", ".join(FileDelivery.get_names()))
+            )
+        settings.OSIS_DOCUMENT_FILE_BUNDLE_MAX_FILES = int(os.environ.get('OSIS_DOCUMENT_FILE_BUNDLE_MAX_FILES', 100))
+        settings.OSIS_DOCUMENT_X_ACCEL_REDIRECT_PREFIX = os.environ.get(
+            'OSIS_DOCUMENT_X_ACCEL_REDIRECT_PREFIX',
+            '/protected-media/',
+        )
+        settings.OSIS_DOCUMENT_CLEANUP_BATCH_SIZE = int(os.environ.get('OSIS_DOCUMENT_CLEANUP_BATCH_SIZE', 500))
+        settings.OSIS_DOCUMENT_CLEANUP_MAX_DURATION = int(os.environ.get('OSIS_DOCUMENT_CLEANUP_MAX_DURATION', 60 * 4))
+        settings.OSIS_DOCUMENT_CLEANUP_DELETE_WORKERS = int(os.environ.get('OSIS_DOCUMENT_CLEANUP_DELETE_WORKERS', 4))
+        settings.OSIS_DOCUMENT_PARTITIONED_TOKENS = os.environ.get(
+            'OSIS_DOCUMENT_PARTITIONED_TOKENS',
+            'False',
+        ).lower() == 'true'
+        settings.OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD = int(os.environ.get('OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD', 7))
+        settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_BATCH_SIZE = int(os.environ.get(
+            'OSIS_DOCUMENT_INTEGRITY_SCRUB_BATCH_SIZE',
+            100,
+        ))
+        settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_DURATION = int(os.environ.get(
+            'OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_DURATION',
+            60 * 5,
+        ))
+        settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_BYTES_PER_SECOND = int(os.environ.get(
+            'OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_BYTES_PER_SECOND',
+            20 * 1024 * 1024,
+        ))
+        settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_INTERVAL = int(os.environ.get(
+            'OSIS_DOCUMENT_INTEGRITY_SCRUB_INTERVAL',
+            60 * 60 * 24 * 7,
+        ))
+        settings.OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR = int(os.environ.get(
+            'OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR',
+            0,
+        ))
+        settings.OSIS_DOCUMENT_METADATA_CACHE = os.environ.get('OSIS_DOCUMENT_METADATA_CACHE', 'default')
+        settings.OSIS_DOCUMENT_METADATA_CACHE_TTL = int(os.environ.get('OSIS_DOCUMENT_METADATA_CACHE_TTL', 60 * 5))
+        max_upload_size = os.environ.get('OSIS_DOCUMENT_MAX_UPLOAD_SIZE', str(50 * 1024 * 1024))
+        settings.OSIS_DOCUMENT_MAX_UPLOAD_SIZE = None if max_upload_size == 'None' else int(max_upload_size)
+        settings.OSIS_DOCUMENT_UPLOAD_CHUNK_SIZE = int(os.environ.get(
+            'OSIS_DOCUMENT_UPLOAD_CHUNK_SIZE',
+            5 * 1024 * 1024,
+        ))
+        settings.OSIS_DOCUMENT_UPLOAD_SESSION_MAX_AGE = int(os.environ.get(
+            'OSIS_DOCUMENT_UPLOAD_SESSION_MAX_AGE',
+            60 * 60 * 24,
+        ))
+        settings.OSIS_DOCUMENT_UPLOAD_SESSION_DIR = os.environ.get(
+            'OSIS_DOCUMENT_UPLOAD_SESSION_DIR',
+            os.path.join(settings.MEDIA_ROOT, 'upload_sessions'),
+        )
+        settings.OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE = os.environ.get(
+            'OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE',
+            'False',
+        ).lower() == 'true'
@@ -0,0 +1,220 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import os
+import posixpath
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+BLOB_DIRECTORY = 'blobs'
+
+# A blob which is not referenced anymore is kept at least this long after being stored, so that the upload which
+# stored it has the time to be saved
+BLOB_GRACE_PERIOD = timedelta(hours=1)
+
+
+def get_blob_name(file_hash: str) -> str:
+    return posixpath.join(BLOB_DIRECTORY, file_hash[:2], file_hash[2:4], file_hash)
+
+
+def is_blob_name(name: str) -> bool:
+    return bool(name) and name.startswith(BLOB_DIRECTORY + '/')
+
+
+def is_local_storage(storage: Storage) -> bool:
+    """Whether the files of the storage are on the local file system, and can be opened through their path"""
+    if isinstance(storage, UploadStorage):
+        storage = storage.storage
+    return isinstance(storage, FileSystemStorage)
+
+
+class UploadStorage(Storage):
+    """
+    Storage of the uploaded files, on top of the default storage of the project (STORAGES['default']). When the
+    content-addressed storage is enabled, each content is stored once, named after its hash, and shared by all the
+    uploads with this content. The shared files are not deleted with the uploads: delete_unreferenced_blobs() deletes
+    them once no upload references them anymore.
+
+    The stored files can be moved without being copied.
+    """
+
+    def __init__(self, storage: Optional[Storage] = None):
+        self._storage = storage
+
+    @property
+    def storage(self) -> Storage:
+        # The default storage is looked up on each use, so that it follows the settings
+        return default_storage if self._storage is None else self._storage
+
+    def save(self, name, content, max_length=None):
+        if not settings.OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE:
+            return self.storage.save(name, content, max_length)
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return self._save_blob(content)
+
+    def _save_blob(self, content):
+        from osis_document.models import Blob
+        from osis_document.utils import calculate_hash
+
+        file_hash = calculate_hash(content)
+        blob = Blob.objects.filter(hash=file_hash).first()
+        # Touching the blob prevents it from being deleted while the new reference is saved
+        if blob is not None and self.exists(blob.name) and Blob.objects.filter(pk=blob.pk).update(last_stored_at=timezone.now()):
+            return blob.name
+
+        name = self.storage.save(get_blob_name(file_hash), content)
+        Blob.objects.update_or_create(
+            hash=file_hash,
+            defaults={'name': name, 'size': content.size, 'last_stored_at': timezone.now()},
+        )
+        return name
+
+    def move(self, old_name, new_name, max_length=None) -> str:
+        """
+        Move a stored file to the given name, or to an available name close to it, and return its new name. The file
+        is renamed without being copied, unless it has to be moved to another file system or the storage has no local
+        paths (e.g. an object storage).
+        """
+        if not is_local_storage(self):
+            with self.open(old_name, 'rb') as content:
+                new_name = self.storage.save(new_name, content, max_length=max_length)
+            self.storage.delete(old_name)
+            return new_name
+        old_path = self.path(old_name)
+        while True:
+            new_name = self.get_available_name(new_name, max_length=max_length)
+            new_path = self.path(new_name)
+            self._make_directory(os.path.dirname(new_path))
+            try:
+                # Unlike a rename, a link fails instead of replacing a file created meanwhile
+                os.link(old_path, new_path)
+            except FileExistsError:
+                continue
+            except OSError:
+                # Another file system, or hard links not supported
+                try:
+                    file_move_safe(old_path, new_path, allow_overwrite=False)
+                except FileExistsError:
+                    continue
+            else:
+                os.remove(old_path)
+            return new_name
+
+    def _make_directory(self, directory):
+        directory_permissions_mode = getattr(self.storage, 'directory_permissions_mode', None)
+        if directory_permissions_mode is not None:
+            # Set the umask because os.makedirs() doesn't apply the "mode" argument to intermediate-level directories
+            old_umask = os.umask(0o777 & ~directory_permissions_mode)
+            try:
+                os.makedirs(directory, directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def delete(self, name):
+        if is_blob_name(name):
+            # Possibly shared with other uploads, see delete_unreferenced_blobs()
+            return
+        self.storage.delete(name)
+
+    def delete_blob(self, name):
+        self.storage.delete(name)
+
+    # The other operations are those of the underlying storage
+
+    def open(self, name, mode='rb'):
+        return self.storage.open(name, mode)
+
+    def get_valid_name(self, name):
+        return self.storage.get_valid_name(name)
+
+    def get_alternative_name(self, file_root, file_ext):
+        return self.storage.get_alternative_name(file_root, file_ext)
+
+    def get_available_name(self, name, max_length=None):
+        return self.storage.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.storage.generate_filename(filename)
+
+    def path(self, name):
+        return self.storage.path(name)
+
+    def exists(self, name):
+        return self.storage.exists(name)
+
+    def listdir(self, path):
+        return self.storage.listdir(path)
+
+    def size(self, name):
+        return self.storage.size(name)
+
+    def url(self, name):
+        return self.storage.url(name)
+
+    def get_accessed_time(self, name):
+        return self.storage.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.storage.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.storage.get_modified_time(name)
+
+
+upload_storage = UploadStorage()
+
+
+def get_upload_storage() -> UploadStorage:
+    """Storage of the file fields of the uploads, given by a callable so that it is not frozen in the migrations"""
+    return upload_storage
+
+
+def delete_unreferenced_blobs() -> int:
+    """Delete the blobs which are not referenced by any upload anymore, with their file, and return their number"""
+    from osis_document.models import Blob, ModifiedUpload, Upload
+
+    threshold = timezone.now() - BLOB_GRACE_PERIOD
+    unreferenced_blobs = Blob.objects.filter(
+        ~Exists(Upload.objects.filter(file=OuterRef('name'))),
+        ~Exists(ModifiedUpload.objects.filter(file=OuterRef('name'))),
+        last_stored_at__lte=threshold,
+    )
+    deleted = 0
+    for blob in unreferenced_blobs.iterator():
+        # Not deleted if it has been stored again since it was selected
+        if Blob.objects.filter(pk=blob.pk, last_stored_at__lte=threshold).delete()[0]:
+            upload_storage.delete_blob(blob.name)
+            deleted += 1
+    return deleted
@@ -0,0 +1,205 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from osis_document import blob_storage, token_partitions, upload_sessions
+from osis_document.blob_storage import is_blob_name, upload_storage
+from osis_document.enums import FileStatus
+from osis_document.metadata_cache import invalidate_metadata
+from osis_document.models import TaskCheckpoint, Token, Upload
+
+logger = logging.getLogger('default')
+
+CHECKPOINT_NAME = 'cleanup_old_uploads'
+
+
+def cleanup_old_uploads() -> Dict:
+    """
+    Delete the stale uploads with their files batch by batch in the order of their keys, then the expired tokens batch
+    by batch in the order of their expiration, and then the expired upload sessions and the unreferenced blobs. With
+    OSIS_DOCUMENT_PARTITIONED_TOKENS, the expired tokens are dropped with their daily partitions instead. The walk
+    stops after OSIS_DOCUMENT_CLEANUP_MAX_DURATION seconds and resumes from where it stopped on the next call. Return a
+    report of the run: the number of deleted rows, files and bytes.
+    """
+    checkpoint, _ = TaskCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    deadline = time.monotonic() + settings.OSIS_DOCUMENT_CLEANUP_MAX_DURATION
+    report = {
+        'uploads': 0,
+        'files': 0,
+        'bytes': 0,
+        'tokens': 0,
+        'token_partitions': 0,
+        'sessions': 0,
+        'blobs': 0,
+        'complete': False,
+    }
+
+    stages = [
+        ('uploads', _delete_stale_uploads),
+        ('tokens', _delete_expired_tokens),
+    ]
+    stage_names = [name for name, _ in stages]
+    start_index = stage_names.index(checkpoint.position['stage']) if checkpoint.position else 0
+    for stage, delete_batch in stages[start_index:]:
+        last_key = checkpoint.position.get('last_key') if checkpoint.position.get('stage') == stage else None
+        while True:
+            if time.monotonic() >= deadline:
+                _log_report(report)
+                return report
+            last_key = delete_batch(last_key, report)
+            if last_key is None:
+                break
+            checkpoint.position = {'stage': stage, 'last_key': last_key}
+            checkpoint.save()
+
+    # The whole walk is done: the next one starts from the beginning
+    checkpoint.position = {}
+    checkpoint.save()
+
+    # Clean upload sessions not finalized in time, with their received chunks
+    report['sessions'] = upload_sessions.delete_expired_sessions()
+
+    # Clean contents shared by the content-addressed storage which are not referenced by any upload anymore
+    report['blobs'] = blob_storage.delete_unreferenced_blobs()
+
+    report['complete'] = True
+    _log_report(report)
+    return report
+
+
+def _get_stale_uploads(last_key: Optional[str]):
+    # Clean Upload which are stale 2 case:
+    #   - State "REQUESTED" and delay in temporary storage expired (= Upload not confirm by client)
+    #   - Upload expired (= Storage delay expired - XLS export, PDF one time generation, ...)
+    queryset = Upload.objects.filter(
+        Q(
+            status=FileStatus.REQUESTED.name,
+            uploaded_at__lte=now() - timedelta(seconds=settings.OSIS_DOCUMENT_TEMP_UPLOAD_MAX_AGE)
+        ) |
+        Q(
+            expires_at__lte=now()
+        ),
+    ).order_by('uuid')
+    if last_key is not None:
+        queryset = queryset.filter(uuid__gt=last_key)
+    return queryset
+
+
+def _delete_stale_uploads(last_key: Optional[str], report: Dict) -> Optional[str]:
+    """Delete a batch of stale uploads after the key, return the key of the last one, or None if there is none left"""
+    with transaction.atomic():
+        # The rows are locked until they are deleted, the ones locked by a request are left to the next walk
+        batch = list(_get_stale_uploads(last_key).select_for_update(skip_locked=True, of=('self',)).values_list(
+            'uuid',
+            'file',
+            'size',
+            'modified_upload__file',
+            'modified_upload__size',
+        )[:settings.OSIS_DOCUMENT_CLEANUP_BATCH_SIZE])
+        if not batch:
+            return None
+
+        uuids = [uuid for uuid, *_ in batch]
+        _, deleted_by_model = Upload.objects.filter(uuid__in=uuids).delete()
+        report['uploads'] += deleted_by_model.get(Upload._meta.label, 0)
+        invalidate_metadata(*uuids)
+        files = [
+            (name, size)
+            for _, *row in batch
+            for name, size in (row[:2], row[2:])
+            if name
+        ]
+        # The files are only deleted once the deletion of their uploads is committed, so that no upload is left
+        # without its file if the transaction is rolled back
+        transaction.on_commit(lambda: _delete_files(files, report))
+    return str(uuids[-1])
+
+
+def _delete_files(files: List[Tuple[str, int]], report: Dict):
+    with ThreadPoolExecutor(max_workers=settings.OSIS_DOCUMENT_CLEANUP_DELETE_WORKERS) as executor:
+        for deleted_size in executor.map(_delete_file, files):
+            if deleted_size is not None:
+                report['files'] += 1
+                report['bytes'] += deleted_size
+
+
+def _delete_file(file: Tuple[str, int]) -> Optional[int]:
+    """Delete a file of the upload storage, return its size, or None if it has not been deleted"""
+    name, size = file
+    # The contents shared by the content-addressed storage are deleted once they are not referenced anymore
+    if is_blob_name(name):
+        return None
+    try:
+        upload_storage.delete(name)
+    except OSError as e:
+        logger.error("The file {} of a deleted upload could not be deleted: {}".format(name, e))
+        return None
+    return size or 0
+
+
+def _delete_expired_tokens(last_key: Optional[int], report: Dict) -> Optional[int]:
+    if settings.OSIS_DOCUMENT_PARTITIONED_TOKENS and _drop_expired_token_partitions(report):
+        return None
+    # The expired tokens are deleted from the first to expire, so no position is needed to resume: the key only counts
+    # the tokens deleted by the walk, which goes on while the batches are full
+    deleted = Token.objects.delete_expired(settings.OSIS_DOCUMENT_CLEANUP_BATCH_SIZE)
+    report['tokens'] += deleted
+    if deleted < settings.OSIS_DOCUMENT_CLEANUP_BATCH_SIZE:
+        return None
+    return (last_key or 0) + deleted
+
+
+def _drop_expired_token_partitions(report: Dict) -> bool:
+    """Drop the expired partitions of the partitioned token tables, return whether the Token table is partitioned"""
+    partitioned_models = []
+    for model in token_partitions.get_partitioned_models():
+        if not token_partitions.is_partitioned(model):
+            logger.warning("The table {} is not partitioned yet, see partition_tokens".format(model._meta.db_table))
+            continue
+        # The expired tokens are dropped a whole day at a time, the partitions of the next days are created beforehand
+        token_partitions.create_partitions(model)
+        report['token_partitions'] += len(token_partitions.drop_expired_partitions(model))
+        partitioned_models.append(model)
+    return Token in partitioned_models
+
+
+def _log_report(report: Dict):
+    logger.info(
+        "Cleanup of the old uploads ({}): {uploads} uploads, {files} files ({bytes} bytes), {tokens} tokens, "
+        "{token_partitions} token partitions, {sessions} upload sessions and {blobs} blobs deleted".format(
+            'complete' if report['complete'] else 'interrupted',
+            **report,
+        )
+    )
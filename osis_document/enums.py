@@ -64,6 +64,12 @@ class FileStatus(ChoiceEnum):
     INFECTED = _('Infected')
 
 
+class VerificationStatus(ChoiceEnum):
+    VALID = _('Valid')
+    HASH_MISMATCH = _('Hash mismatch')
+    MISSING = _('Missing file')
+
+
 class TokenAccess(ChoiceEnum):
     READ = _('Read')
     WRITE = _('Write')
@@ -74,7 +80,9 @@ class DocumentError(ChoiceEnum):
     HASH_MISMATCH = _('Hash check failed')
     MIME_MISMATCH = _('MIME type mismatch')
     TOKEN_NOT_FOUND = _('Token not found')
+    TOKEN_EXPIRED = _('Token has expired')
     UPLOAD_NOT_FOUND = _('Upload not found')
+    UPLOAD_NOT_MOVED = _('Failed to move uploaded file')
 
     @classmethod
     def get_dict_error(cls, key):
@@ -121,6 +129,12 @@ class DocumentExpirationPolicy(ChoiceEnum):
             )
 
 
+class FileDelivery(ChoiceEnum):
+    DJANGO = _('Django')
+    X_ACCEL_REDIRECT = _('X-Accel-Redirect (nginx)')
+    X_SENDFILE = _('X-Sendfile (Apache, lighttpd)')
+
+
 class MimeTypeEnums(ChoiceEnum):
     JPEG = 'image/jpeg'
     JPG = 'image/jpeg'
@@ -57,6 +57,27 @@ class MimeMismatch(APIException):
     default_detail = DocumentError.MIME_MISMATCH.value
 
 
+class UploadSessionNotFound(APIException):
+    status_code = 404
+    default_detail = _("Upload session not found or expired")
+    default_code = "not_found"
+
+
+class UnexpectedChunk(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("Unexpected chunk: the chunks must be sent in order")
+
+
+class InvalidChunkSize(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = _("Invalid chunk size")
+
+
+class UploadIncomplete(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("The upload is not complete")
+
+
 class FileInfectedException(APIException):
     default_detail = DocumentError.INFECTED.value
 
@@ -90,3 +111,7 @@ class SaveRawContentRemotelyException(Exception):
         self.api_response = api_response
         self.message = f"An error occured during uploading file to OSIS-Document server. Error:{self.api_response.text}"
         super().__init__(self.message)
+
+
+class TokenPartitioningException(Exception):
+    pass
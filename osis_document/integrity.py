@@ -0,0 +1,208 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import contextlib
+import hashlib
+import logging
+import os
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from django.utils.timezone import now
+
+from osis_document.cache import LRUCache
+from osis_document.enums import VerificationStatus
+from osis_document.exceptions import HashMismatch
+
+logger = logging.getLogger('default')
+
+_verified_hash_cache = None
+
+
+def get_verified_hash_cache() -> LRUCache:
+    """Return the process-wide cache of the files whose hash has been successfully checked"""
+    global _verified_hash_cache
+    if _verified_hash_cache is None:
+        _verified_hash_cache = LRUCache(
+            max_size=settings.OSIS_DOCUMENT_VERIFIED_HASH_CACHE_SIZE,
+            ttl=settings.OSIS_DOCUMENT_VERIFIED_HASH_CACHE_TTL,
+        )
+    return _verified_hash_cache
+
+
+def get_file_cache_key(file_field: FieldFile) -> Tuple[str, str, str]:
+    """Return a key identifying the file across the storages, to be used in the in-process caches"""
+    storage = file_field.storage
+    return type(storage).__name__, str(getattr(storage, 'location', '')), file_field.name
+
+
+def get_file_fingerprint(file_field: FieldFile) -> Optional[Tuple]:
+    """
+    Return a tuple identifying the current state of the file on its storage (size, modification time and inode when
+    available), or None if it cannot be determined.
+    """
+    storage = file_field.storage
+    try:
+        stat = os.stat(storage.path(file_field.name))
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+    except NotImplementedError:
+        pass
+    except OSError:
+        return None
+    try:
+        return storage.size(file_field.name), storage.get_modified_time(file_field.name).timestamp()
+    except (NotImplementedError, OSError):
+        return None
+
+
+def is_verified(file_field: FieldFile, expected_hash: str, fingerprint: Optional[Tuple] = None) -> bool:
+    """Check, without reading the file, if it has been successfully checked against this hash since its last change"""
+    fingerprint = fingerprint or get_file_fingerprint(file_field)
+    if fingerprint is None:
+        return False
+    return get_verified_hash_cache().get(get_file_cache_key(file_field)) == (fingerprint, expected_hash)
+
+
+def is_valid_checksum(file_field: FieldFile, expected_hash: str) -> bool:
+    """
+    Check that the content of the file matches the expected hash. The file is only read if it has not been
+    successfully checked against this hash since its last change.
+    """
+    fingerprint = get_file_fingerprint(file_field)
+    if is_verified(file_field, expected_hash, fingerprint):
+        return True
+
+    from osis_document.utils import calculate_hash
+
+    with contextlib.closing(file_field):
+        if calculate_hash(file_field) != expected_hash:
+            return False
+
+    mark_as_verified(file_field, expected_hash, fingerprint)
+    return True
+
+
+def is_recently_verified(instance) -> bool:
+    """
+    Check if the file of an upload or modified upload has been found valid by the integrity scrubber since its last
+    change and within the last OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR seconds, so that it doesn't have to be read.
+    """
+    trust_duration = settings.OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR
+    return bool(
+        trust_duration
+        and instance.verification_status == VerificationStatus.VALID.name
+        and instance.last_verified_at is not None
+        and instance.last_verified_at >= instance.modified_at
+        and (now() - instance.last_verified_at).total_seconds() < trust_duration
+    )
+
+
+def mark_as_verified(file_field: FieldFile, expected_hash: str, fingerprint: Optional[Tuple] = None):
+    """Record that the current content of the file matches the expected hash"""
+    fingerprint = fingerprint or get_file_fingerprint(file_field)
+    if fingerprint is not None:
+        get_verified_hash_cache().set(get_file_cache_key(file_field), (fingerprint, expected_hash))
+
+
+def invalidate_verified_hash(file_field: FieldFile):
+    """Forget the previous successful checks of the file, to be called when it is rewritten"""
+    get_verified_hash_cache().delete(get_file_cache_key(file_field))
+
+
+@contextlib.contextmanager
+def keeping_verified_hash(file_field: FieldFile):
+    """
+    Keep the previous successful checks of the file while it is moved to another name. They only still apply if the
+    file is renamed, not if it is copied, as its fingerprint then changes.
+    """
+    verified_hash = get_verified_hash_cache().get(get_file_cache_key(file_field))
+    invalidate_verified_hash(file_field)
+    yield
+    if verified_hash is not None:
+        get_verified_hash_cache().set(get_file_cache_key(file_field), verified_hash)
+
+
+class HashVerifyingFile:
+    """
+    Read-only file wrapper computing the hash of the content while it is read. Reading is done one chunk ahead so
+    that the last chunk is only returned once the whole content has been checked: if the hash does not match, an
+    HashMismatch exception is raised instead, which aborts the ongoing response.
+    """
+
+    def __init__(self, file_field: FieldFile, expected_hash: str):
+        self.file_field = file_field
+        self.expected_hash = expected_hash
+        self.fingerprint = get_file_fingerprint(file_field)
+        self.file = file_field.open('rb')
+        self.name = file_field.name
+        self._hash = hashlib.sha256()
+        self._pending = None
+        self._verified = False
+
+    def _read_and_hash(self, size):
+        chunk = self.file.read(size)
+        self._hash.update(chunk)
+        return chunk
+
+    def _verify(self):
+        if self._verified:
+            return
+        if self._hash.hexdigest() != self.expected_hash:
+            logger.error(
+                "Hash mismatch while serving '%s': the transfer has been aborted",
+                self.file_field.name,
+            )
+            raise HashMismatch()
+        self._verified = True
+        mark_as_verified(self.file_field, self.expected_hash, self.fingerprint)
+
+    def read(self, size=-1):
+        if self._pending is None:
+            self._pending = self._read_and_hash(size)
+        chunk, self._pending = self._pending, self._read_and_hash(size) if self._pending else b''
+        if not self._pending:
+            self._verify()
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Only used to compute the size of the file before it is read
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def open_verified_file(file_field: FieldFile, expected_hash: str):
+    """
+    Open the file for a single-pass streaming: if it has not already been checked, its hash is checked while it is
+    read.
+    """
+    if is_verified(file_field, expected_hash):
+        return file_field.open('rb')
+    return HashVerifyingFile(file_field, expected_hash)
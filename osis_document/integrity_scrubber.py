@@ -0,0 +1,155 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Type, Union
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from osis_document.enums import FileStatus, VerificationStatus
+from osis_document.models import ModifiedUpload, TaskCheckpoint, Upload
+from osis_document.utils import calculate_hash
+
+logger = logging.getLogger('default')
+
+CHECKPOINT_NAME = 'verify_uploads_integrity'
+
+# The scrubbed models, walked in this order, with the unique UUID column used for the keyset pagination
+SCRUBBED_MODELS = [
+    (Upload, 'uuid'),
+    (ModifiedUpload, 'upload_id'),
+]
+
+
+class IORateLimiter:
+    """Slow down the caller so that the bytes it reads don't exceed a rate (in bytes per second, 0 for unlimited)"""
+
+    def __init__(self, max_bytes_per_second: int):
+        self.max_bytes_per_second = max_bytes_per_second
+        self._started_at = time.monotonic()
+        self._bytes_read = 0
+
+    def consume(self, size: int):
+        if self.max_bytes_per_second <= 0:
+            return
+        self._bytes_read += size
+        delay = self._bytes_read / self.max_bytes_per_second - (time.monotonic() - self._started_at)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def verify_uploads_integrity() -> Dict:
+    """
+    Check the hash of the stored files of the uploads and modified uploads, batch by batch, and record the date and
+    result of the check on each of them. The walk stops after OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_DURATION seconds and
+    resumes from where it stopped on the next call. Return a report of the run.
+    """
+    checkpoint, _ = TaskCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+    deadline = time.monotonic() + settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_DURATION
+    rate_limiter = IORateLimiter(settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_BYTES_PER_SECOND)
+    report = {
+        'verified': 0,
+        VerificationStatus.HASH_MISMATCH.name: [],
+        VerificationStatus.MISSING.name: [],
+        'complete': False,
+    }
+
+    model_names = [model.__name__ for model, _ in SCRUBBED_MODELS]
+    start_index = model_names.index(checkpoint.position['model']) if checkpoint.position else 0
+    for model, key in SCRUBBED_MODELS[start_index:]:
+        last_key = checkpoint.position.get('last_key') if checkpoint.position.get('model') == model.__name__ else None
+        while True:
+            batch = list(_get_queryset(model, key, last_key)[:settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_BATCH_SIZE])
+            if not batch:
+                break
+
+            verified = []
+            for instance in batch:
+                if time.monotonic() >= deadline:
+                    break
+                _verify(instance, rate_limiter, report)
+                verified.append(instance)
+            if verified:
+                model.objects.bulk_update(verified, ['last_verified_at', 'verification_status'])
+                last_key = str(getattr(verified[-1], key))
+                checkpoint.position = {'model': model.__name__, 'last_key': last_key}
+                checkpoint.save()
+            if len(verified) < len(batch):
+                return report
+
+    # The whole walk is done: the next one starts from the beginning
+    checkpoint.position = {}
+    checkpoint.save()
+    report['complete'] = True
+    return report
+
+
+def _get_queryset(model: Type[Union[Upload, ModifiedUpload]], key: str, last_key=None):
+    upload_prefix = '' if model is Upload else 'upload__'
+    queryset = model.objects.filter(
+        Q(last_verified_at__isnull=True)
+        | Q(last_verified_at__lt=now() - timedelta(seconds=settings.OSIS_DOCUMENT_INTEGRITY_SCRUB_INTERVAL)),
+        **{upload_prefix + 'status': FileStatus.UPLOADED.name},
+    ).order_by(key)
+    if model is ModifiedUpload:
+        queryset = queryset.select_related('upload')
+    if last_key is not None:
+        queryset = queryset.filter(**{key + '__gt': last_key})
+    return queryset
+
+
+def _verify(instance: Union[Upload, ModifiedUpload], rate_limiter: IORateLimiter, report: Dict):
+    if isinstance(instance, ModifiedUpload):
+        upload, expected_hash = instance.upload, instance.upload.get_hash(modified=True)
+    else:
+        upload, expected_hash = instance, instance.get_hash()
+
+    # The date of the check is taken before reading the file, so that a change made meanwhile is newer than the check
+    instance.last_verified_at = now()
+    try:
+        file_hash = calculate_hash(instance.file)
+    except OSError:
+        instance.verification_status = VerificationStatus.MISSING.name
+    else:
+        rate_limiter.consume(instance.size)
+        instance.verification_status = (
+            VerificationStatus.VALID.name if file_hash == expected_hash else VerificationStatus.HASH_MISMATCH.name
+        )
+
+    report['verified'] += 1
+    if instance.verification_status != VerificationStatus.VALID.name:
+        logger.error(
+            "Integrity check of the {} of upload {} failed ({}): {}".format(
+                type(instance).__name__,
+                upload.uuid,
+                instance.verification_status,
+                instance.file.name,
+            )
+        )
+        report[instance.verification_status].append(str(upload.uuid))
@@ -0,0 +1,106 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import hashlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+
+from django.core.files import File
+from django.core.management import BaseCommand
+
+from osis_document.utils import HASH_CHUNK_SIZE, calculate_hash
+
+MB = 1024 * 1024
+
+
+def _hash_with_read(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _hash_with_chunks(path):
+    hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in File(file).chunks(chunk_size=HASH_CHUNK_SIZE):
+            hash.update(chunk)
+    return hash.hexdigest()
+
+
+def _hash_with_mmap(path):
+    with open(path, 'rb') as file:
+        return calculate_hash(File(file))
+
+
+METHODS = {
+    'read': _hash_with_read,
+    'chunks': _hash_with_chunks,
+    'mmap': _hash_with_mmap,
+}
+
+
+def _get_peak_rss():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In kilobytes on Linux, in bytes on macOS
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _measure(method, path, results):
+    peak_rss_before = _get_peak_rss()
+    METHODS[method](path)
+    results.put(_get_peak_rss() - peak_rss_before)
+
+
+class Command(BaseCommand):
+    help = "Measure the peak memory used to hash files of several sizes, with each hashing method"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 100, 500], help="File sizes, in MB")
+        parser.add_argument('--methods', nargs='+', choices=list(METHODS), default=list(METHODS))
+
+    def handle(self, *args, **options):
+        self.stdout.write("{:>10}  {}".format('size (MB)', ''.join('{:>14}'.format(m) for m in options['methods'])))
+        for size in options['sizes']:
+            with tempfile.NamedTemporaryFile() as file:
+                for _ in range(size):
+                    file.write(os.urandom(MB))
+                file.flush()
+                peak_rss_increases = [self._measure_in_new_process(method, file.name) for method in options['methods']]
+            self.stdout.write("{:>10}  {}".format(
+                size,
+                ''.join('{:>11.1f} MB'.format(increase / MB) for increase in peak_rss_increases),
+            ))
+
+    @staticmethod
+    def _measure_in_new_process(method, path):
+        # Each measure is made in its own process, whose peak memory is not raised by the previous measures
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_measure, args=(method, path, results))
+        process.start()
+        peak_rss_increase = results.get()
+        process.join()
+        return peak_rss_increase
@@ -0,0 +1,49 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.core.management import BaseCommand, CommandError
+
+from osis_document import token_partitions
+from osis_document.exceptions import TokenPartitioningException
+
+
+class Command(BaseCommand):
+    help = "Create the missing daily partitions of the token tables for today and the next days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help="Number of days ahead, OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD by default",
+        )
+
+    def handle(self, *args, **options):
+        for model in token_partitions.get_partitioned_models():
+            try:
+                created = token_partitions.create_partitions(model, options['days'])
+            except TokenPartitioningException as e:
+                raise CommandError(str(e))
+            self.stdout.write("{}: {} partitions created".format(model._meta.db_table, len(created)))
@@ -0,0 +1,47 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.core.management import BaseCommand, CommandError
+
+from osis_document import token_partitions
+from osis_document.exceptions import TokenPartitioningException
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the token tables to tables partitioned by day of expiration (PostgreSQL only), keeping their unexpired "
+        "tokens. The tables are locked during the conversion."
+    )
+
+    def handle(self, *args, **options):
+        for model in token_partitions.get_partitioned_models():
+            try:
+                partitioned = token_partitions.partition_table(model)
+            except TokenPartitioningException as e:
+                raise CommandError(str(e))
+            self.stdout.write("{}: {}".format(
+                model._meta.db_table,
+                'partitioned' if partitioned else 'already partitioned',
+            ))
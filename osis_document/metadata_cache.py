@@ -0,0 +1,113 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from django.utils.timezone import now
+
+# The metadata of an upload are cached once, whatever the number of tokens pointing to it: each token is only mapped
+# to its upload, so that a change of the upload invalidates a single entry.
+TOKEN_KEY_PREFIX = 'osis_document:metadata:token:'
+UPLOAD_KEY_PREFIX = 'osis_document:metadata:upload:'
+
+
+def get_metadata_cache() -> BaseCache:
+    return caches[settings.OSIS_DOCUMENT_METADATA_CACHE]
+
+
+def _get_token_key(token: str) -> str:
+    # The tokens are long signed values: they are hashed to fit in the key length limit of some cache backends
+    return TOKEN_KEY_PREFIX + hashlib.sha256(token.encode()).hexdigest()
+
+
+def _get_upload_key(upload_uuid) -> str:
+    return UPLOAD_KEY_PREFIX + str(upload_uuid)
+
+
+def _get_entries_by_token(token_keys: Dict[str, str], upload_uuids: Dict[str, str], entries: Dict[str, Dict]):
+    return {
+        token_keys[token_key]: entries[_get_upload_key(upload_uuid)]
+        for token_key, upload_uuid in upload_uuids.items()
+        if _get_upload_key(upload_uuid) in entries
+    }
+
+
+def get_cached_metadata(tokens: Iterable[str]) -> Dict[str, Dict]:
+    """Return the cached metadata entries of the uploads of the tokens, by token, for the tokens having one"""
+    if not settings.OSIS_DOCUMENT_METADATA_CACHE_TTL:
+        return {}
+    cache = get_metadata_cache()
+    token_keys = {_get_token_key(token): token for token in tokens}
+    upload_uuids = cache.get_many(token_keys)
+    entries = cache.get_many([_get_upload_key(upload_uuid) for upload_uuid in upload_uuids.values()])
+    return _get_entries_by_token(token_keys, upload_uuids, entries)
+
+
+async def aget_cached_metadata(tokens: Iterable[str]) -> Dict[str, Dict]:
+    if not settings.OSIS_DOCUMENT_METADATA_CACHE_TTL:
+        return {}
+    cache = get_metadata_cache()
+    token_keys = {_get_token_key(token): token for token in tokens}
+    upload_uuids = await cache.aget_many(token_keys)
+    entries = await cache.aget_many([_get_upload_key(upload_uuid) for upload_uuid in upload_uuids.values()])
+    return _get_entries_by_token(token_keys, upload_uuids, entries)
+
+
+def _get_token_timeout(token_expires_at: datetime) -> Optional[int]:
+    # A token is not kept in the cache after it expires, nothing is cached if the cache is disabled
+    timeout = min(settings.OSIS_DOCUMENT_METADATA_CACHE_TTL, int((token_expires_at - now()).total_seconds()))
+    return timeout if timeout > 0 else None
+
+
+def cache_metadata(token: str, token_expires_at: datetime, upload_uuid, entry: Dict):
+    """Store the metadata entry of an upload, and the upload of the token, until the token expires at the latest"""
+    timeout = _get_token_timeout(token_expires_at)
+    if timeout is None:
+        return
+    cache = get_metadata_cache()
+    cache.set(_get_upload_key(upload_uuid), entry, settings.OSIS_DOCUMENT_METADATA_CACHE_TTL)
+    cache.set(_get_token_key(token), str(upload_uuid), timeout)
+
+
+async def acache_metadata(token: str, token_expires_at: datetime, upload_uuid, entry: Dict):
+    timeout = _get_token_timeout(token_expires_at)
+    if timeout is None:
+        return
+    cache = get_metadata_cache()
+    await cache.aset(_get_upload_key(upload_uuid), entry, settings.OSIS_DOCUMENT_METADATA_CACHE_TTL)
+    await cache.aset(_get_token_key(token), str(upload_uuid), timeout)
+
+
+def invalidate_metadata(*upload_uuids):
+    """Forget the cached metadata of the uploads, to be called when they are changed"""
+    keys = [_get_upload_key(upload_uuid) for upload_uuid in upload_uuids]
+    get_metadata_cache().delete_many(keys)
+    # The entries may be cached again from the previous values until the change is committed
+    transaction.on_commit(lambda: get_metadata_cache().delete_many(keys))
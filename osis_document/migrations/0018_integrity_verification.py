@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-17 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_document', '0017_alter_modifiedupload_id_alter_token_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Name')),
+                ('position', models.JSONField(blank=True, default=dict, verbose_name='Position')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'Task checkpoint',
+            },
+        ),
+        migrations.AddField(
+            model_name='modifiedupload',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last verified at'),
+        ),
+        migrations.AddField(
+            model_name='modifiedupload',
+            name='verification_status',
+            field=models.CharField(blank=True, choices=[('VALID', 'Valid'), ('HASH_MISMATCH', 'Hash mismatch'), ('MISSING', 'Missing file')], default='', editable=False, max_length=255, verbose_name='Verification status'),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last verified at'),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='verification_status',
+            field=models.CharField(blank=True, choices=[('VALID', 'Valid'), ('HASH_MISMATCH', 'Hash mismatch'), ('MISSING', 'Missing file')], default='', editable=False, max_length=255, verbose_name='Verification status'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-17 05:00
+
+from django.db import migrations, models
+import osis_document.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_document', '0018_integrity_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('uuid', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False, verbose_name='UUID')),
+                ('name', models.CharField(max_length=255, verbose_name='Name')),
+                ('mimetype', models.CharField(max_length=255, verbose_name='MIME Type')),
+                ('size', models.IntegerField(verbose_name='Size (in bytes)')),
+                ('chunk_size', models.IntegerField(verbose_name='Chunk size (in bytes)')),
+                ('received', models.IntegerField(default=0, verbose_name='Received (in bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('expires_at', models.DateTimeField(default=osis_document.models.default_upload_session_expiration_time, verbose_name='Expires at')),
+            ],
+            options={
+                'verbose_name': 'Upload session',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.20 on 2026-10-17 05:07
+
+from django.db import migrations, models
+import django.utils.timezone
+import osis_document.blob_storage
+import osis_document.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osis_document', '0019_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Hash')),
+                ('name', models.CharField(max_length=255, verbose_name='Name')),
+                ('size', models.IntegerField(verbose_name='Size (in bytes)')),
+                ('infected', models.BooleanField(default=False, verbose_name='Infected')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_stored_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Last stored at')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+            },
+        ),
+        migrations.AlterField(
+            model_name='modifiedupload',
+            name='file',
+            field=models.FileField(max_length=255, storage=osis_document.blob_storage.get_upload_storage, upload_to='', verbose_name='File'),
+        ),
+        migrations.AlterField(
+            model_name='upload',
+            name='file',
+            field=models.FileField(max_length=255, storage=osis_document.blob_storage.get_upload_storage, upload_to='', validators=[osis_document.models.OsisDocumentFileExtensionValidator()], verbose_name='File'),
+        ),
+    ]
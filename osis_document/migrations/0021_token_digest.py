@@ -0,0 +1,94 @@
+# Generated by Django 4.2.20 on 2026-10-17 05:16
+
+import hashlib
+import uuid
+
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+
+BATCH_SIZE = 10000
+
+
+def get_token_digest(token):
+    # Copied from osis_document.models, so that the migration does not depend on the current code
+    return uuid.UUID(bytes=hashlib.sha256(str(token).encode()).digest()[:16])
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """Create the index without locking the table on PostgreSQL, as a plain index elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(postgres_operations.RemoveIndexConcurrently):
+    """Remove the index without locking the table on PostgreSQL, as a plain index elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return migrations.RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return migrations.RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def forward(apps, schema_editor):
+    # Outside of a transaction, each batch is committed on its own and only locks its rows
+    Token = apps.get_model('osis_document', 'Token')
+    last_pk = 0
+    while True:
+        tokens = list(Token.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'token')[:BATCH_SIZE])
+        if not tokens:
+            break
+        for token in tokens:
+            token.digest = get_token_digest(token.token)
+        Token.objects.bulk_update(tokens, ['digest'])
+        last_pk = tokens[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('osis_document', '0020_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='token',
+            name='digest',
+            field=models.UUIDField(editable=False, null=True, verbose_name='Digest'),
+        ),
+        migrations.RunPython(forward, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='token',
+            index=models.Index(fields=['digest'], name='osis_document_token_digest'),
+        ),
+        # The tokens saved without a digest by the processes not upgraded yet are looked up through this index
+        AddIndexConcurrently(
+            model_name='token',
+            index=models.Index(
+                condition=models.Q(('digest__isnull', True)),
+                fields=['token'],
+                name='osis_document_token_no_digest',
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name='token',
+            name='osis_docume_token_2b8dca_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='token',
+            name='osis_docume_token_4e389a_idx',
+        ),
+    ]
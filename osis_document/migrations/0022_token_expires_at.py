@@ -0,0 +1,33 @@
+# Generated by Django 4.2.20 on 2026-10-17 05:41
+
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """Create the index without locking the table on PostgreSQL, as a plain index elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('osis_document', '0021_token_digest'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='token',
+            index=models.Index(fields=['expires_at'], name='osis_document_token_expires_at'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.20 on 2026-10-17 06:12
+
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+import osis_document.blob_storage
+import osis_document.models
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """Create the index without locking the table on PostgreSQL, as a plain index elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('osis_document', '0022_token_expires_at'),
+    ]
+
+    operations = [
+        # The index of db_index=True under the same name, without the one of the prefix lookups (never done on files)
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                AddIndexConcurrently(
+                    model_name='modifiedupload',
+                    index=models.Index(fields=['file'], name='osis_document_modifiedupload_file_68acdba8'),
+                ),
+                AddIndexConcurrently(
+                    model_name='upload',
+                    index=models.Index(fields=['file'], name='osis_document_upload_file_88bab86c'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='modifiedupload',
+                    name='file',
+                    field=models.FileField(db_index=True, max_length=255, storage=osis_document.blob_storage.get_upload_storage, upload_to='', verbose_name='File'),
+                ),
+                migrations.AlterField(
+                    model_name='upload',
+                    name='file',
+                    field=models.FileField(db_index=True, max_length=255, storage=osis_document.blob_storage.get_upload_storage, upload_to='', validators=[osis_document.models.OsisDocumentFileExtensionValidator()], verbose_name='File'),
+                ),
+            ],
+        ),
+    ]
@@ -24,6 +24,7 @@
 #
 # ##############################################################################
 import contextlib
+import hashlib
 
 import magic
 import uuid
@@ -33,24 +34,60 @@ from pathlib import Path
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import models
+from django.db import models, router
+from django.db.models import F, Func, Q, Value
 from django.db.models.functions import Now
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 from django.utils.translation import gettext_lazy as _
 
+from .blob_storage import get_upload_storage, is_blob_name
 from .exceptions import MimeMismatch
-from .enums import FileStatus, TokenAccess, PostProcessingType, PostProcessingStatus
+from .metadata_cache import invalidate_metadata
+from .stateless_tokens import dumps_read_token, loads_read_token
+from .token_stores import get_token_store
+from .upload_handlers import read_head
+from .enums import FileStatus, TokenAccess, PostProcessingType, PostProcessingStatus, VerificationStatus
+
+
+class JSONObjectMerge(Func):
+    """Shallow merge of JSON objects, the keys of the last ones taking precedence (jsonb concatenation)"""
+
+    arg_joiner = ' || '
+    template = '(%(expressions)s)'
+    output_field = models.JSONField()
+
+
+def merge_metadata(metadata_changes):
+    """Return the expression merging changes into the metadata of an upload, to be evaluated by the database"""
+    return JSONObjectMerge(F('metadata'), Value(metadata_changes, output_field=models.JSONField()))
 
 
 class UploadManager(models.Manager):
+    def update_metadata(self, upload_uuid, metadata_changes, **values):
+        """
+        Merge changes into the metadata of an upload, and set the other given fields, in a single UPDATE statement
+        returning the updated upload (None if it does not exist). Unlike a save of the instance, the concurrent changes
+        of other metadata keys are not lost and the other columns are not rewritten.
+        """
+        using = router.db_for_write(self.model)
+        query = self.filter(pk=upload_uuid).query.chain(UpdateQuery)
+        query.add_update_values({
+            'metadata': merge_metadata(metadata_changes),
+            'modified_at': timezone.now(),
+            **values,
+        })
+        sql, params = query.get_compiler(using).as_sql()
+        upload = next(iter(self.raw(sql + ' RETURNING *', params, using=using)), None)
+        invalidate_metadata(upload_uuid)
+        return upload
+
     def from_token(self, token):
-        queryset = self.filter(
-            tokens__token=token,
-            tokens__expires_at__gt=Now(),
-        ).exclude(
-            status=FileStatus.DELETED.name
-        ).select_related('modified_upload')
-        return queryset.first()
+        return Token.objects.get_readable_upload(token)
+
+    async def afrom_token(self, token):
+        return await Token.objects.aget_readable_upload(token)
 
 
 class OsisDocumentFileExtensionValidator(FileExtensionValidator):
@@ -77,7 +114,7 @@ class OsisDocumentMimeMatchValidator:
     def __call__(self, data):
         if settings.ENABLE_MIMETYPE_VALIDATION:
             extension = Path(data.name).suffix[1:].lower()
-            content_type = magic.from_buffer(data.read(1024), mime=True)
+            content_type = magic.from_buffer(read_head(data, 1024), mime=True)
             if content_type != self.ext_cnt_mapping[extension]:
                 raise MimeMismatch
 
@@ -92,6 +129,8 @@ class Upload(models.Model):
         verbose_name=_("File"),
         max_length=255,
         validators=[OsisDocumentFileExtensionValidator()],
+        storage=get_upload_storage,
+        db_index=True,
     )
     uploaded_at = models.DateTimeField(
         verbose_name=_("Uploaded at"),
@@ -123,6 +162,20 @@ class Upload(models.Model):
         verbose_name=_("Metadata"),
         default=dict,
     )
+    last_verified_at = models.DateTimeField(
+        verbose_name=_("Last verified at"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    verification_status = models.CharField(
+        verbose_name=_("Verification status"),
+        max_length=255,
+        choices=VerificationStatus.choices(),
+        blank=True,
+        default='',
+        editable=False,
+    )
 
     objects = UploadManager()
 
@@ -135,6 +188,15 @@ class Upload(models.Model):
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         assert self.metadata.get('hash')
         super().save(force_insert, force_update, using, update_fields)
+        # A content already declared as infected is not scanned again when it is shared by a new upload
+        if (
+            is_blob_name(self.file.name)
+            and self.status != FileStatus.INFECTED.name
+            and Blob.objects.filter(name=self.file.name, infected=True).exists()
+        ):
+            self.status = FileStatus.INFECTED.name
+            super().save(update_fields=['status'])
+        invalidate_metadata(self.uuid)
 
     def get_file(self, modified=False):
         if modified:
@@ -142,6 +204,13 @@ class Upload(models.Model):
                 return self.modified_upload.file
         return self.file
 
+    def get_version(self, modified=False):
+        """Return the modified upload if it is asked for and exists, the upload itself otherwise"""
+        if modified:
+            with contextlib.suppress(Upload.modified_upload.RelatedObjectDoesNotExist):
+                return self.modified_upload
+        return self
+
     def get_hash(self, modified=False):
         if modified:
             with contextlib.suppress(Upload.modified_upload.RelatedObjectDoesNotExist):
@@ -172,10 +241,61 @@ class ModifiedUpload(models.Model):
     file = models.FileField(
         verbose_name=_("File"),
         max_length=255,
+        storage=get_upload_storage,
+        db_index=True,
     )
     size = models.IntegerField(
         verbose_name=_("Size (in bytes)"),
     )
+    last_verified_at = models.DateTimeField(
+        verbose_name=_("Last verified at"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    verification_status = models.CharField(
+        verbose_name=_("Verification status"),
+        max_length=255,
+        choices=VerificationStatus.choices(),
+        blank=True,
+        default='',
+        editable=False,
+    )
+
+
+class Blob(models.Model):
+    """A content stored once by the content-addressed storage, shared by the uploads with this content"""
+
+    hash = models.CharField(
+        verbose_name=_("Hash"),
+        max_length=64,
+        primary_key=True,
+    )
+    name = models.CharField(
+        verbose_name=_("Name"),
+        max_length=255,
+    )
+    size = models.IntegerField(
+        verbose_name=_("Size (in bytes)"),
+    )
+    infected = models.BooleanField(
+        verbose_name=_("Infected"),
+        default=False,
+    )
+    created_at = models.DateTimeField(
+        verbose_name=_("Created at"),
+        auto_now_add=True,
+    )
+    last_stored_at = models.DateTimeField(
+        verbose_name=_("Last stored at"),
+        default=timezone.now,
+    )
+
+    class Meta:
+        verbose_name = _("Blob")
+
+    def __str__(self):
+        return "Blob '{}'".format(self.hash)
 
 
 def default_expiration_time():
@@ -185,7 +305,155 @@ def default_expiration_time():
     return now() + timedelta(seconds=max_age)
 
 
-class TokenManager(models.Manager):
+def get_token_digest(token) -> uuid.UUID:
+    """Return the fixed-length digest through which a token is looked up, instead of its long signed value"""
+    return uuid.UUID(bytes=hashlib.sha256(str(token).encode()).digest()[:16])
+
+
+class TokenQuerySet(models.QuerySet):
+    def with_token(self, token):
+        return self.with_tokens([token])
+
+    def with_tokens(self, tokens):
+        # Only the digest is indexed, comparing the token itself rules out the collisions. The tokens saved without a
+        # digest (by the processes not upgraded yet during a deployment) are found through a partial index.
+        return self.filter(
+            Q(digest__in={get_token_digest(token) for token in tokens}, token__in=tokens)
+            | Q(digest__isnull=True, token__in=tokens)
+        )
+
+
+class TokenManager(models.Manager.from_queryset(TokenQuerySet)):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for token in objs:
+            token.digest = get_token_digest(token.token)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def build_read_token(self, upload_id, for_modified_upload=False, expires_at=None):
+        """Return a stateless read token, which is not stored: its value embeds its signed properties"""
+        value, expires_at = dumps_read_token(upload_id, for_modified_upload, expires_at or default_expiration_time())
+        return self.model(
+            token=value,
+            upload_id=upload_id,
+            access=TokenAccess.READ.name,
+            for_modified_upload=for_modified_upload,
+            expires_at=expires_at,
+        )
+
+    def load_read_token(self, token):
+        """Return the (unsaved) stateless read token of a value, or None if it is not the value of such a token"""
+        properties = loads_read_token(token)
+        if properties is None:
+            return None
+        return self.model(token=token, access=TokenAccess.READ.name, **properties)
+
+    def resolve(self, token):
+        """Return the token with its upload and modified upload, whatever the store of the token.
+
+        The token is returned whatever its expiration date and the status of its upload, so that the caller can tell
+        these cases apart."""
+        read_token = self.load_read_token(token)
+        if read_token is None:
+            return get_token_store().get(token)
+        return self.attach_uploads([read_token]).get(token)
+
+    async def aresolve(self, token):
+        read_token = self.load_read_token(token)
+        if read_token is None:
+            return await get_token_store().aget(token)
+        return (await self.aattach_uploads([read_token])).get(token)
+
+    def resolve_many(self, tokens):
+        """Return the tokens of several values, by value, as resolve() does"""
+        read_tokens, stored_tokens = self._split_read_tokens(tokens)
+        resolved_tokens = get_token_store().get_many(stored_tokens) if stored_tokens else {}
+        resolved_tokens.update(self.attach_uploads(read_tokens))
+        return resolved_tokens
+
+    async def aresolve_many(self, tokens):
+        read_tokens, stored_tokens = self._split_read_tokens(tokens)
+        resolved_tokens = await get_token_store().aget_many(stored_tokens) if stored_tokens else {}
+        resolved_tokens.update(await self.aattach_uploads(read_tokens))
+        return resolved_tokens
+
+    def get_readable_upload(self, token):
+        """Return the upload of a token which is not expired, with the expiration date of the token, unless the upload
+        is deleted"""
+        return self._get_readable_upload(self.resolve(token))
+
+    async def aget_readable_upload(self, token):
+        return self._get_readable_upload(await self.aresolve(token))
+
+    def get_writing(self, token):
+        """Return the writing token of a value, with its upload, unless it is expired or its upload is deleted"""
+        token = self.resolve(token)
+        if token is None or token.access != TokenAccess.WRITE.name or self._get_readable_upload(token) is None:
+            return None
+        return token
+
+    def consume_writing(self, tokens):
+        """Remove the writing tokens of several values, which can only be used once, and return them by value with
+        their upload, leaving out the expired ones and the ones of deleted uploads"""
+        return get_token_store().consume_writing_many(tokens)
+
+    def save_many(self, tokens):
+        """Store new tokens (except the stateless read tokens, which are not stored).
+
+        With OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW, a new read token takes the value and expiration date of a stored one
+        for the same upload expiring at most that many seconds before it, instead of being stored."""
+        store = get_token_store()
+        window = settings.OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW
+        store.save_many(store.reuse_read_tokens(tokens, window) if window > 0 else tokens)
+        return tokens
+
+    def delete_expired(self, limit=None):
+        """Delete a batch of expired tokens, see TokenStore.delete_expired()"""
+        return get_token_store().delete_expired(limit or settings.OSIS_DOCUMENT_CLEANUP_BATCH_SIZE)
+
+    def attach_uploads(self, tokens):
+        """Fetch the uploads of tokens built from their properties, return the ones whose upload exists by value"""
+        if not tokens:
+            return {}
+        return self._with_uploads(tokens, self._uploads_queryset(tokens).in_bulk())
+
+    async def aattach_uploads(self, tokens):
+        if not tokens:
+            return {}
+        return self._with_uploads(tokens, await self._uploads_queryset(tokens).ain_bulk())
+
+    def _split_read_tokens(self, tokens):
+        read_tokens, stored_tokens = [], []
+        for token in tokens:
+            read_token = self.load_read_token(token)
+            if read_token is None:
+                stored_tokens.append(token)
+            else:
+                read_tokens.append(read_token)
+        return read_tokens, stored_tokens
+
+    @staticmethod
+    def _uploads_queryset(tokens):
+        return Upload.objects.filter(pk__in={token.upload_id for token in tokens}).select_related('modified_upload')
+
+    @staticmethod
+    def _with_uploads(tokens, uploads):
+        # A token whose upload doesn't exist anymore is not found, as a stored one would have been deleted with it
+        found_tokens = {}
+        for token in tokens:
+            if token.upload_id in uploads:
+                token.upload = uploads[token.upload_id]
+                found_tokens[token.token] = token
+        return found_tokens
+
+    @staticmethod
+    def _get_readable_upload(token):
+        if token is None or token.expires_at <= timezone.now() or token.upload.status == FileStatus.DELETED.name:
+            return None
+        upload = token.upload
+        upload.token_expires_at = token.expires_at
+        return upload
+
     def writing_not_expired(self):
         return self.filter(
             access=TokenAccess.WRITE.name,
@@ -200,6 +468,12 @@ class Token(models.Model):
         max_length=1024,
         verbose_name=_("Token"),
     )
+    # Nullable so that the column is added without rewriting the table, it is always set when a token is saved
+    digest = models.UUIDField(
+        verbose_name=_("Digest"),
+        null=True,
+        editable=False,
+    )
     upload = models.ForeignKey(
         to='osis_document.Upload',
         verbose_name=_("Upload"),
@@ -230,13 +504,22 @@ class Token(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['token']),
-            models.Index(fields=['token', 'expires_at'])
+            models.Index(fields=['digest'], name='osis_document_token_digest'),
+            models.Index(fields=['expires_at'], name='osis_document_token_expires_at'),
+            models.Index(
+                fields=['token'],
+                condition=Q(digest__isnull=True),
+                name='osis_document_token_no_digest',
+            ),
         ]
 
     def __str__(self):
         return self.token
 
+    def save(self, *args, **kwargs):
+        self.digest = get_token_digest(self.token)
+        super().save(*args, **kwargs)
+
     def __repr__(self):
         return '{self.access} token for {self.upload}'.format(self=self)
 
@@ -292,3 +575,76 @@ class PostProcessAsync(models.Model):
         blank=True,
         encoder=DjangoJSONEncoder
     )
+
+
+def default_upload_session_expiration_time():
+    return timezone.now() + timedelta(seconds=settings.OSIS_DOCUMENT_UPLOAD_SESSION_MAX_AGE)
+
+
+class UploadSession(models.Model):
+    """
+    An upload received in several chunks, which becomes a requested upload once complete.
+    """
+
+    uuid = models.UUIDField(
+        verbose_name=_("UUID"),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    name = models.CharField(
+        verbose_name=_("Name"),
+        max_length=255,
+    )
+    mimetype = models.CharField(
+        verbose_name=_("MIME Type"),
+        max_length=255,
+    )
+    size = models.IntegerField(
+        verbose_name=_("Size (in bytes)"),
+    )
+    chunk_size = models.IntegerField(
+        verbose_name=_("Chunk size (in bytes)"),
+    )
+    received = models.IntegerField(
+        verbose_name=_("Received (in bytes)"),
+        default=0,
+    )
+    created_at = models.DateTimeField(
+        verbose_name=_("Created at"),
+        auto_now_add=True,
+    )
+    expires_at = models.DateTimeField(
+        verbose_name=_("Expires at"),
+        default=default_upload_session_expiration_time,
+    )
+
+    class Meta:
+        verbose_name = _("Upload session")
+
+    def __str__(self):
+        return "Upload session '{}'".format(self.name)
+
+
+class TaskCheckpoint(models.Model):
+    """Position reached by a long-running background task, from which its next run resumes"""
+
+    name = models.CharField(
+        verbose_name=_("Name"),
+        max_length=255,
+        unique=True,
+    )
+    position = models.JSONField(
+        verbose_name=_("Position"),
+        default=dict,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name=_("Updated at"),
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = _("Task checkpoint")
+
+    def __str__(self):
+        return self.name
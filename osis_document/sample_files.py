@@ -0,0 +1,85 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import io
+import os
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+from osis_document.cache import LRUCache
+from osis_document.integrity import get_file_cache_key
+from osis_document.utils import get_sample_file_resolver
+
+# The sample files never change while the server is running: they are kept until the process ends
+_sample_file_cache = LRUCache(max_size=32, ttl=float('inf'))
+_missing_file_cache = None
+
+
+def get_missing_file_cache() -> LRUCache:
+    """Return the process-wide cache of the files recently found missing on their storage"""
+    global _missing_file_cache
+    if _missing_file_cache is None:
+        _missing_file_cache = LRUCache(
+            max_size=settings.OSIS_DOCUMENT_MISSING_FILE_CACHE_SIZE,
+            ttl=settings.OSIS_DOCUMENT_MISSING_FILE_CACHE_TTL,
+        )
+    return _missing_file_cache
+
+
+def is_file_exist_on_disk(file_field: FieldFile) -> bool:
+    """Check that the file exists on its storage, remembering for a short time the files that do not exist"""
+    cache_key = get_file_cache_key(file_field)
+    if get_missing_file_cache().get(cache_key):
+        return False
+    exists = file_field.storage.exists(file_field.name)
+    if not exists:
+        get_missing_file_cache().set(cache_key, True)
+    return exists
+
+
+def open_sample_file(mimetype: str):
+    """
+    Return a file object with the content of the sample file of the mimetype. The sample files are read once per
+    process, unless they are larger than OSIS_DOCUMENT_SAMPLE_FILE_CACHE_MAX_FILE_SIZE.
+    """
+    file_path = get_sample_file_resolver(mimetype)
+    content = _sample_file_cache.get(file_path)
+    if content is None:
+        if os.path.getsize(file_path) > settings.OSIS_DOCUMENT_SAMPLE_FILE_CACHE_MAX_FILE_SIZE:
+            return open(file_path, 'rb')
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        _sample_file_cache.set(file_path, content)
+
+    file_obj = io.BytesIO(content)
+    # Used by FileResponse to guess the content type and the name of the attachment
+    file_obj.name = file_path
+    return file_obj
+
+
+def clear_sample_file_caches():
+    _sample_file_cache.clear()
+    get_missing_file_cache().clear()
@@ -0,0 +1,74 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import datetime
+import uuid
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+
+# Separates the stateless read tokens from the stored tokens, also signed with the secret key
+READ_TOKEN_SALT = 'osis_document.read_token'
+
+
+def is_enabled() -> bool:
+    return settings.OSIS_DOCUMENT_STATELESS_READ_TOKENS
+
+
+def dumps_read_token(
+    upload_id,
+    for_modified_upload: bool,
+    expires_at: datetime.datetime,
+) -> Tuple[str, datetime.datetime]:
+    """
+    Return the value of a read token embedding the upload, whether it is for its modified version and the expiration
+    date, which is not stored: the signature of the value is enough to trust it. The expiration date is rounded down to
+    the second, it is returned with the value.
+    """
+    timestamp = int(expires_at.timestamp())
+    value = signing.dumps(
+        {'u': str(upload_id), 'm': int(bool(for_modified_upload)), 'e': timestamp},
+        salt=READ_TOKEN_SALT,
+        compress=True,
+    )
+    return value, _from_timestamp(timestamp)
+
+
+def loads_read_token(value: str) -> Optional[dict]:
+    """Return the properties of a stateless read token, or None if the value is not a valid one"""
+    try:
+        payload = signing.loads(value, salt=READ_TOKEN_SALT)
+        return {
+            'upload_id': uuid.UUID(payload['u']),
+            'for_modified_upload': bool(payload['m']),
+            'expires_at': _from_timestamp(payload['e']),
+        }
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def _from_timestamp(timestamp: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc if settings.USE_TZ else None)
@@ -23,40 +23,25 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
-from datetime import timedelta
-
-from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Q
-from django.utils.timezone import now
 
 from backoffice.celery import app
-from osis_document.enums import FileStatus, PostProcessingStatus
-from osis_document.models import Upload, Token, PostProcessAsync
+from osis_document import cleanup, integrity_scrubber
+from osis_document.enums import PostProcessingStatus
+from osis_document.models import PostProcessAsync
 from osis_document.utils import post_process
 
 
 @app.task
 def cleanup_old_uploads():
-    # Clean Upload which are stale 2 case:
-    #   - State "REQUESTED" and delay in temporary storage expired (= Upload not confirm by client)
-    #   - Upload expired (= Storage delay expired - XLS export, PDF one time generation, ...)
-    upload_expired_qs = Upload.objects.filter(
-        Q(
-            status=FileStatus.REQUESTED.name,
-            uploaded_at__lte=now() - timedelta(seconds=settings.OSIS_DOCUMENT_TEMP_UPLOAD_MAX_AGE)
-        ) |
-        Q(
-            expires_at__lte=now()
-        ),
-    )
-    files_expired = [upload_expired.file for upload_expired in upload_expired_qs]
-    upload_expired_qs.delete()
-    for file in files_expired:
-        file.delete(save=False)
+    # Delete the stale uploads, expired tokens and upload sessions, resuming from where the previous run stopped
+    return cleanup.cleanup_old_uploads()
 
-    # Clean Token expired
-    Token.objects.filter(expires_at__lte=now()).delete()
+
+@app.task
+def verify_uploads_integrity():
+    # Check the hash of the stored files, resuming from where the previous run stopped
+    return integrity_scrubber.verify_uploads_integrity()
 
 
 @app.task
@@ -0,0 +1,184 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.shortcuts import resolve_url
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from osis_document.blob_storage import delete_unreferenced_blobs, get_blob_name, upload_storage
+from osis_document.enums import FileStatus
+from osis_document.models import Blob, ModifiedUpload, Upload
+from osis_document.tasks import cleanup_old_uploads
+from osis_document.tests.factories import PdfUploadFactory, WriteTokenFactory
+from osis_document.utils import calculate_hash, confirm_upload
+
+CONTENT = b'hello world'
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+@override_settings(
+    ROOT_URLCONF='osis_document.urls',
+    OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE=True,
+    OSIS_DOCUMENT_API_SHARED_SECRET='foobar',
+)
+class ContentAddressedStorageTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_same_content_is_stored_once(self):
+        first_upload = PdfUploadFactory()
+        second_upload = PdfUploadFactory(file__filename='other_file.pdf')
+
+        self.assertEqual(first_upload.file.name, get_blob_name(CONTENT_HASH))
+        self.assertEqual(second_upload.file.name, first_upload.file.name)
+        blob = Blob.objects.get()
+        self.assertEqual(blob.hash, CONTENT_HASH)
+        self.assertEqual(blob.name, first_upload.file.name)
+        self.assertEqual(blob.size, len(CONTENT))
+        with second_upload.file.open('rb') as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    def test_different_contents_are_stored_separately(self):
+        first_upload = PdfUploadFactory()
+        second_upload = PdfUploadFactory(file__data=b'other content')
+
+        self.assertNotEqual(first_upload.file.name, second_upload.file.name)
+        self.assertEqual(Blob.objects.count(), 2)
+
+    @override_settings(OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE=False)
+    def test_disabled(self):
+        first_upload = PdfUploadFactory()
+        second_upload = PdfUploadFactory()
+
+        self.assertNotEqual(first_upload.file.name, second_upload.file.name)
+        self.assertFalse(Blob.objects.exists())
+
+    @override_settings(STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}})
+    def test_configured_default_storage_is_used(self):
+        first_upload = PdfUploadFactory()
+        second_upload = PdfUploadFactory()
+
+        self.assertEqual(second_upload.file.name, first_upload.file.name)
+        self.assertTrue(default_storage.exists(first_upload.file.name))
+        self.assertNotIsInstance(default_storage._wrapped, FileSystemStorage)
+        with second_upload.file.open('rb') as file:
+            self.assertEqual(file.read(), CONTENT)
+        self.assertEqual(calculate_hash(second_upload.file), CONTENT_HASH)
+
+    def test_shared_file_is_not_deleted_with_an_upload(self):
+        first_upload = PdfUploadFactory()
+        PdfUploadFactory()
+
+        first_upload.file.delete(save=False)
+
+        self.assertTrue(upload_storage.exists(get_blob_name(CONTENT_HASH)))
+
+    def test_confirm_upload_does_not_move_the_file(self):
+        token = WriteTokenFactory()
+        name = token.upload.file.name
+
+        confirm_upload(token.token, upload_to='path/to/')
+
+        upload = Upload.objects.get()
+        self.assertEqual(upload.status, FileStatus.UPLOADED.name)
+        self.assertEqual(upload.file.name, name)
+        self.assertTrue(upload_storage.exists(name))
+
+    def test_duplicate_references_the_same_file(self):
+        upload = PdfUploadFactory()
+
+        response = self.client.post(
+            resolve_url('duplicate'),
+            data={'uuids': [upload.uuid]},
+            content_type='application/json',
+            HTTP_X_API_KEY='foobar',
+        )
+
+        self.assertEqual(response.status_code, 201)
+        duplicate = Upload.objects.get(uuid=response.json()[str(upload.uuid)]['upload_id'])
+        self.assertEqual(duplicate.file.name, upload.file.name)
+        self.assertEqual(Blob.objects.count(), 1)
+
+    def test_infected_flag_applies_to_all_the_uploads_of_a_content(self):
+        first_upload = PdfUploadFactory()
+        second_upload = PdfUploadFactory()
+        other_upload = PdfUploadFactory(file__data=b'other content')
+
+        response = self.client.post(
+            resolve_url('declare-file-as-infected'),
+            {'path': first_upload.file.name},
+            content_type='application/json',
+            HTTP_X_API_KEY='foobar',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        second_upload.refresh_from_db()
+        self.assertEqual(second_upload.status, FileStatus.INFECTED.name)
+        other_upload.refresh_from_db()
+        self.assertEqual(other_upload.status, FileStatus.REQUESTED.name)
+        self.assertTrue(Blob.objects.get(name=first_upload.file.name).infected)
+
+        # A new upload of the same content is not scanned again
+        new_upload = PdfUploadFactory()
+        self.assertEqual(new_upload.status, FileStatus.INFECTED.name)
+
+    def test_delete_unreferenced_blobs(self):
+        referenced_upload = PdfUploadFactory()
+        unreferenced_upload = PdfUploadFactory(file__data=b'unreferenced')
+        recent_upload = PdfUploadFactory(file__data=b'recently stored')
+        modified_upload = ModifiedUpload.objects.create(
+            upload=PdfUploadFactory(file__data=b'original'),
+            file=ContentFile(b'modified', name='modified.pdf'),
+            size=8,
+        )
+        Blob.objects.update(last_stored_at=timezone.now() - timedelta(days=1))
+        recent_upload.file.save('recently_stored.pdf', ContentFile(b'recently stored'), save=False)
+        Upload.objects.filter(pk__in=[unreferenced_upload.pk, recent_upload.pk]).delete()
+
+        cleanup_old_uploads()
+
+        self.assertEqual(
+            set(Blob.objects.values_list('name', flat=True)),
+            {
+                referenced_upload.file.name,
+                recent_upload.file.name,
+                modified_upload.file.name,
+                modified_upload.upload.file.name,
+            },
+        )
+        self.assertFalse(upload_storage.exists(unreferenced_upload.file.name))
+        self.assertTrue(upload_storage.exists(referenced_upload.file.name))
+        self.assertEqual(delete_unreferenced_blobs(), 0)
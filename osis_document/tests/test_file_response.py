@@ -0,0 +1,54 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from django.test import SimpleTestCase
+
+from osis_document.api.file_response import parse_range_header
+
+
+class ParseRangeHeaderTestCase(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=900-2000', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-2000', 1000), [(0, 999)])
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        self.assertEqual(parse_range_header('bytes=500-599, 0-99', 1000), [(0, 99), (500, 599)])
+        self.assertEqual(parse_range_header('bytes=0-99,50-149,150-199', 1000), [(0, 199)])
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_range_header('bytes=1000-', 1000), [])
+        self.assertEqual(parse_range_header('bytes=-0', 1000), [])
+        self.assertEqual(parse_range_header('bytes=0-', 0), [])
+
+    def test_ignored_headers(self):
+        self.assertIsNone(parse_range_header('items=0-99', 1000))
+        self.assertIsNone(parse_range_header('bytes=', 1000))
+        self.assertIsNone(parse_range_header('bytes=-', 1000))
+        self.assertIsNone(parse_range_header('bytes=99-0', 1000))
+        self.assertIsNone(parse_range_header('bytes=a-b', 1000))
+        self.assertIsNone(parse_range_header('bytes=' + ','.join(['0-1'] * 21), 1000))
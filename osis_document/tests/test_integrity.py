@@ -0,0 +1,176 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import hashlib
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from osis_document.api.views.raw_file import RawFileMixin
+from osis_document.cache import LRUCache
+from osis_document.enums import VerificationStatus
+from osis_document.exceptions import HashMismatch
+from osis_document.integrity import (
+    HashVerifyingFile,
+    get_verified_hash_cache,
+    invalidate_verified_hash,
+    is_recently_verified,
+    is_valid_checksum,
+    is_verified,
+    open_verified_file,
+)
+from osis_document.tests.factories import PdfUploadFactory
+
+
+class LRUCacheTestCase(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entry_expires(self):
+        cache = LRUCache(max_size=2, ttl=60)
+        with mock.patch('osis_document.cache.time.monotonic', return_value=1000):
+            cache.set('a', 1)
+        with mock.patch('osis_document.cache.time.monotonic', return_value=1059):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('osis_document.cache.time.monotonic', return_value=1060):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled_cache(self):
+        cache = LRUCache(max_size=2, ttl=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+
+class IsValidChecksumTestCase(TestCase):
+    def setUp(self):
+        get_verified_hash_cache().clear()
+        self.upload = PdfUploadFactory()
+
+    def test_verified_file_is_not_hashed_again(self):
+        with mock.patch('osis_document.utils.hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+            self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+        self.assertEqual(sha256.call_count, 1)
+
+    def test_mismatch_is_not_cached(self):
+        with mock.patch('osis_document.utils.hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertFalse(is_valid_checksum(self.upload.file, 'badvalue'))
+            self.assertFalse(is_valid_checksum(self.upload.file, 'badvalue'))
+        self.assertEqual(sha256.call_count, 2)
+
+    def test_other_expected_hash_is_checked(self):
+        self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+        self.assertFalse(is_valid_checksum(self.upload.file, 'badvalue'))
+
+    def test_changed_file_is_hashed_again(self):
+        self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+        with open(self.upload.file.path, 'wb') as file:
+            file.write(b'hello world, changed')
+        self.assertFalse(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+
+    def test_invalidated_file_is_hashed_again(self):
+        with mock.patch('osis_document.utils.hashlib.sha256', wraps=hashlib.sha256) as sha256:
+            self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+            invalidate_verified_hash(self.upload.file)
+            self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+        self.assertEqual(sha256.call_count, 2)
+
+
+
+@override_settings(OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR=3600)
+class IsRecentlyVerifiedTestCase(TestCase):
+    def setUp(self):
+        self.upload = PdfUploadFactory()
+        self.upload.verification_status = VerificationStatus.VALID.name
+        self.upload.last_verified_at = now()
+
+    def test_recently_verified_file(self):
+        self.assertTrue(is_recently_verified(self.upload))
+
+    def test_file_not_verified(self):
+        self.upload.verification_status = ''
+        self.upload.last_verified_at = None
+        self.assertFalse(is_recently_verified(self.upload))
+
+    def test_file_not_valid(self):
+        self.upload.verification_status = VerificationStatus.HASH_MISMATCH.name
+        self.assertFalse(is_recently_verified(self.upload))
+
+    def test_file_modified_since_verification(self):
+        self.upload.last_verified_at = self.upload.modified_at - timedelta(seconds=1)
+        self.assertFalse(is_recently_verified(self.upload))
+
+    def test_verification_too_old(self):
+        self.upload.last_verified_at = now() - timedelta(hours=2)
+        self.upload.modified_at = now() - timedelta(hours=3)
+        self.assertFalse(is_recently_verified(self.upload))
+
+    @override_settings(OSIS_DOCUMENT_TRUST_SCRUBBED_FILES_FOR=0)
+    def test_disabled(self):
+        self.assertFalse(is_recently_verified(self.upload))
+
+    def test_recently_verified_file_is_not_hashed(self):
+        with mock.patch('osis_document.utils.hashlib.sha256') as sha256:
+            self.assertTrue(RawFileMixin()._is_valid_checksum(self.upload, mock.Mock(for_modified_upload=False)))
+        sha256.assert_not_called()
+
+
+class HashVerifyingFileTestCase(TestCase):
+    def setUp(self):
+        get_verified_hash_cache().clear()
+        self.upload = PdfUploadFactory()
+
+    def test_read_valid_file(self):
+        file = HashVerifyingFile(self.upload.file, self.upload.get_hash())
+        chunks = list(iter(lambda: file.read(4), b''))
+        file.close()
+        self.assertEqual(b''.join(chunks), b'hello world')
+        self.assertTrue(is_verified(self.upload.file, self.upload.get_hash()))
+
+    def test_last_chunk_is_not_returned_on_mismatch(self):
+        file = HashVerifyingFile(self.upload.file, 'badvalue')
+        chunks = []
+        with self.assertRaises(HashMismatch):
+            for chunk in iter(lambda: file.read(4), b''):
+                chunks.append(chunk)
+        file.close()
+        self.assertEqual(b''.join(chunks), b'hello wo')
+        self.assertFalse(is_verified(self.upload.file, 'badvalue'))
+
+    def test_verified_file_is_opened_without_check(self):
+        self.assertTrue(is_valid_checksum(self.upload.file, self.upload.get_hash()))
+        file = open_verified_file(self.upload.file, self.upload.get_hash())
+        self.assertNotIsInstance(file, HashVerifyingFile)
+        file.close()
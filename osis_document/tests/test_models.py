@@ -23,11 +23,14 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+import uuid
+from unittest import mock
 
 from django.test import TestCase
 
-from osis_document.models import Upload
-from osis_document.tests.factories import PdfUploadFactory, ModifiedUploadFactory
+from osis_document.enums import FileStatus
+from osis_document.models import Token, Upload, get_token_digest
+from osis_document.tests.factories import PdfUploadFactory, ModifiedUploadFactory, ReadTokenFactory, WriteTokenFactory
 
 
 class UploadTestCase(TestCase):
@@ -89,3 +92,86 @@ class UploadTestCase(TestCase):
                 self.modified_upload.upload.get_hash(modified=True),
                 self.modified_upload.upload.metadata['modified_hash'],
             )
+
+
+class UpdateMetadataTestCase(TestCase):
+    def setUp(self):
+        self.upload = PdfUploadFactory()
+
+    def test_metadata_are_merged_in_a_single_query(self):
+        # Changed by another request since the upload was loaded
+        Upload.objects.filter(pk=self.upload.pk).update(metadata={**self.upload.metadata, 'other': 'value'})
+
+        with self.assertNumQueries(1):
+            upload = Upload.objects.update_metadata(self.upload.uuid, {'name': 'new_name.pdf'})
+
+        self.assertEqual(upload.metadata['name'], 'new_name.pdf')
+        self.assertEqual(upload.metadata['other'], 'value')
+        self.assertEqual(upload.metadata['hash'], self.upload.metadata['hash'])
+        self.assertGreater(upload.modified_at, self.upload.modified_at)
+        upload.refresh_from_db()
+        self.assertEqual(upload.metadata['name'], 'new_name.pdf')
+
+    def test_only_top_level_keys_are_replaced(self):
+        Upload.objects.filter(pk=self.upload.pk).update(
+            metadata={**self.upload.metadata, 'author': {'first_name': 'John', 'last_name': 'Doe'}},
+        )
+
+        upload = Upload.objects.update_metadata(self.upload.uuid, {'author': {'first_name': 'Jane'}, 'name': None})
+
+        # Nested objects are replaced as a whole, and null values are stored
+        self.assertEqual(upload.metadata['author'], {'first_name': 'Jane'})
+        self.assertIn('name', upload.metadata)
+        self.assertIsNone(upload.metadata['name'])
+
+    def test_other_fields_are_set(self):
+        upload = Upload.objects.update_metadata(self.upload.uuid, {}, status=FileStatus.UPLOADED.name, size=12)
+        self.assertEqual(upload.status, FileStatus.UPLOADED.name)
+        self.assertEqual(upload.size, 12)
+        self.assertEqual(upload.metadata, self.upload.metadata)
+
+    def test_unknown_upload(self):
+        self.assertIsNone(Upload.objects.update_metadata(uuid.uuid4(), {'name': 'new_name.pdf'}))
+
+    def test_cached_metadata_are_invalidated(self):
+        with mock.patch('osis_document.models.invalidate_metadata') as invalidate_metadata:
+            Upload.objects.update_metadata(self.upload.uuid, {'name': 'new_name.pdf'})
+        invalidate_metadata.assert_called_once_with(self.upload.uuid)
+
+
+class TokenDigestTestCase(TestCase):
+    def test_digest_is_set_when_saved(self):
+        token = WriteTokenFactory()
+        self.assertEqual(Token.objects.get(pk=token.pk).digest, get_token_digest(token.token))
+
+    def test_digest_is_set_when_bulk_created(self):
+        upload = PdfUploadFactory()
+        Token.objects.bulk_create([Token(upload=upload, token='first'), Token(upload=upload, token='second')])
+        self.assertEqual(
+            dict(Token.objects.values_list('token', 'digest')),
+            {'first': get_token_digest('first'), 'second': get_token_digest('second')},
+        )
+
+    def test_tokens_are_looked_up_through_their_digest(self):
+        token = ReadTokenFactory()
+        other_token = WriteTokenFactory()
+        self.assertEqual(Token.objects.resolve(token.token), token)
+        self.assertEqual(set(Token.objects.resolve_many([token.token, other_token.token, 'unknown'])), {
+            token.token,
+            other_token.token,
+        })
+        self.assertEqual(Token.objects.writing_not_expired().with_token(other_token.token).get(), other_token)
+        self.assertEqual(Upload.objects.from_token(token.token), token.upload)
+
+        # A token without the digest of its value is not found
+        Token.objects.filter(pk=other_token.pk).update(digest=get_token_digest('other'))
+        self.assertIsNone(Token.objects.resolve(other_token.token))
+        self.assertIsNone(Upload.objects.from_token(other_token.token))
+
+    def test_tokens_saved_without_digest_are_found(self):
+        # As saved by a process not upgraded yet
+        token = WriteTokenFactory()
+        Token.objects.filter(pk=token.pk).update(digest=None)
+        self.assertEqual(Token.objects.resolve(token.token), token)
+        self.assertEqual(Token.objects.writing_not_expired().with_token(token.token).get(), token)
+        self.assertEqual(set(Token.objects.resolve_many([token.token, 'unknown'])), {token.token})
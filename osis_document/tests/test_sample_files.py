@@ -0,0 +1,85 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+
+from osis_document.sample_files import clear_sample_file_caches, is_file_exist_on_disk, open_sample_file
+from osis_document.tests.factories import PdfUploadFactory
+
+
+class OpenSampleFileTestCase(TestCase):
+    def setUp(self):
+        self.templates_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.templates_dir.cleanup)
+        with open(os.path.join(self.templates_dir.name, 'sample.pdf'), 'wb') as file:
+            file.write(b'sample content')
+        clear_sample_file_caches()
+        self.addCleanup(clear_sample_file_caches)
+
+    def test_sample_file_is_read_once(self):
+        with override_settings(TEMPLATES_RAW_FILE_DIR=self.templates_dir.name):
+            with mock.patch('osis_document.sample_files.open', wraps=open) as open_mock:
+                first_file = open_sample_file('application/pdf')
+                second_file = open_sample_file('application/pdf')
+        self.assertEqual(open_mock.call_count, 1)
+        self.assertEqual(first_file.read(), b'sample content')
+        self.assertEqual(second_file.read(), b'sample content')
+        self.assertEqual(os.path.basename(second_file.name), 'sample.pdf')
+
+    def test_large_sample_file_is_not_cached(self):
+        with override_settings(
+            TEMPLATES_RAW_FILE_DIR=self.templates_dir.name,
+            OSIS_DOCUMENT_SAMPLE_FILE_CACHE_MAX_FILE_SIZE=4,
+        ):
+            with mock.patch('osis_document.sample_files.open', wraps=open) as open_mock:
+                for _ in range(2):
+                    with open_sample_file('application/pdf') as file:
+                        self.assertEqual(file.read(), b'sample content')
+        self.assertEqual(open_mock.call_count, 2)
+
+
+class IsFileExistOnDiskTestCase(TestCase):
+    def setUp(self):
+        clear_sample_file_caches()
+        self.addCleanup(clear_sample_file_caches)
+
+    def test_missing_file_is_remembered(self):
+        upload = PdfUploadFactory()
+        with mock.patch.object(FileSystemStorage, 'exists', return_value=False) as exists_mock:
+            self.assertFalse(is_file_exist_on_disk(upload.file))
+            self.assertFalse(is_file_exist_on_disk(upload.file))
+        exists_mock.assert_called_once()
+
+    def test_existing_file_is_always_checked(self):
+        upload = PdfUploadFactory()
+        with mock.patch.object(FileSystemStorage, 'exists', return_value=True) as exists_mock:
+            self.assertTrue(is_file_exist_on_disk(upload.file))
+            self.assertTrue(is_file_exist_on_disk(upload.file))
+        self.assertEqual(exists_mock.call_count, 2)
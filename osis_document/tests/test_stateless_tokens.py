@@ -0,0 +1,165 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import io
+import zipfile
+from datetime import timedelta
+
+from django.core import signing
+from django.shortcuts import resolve_url
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from osis_document.api.serializers import TokenSerializer
+from osis_document.enums import DocumentError, FileStatus, TokenAccess
+from osis_document.models import Token, Upload
+from osis_document.stateless_tokens import dumps_read_token, loads_read_token
+from osis_document.tests.factories import ModifiedUploadFactory, PdfUploadFactory
+
+
+class StatelessReadTokenTestCase(TestCase):
+    def test_read_token_round_trip(self):
+        upload_id = PdfUploadFactory().pk
+        value, expires_at = dumps_read_token(upload_id, True, timezone.now() + timedelta(minutes=15))
+        self.assertEqual(
+            loads_read_token(value),
+            {'upload_id': upload_id, 'for_modified_upload': True, 'expires_at': expires_at},
+        )
+
+    def test_tampered_read_token(self):
+        value, _ = dumps_read_token(PdfUploadFactory().pk, False, timezone.now() + timedelta(minutes=15))
+        self.assertIsNone(loads_read_token(value[:-1] + ('A' if value[-1] != 'A' else 'B')))
+
+    def test_stored_token_is_not_a_read_token(self):
+        self.assertIsNone(loads_read_token(signing.dumps(str(PdfUploadFactory().pk))))
+        self.assertIsNone(loads_read_token('token'))
+
+
+@override_settings(
+    ROOT_URLCONF='osis_document.urls',
+    OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/',
+    OSIS_DOCUMENT_API_SHARED_SECRET='foobar',
+    OSIS_DOCUMENT_STATELESS_READ_TOKENS=True,
+)
+class StatelessReadTokenViewsTestCase(TestCase):
+    def setUp(self):
+        self.upload = PdfUploadFactory()
+
+    @staticmethod
+    def _get_read_token(upload):
+        serializer = TokenSerializer(data={'upload_id': upload.pk, 'access': TokenAccess.READ.name})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save().token
+
+    def test_read_token_is_not_stored(self):
+        token = self._get_read_token(self.upload)
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(Token.objects.load_read_token(token).upload_id, self.upload.pk)
+
+    def test_read_tokens_are_not_stored(self):
+        other_upload = PdfUploadFactory()
+        serializer = TokenSerializer(
+            data=[
+                {'upload_id': self.upload.pk, 'access': TokenAccess.READ.name},
+                {'upload_id': other_upload.pk, 'access': TokenAccess.WRITE.name},
+            ],
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        read_token, write_token = serializer.save()
+        self.assertEqual(Token.objects.load_read_token(read_token.token).upload_id, self.upload.pk)
+        self.assertQuerysetEqual(Token.objects.all(), [write_token])
+
+    def test_write_token_is_stored(self):
+        response = self.client.post(
+            resolve_url('write-token', pk=self.upload.pk),
+            data={'uuid': str(self.upload.pk)},
+            content_type='application/json',
+            HTTP_X_API_KEY='foobar',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Token.objects.filter(token=response.json()['token'], access=TokenAccess.WRITE.name).exists())
+
+    def test_get_file_without_token_query(self):
+        token = self._get_read_token(self.upload)
+        # Only the upload is fetched
+        with self.assertNumQueries(1):
+            response = self.client.get(resolve_url('raw-file', token=token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'hello world')
+
+    def test_get_modified_file(self):
+        modified_upload = ModifiedUploadFactory()
+        token, _ = dumps_read_token(modified_upload.upload_id, True, timezone.now() + timedelta(minutes=15))
+        response = self.client.get(resolve_url('raw-file', token=token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), modified_upload.file.read())
+
+    def test_get_file_expired_token(self):
+        token, _ = dumps_read_token(self.upload.pk, False, timezone.now() - timedelta(days=1))
+        response = self.client.get(resolve_url('raw-file', token=token))
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_file_of_removed_upload(self):
+        token = self._get_read_token(self.upload)
+        Upload.objects.filter(pk=self.upload.pk).delete()
+        response = self.client.get(resolve_url('raw-file', token=token))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_file_tampered_token(self):
+        token = self._get_read_token(self.upload)
+        response = self.client.get(resolve_url('raw-file', token=token[:-1] + ('A' if token[-1] != 'A' else 'B')))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_metadata(self):
+        token = self._get_read_token(self.upload)
+        response = self.client.get(resolve_url('get-metadata', token=token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'the_file.pdf')
+
+    def test_get_metadata_expired_token(self):
+        token, _ = dumps_read_token(self.upload.pk, False, timezone.now() - timedelta(days=1))
+        response = self.client.get(resolve_url('get-metadata', token=token))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_several_metadata(self):
+        deleted_upload = PdfUploadFactory(status=FileStatus.DELETED.name)
+        token = self._get_read_token(self.upload)
+        expired_token, _ = dumps_read_token(self.upload.pk, False, timezone.now() - timedelta(days=1))
+        deleted_token, _ = dumps_read_token(deleted_upload.pk, False, timezone.now() + timedelta(minutes=15))
+        tokens = [token, expired_token, deleted_token]
+        response = self.client.post(resolve_url('get-several-metadata'), data=tokens, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        metadata = response.json()
+        self.assertEqual(metadata[token]['name'], 'the_file.pdf')
+        for token in [expired_token, deleted_token]:
+            self.assertEqual(metadata[token]['error']['code'], DocumentError.TOKEN_NOT_FOUND.name)
+
+    def test_get_bundle(self):
+        token = self._get_read_token(self.upload)
+        response = self.client.post(resolve_url('file-bundle'), [token], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        bundle = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(bundle.read('the_file.pdf'), b'hello world')
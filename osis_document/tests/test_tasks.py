@@ -24,17 +24,19 @@
 #
 # ##############################################################################
 import uuid
+from datetime import timedelta
 from unittest import mock
 
 from django.test import TestCase, override_settings
 from django.utils.datetime_safe import datetime
+from django.utils.timezone import now
 
-from osis_document.enums import FileStatus, PostProcessingStatus, PostProcessingType
-from osis_document.models import Token, Upload, PostProcessAsync
-from osis_document.tasks import cleanup_old_uploads, make_pending_async_post_processing
+from osis_document.enums import FileStatus, PostProcessingStatus, PostProcessingType, VerificationStatus
+from osis_document.models import Token, Upload, PostProcessAsync, ModifiedUpload, TaskCheckpoint
+from osis_document.tasks import cleanup_old_uploads, make_pending_async_post_processing, verify_uploads_integrity
 from osis_document.tests.factories import WriteTokenFactory, PdfUploadFactory, \
     TextDocumentUploadFactory, ImageUploadFactory, PendingPostProcessingAsyncFactory, \
-    DonePostProcessingAsyncFactory, FailedPostProcessingAsyncFactory, ExpiredPdfUploadFactory
+    DonePostProcessingAsyncFactory, FailedPostProcessingAsyncFactory, ExpiredPdfUploadFactory, ModifiedUploadFactory
 
 
 class CleanupTaskTestCase(TestCase):
@@ -63,6 +65,189 @@ class CleanupTaskTestCase(TestCase):
         self.assertEqual(Token.objects.count(), 1)
 
 
+@override_settings(
+    OSIS_DOCUMENT_CLEANUP_BATCH_SIZE=2,
+    OSIS_DOCUMENT_CLEANUP_MAX_DURATION=60,
+    OSIS_DOCUMENT_CLEANUP_DELETE_WORKERS=2,
+)
+class CleanupBatchesTestCase(TestCase):
+    def setUp(self):
+        self.kept_upload = PdfUploadFactory(status=FileStatus.UPLOADED.name)
+        self.expired_uploads = [ExpiredPdfUploadFactory(status=FileStatus.UPLOADED.name) for _ in range(2)]
+        self.modified_upload = ModifiedUploadFactory(upload=ExpiredPdfUploadFactory(status=FileStatus.UPLOADED.name))
+        self.expired_tokens = [
+            WriteTokenFactory(upload=self.kept_upload, expires_at=now() - timedelta(days=1)) for _ in range(3)
+        ]
+        self.kept_token = WriteTokenFactory(upload=self.kept_upload)
+
+    def test_uploads_and_tokens_are_deleted_by_batches(self):
+        files = [upload.file for upload in [*self.expired_uploads, self.modified_upload.upload, self.modified_upload]]
+        storage = self.kept_upload.file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            report = cleanup_old_uploads()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['uploads'], 3)
+        self.assertEqual(report['files'], 4)
+        self.assertEqual(
+            report['bytes'],
+            sum(upload.size for upload in [*self.expired_uploads, self.modified_upload.upload, self.modified_upload]),
+        )
+        self.assertEqual(report['tokens'], 3)
+        self.assertEqual(list(Upload.objects.all()), [self.kept_upload])
+        self.assertEqual(list(Token.objects.all()), [self.kept_token])
+        self.assertFalse(ModifiedUpload.objects.exists())
+        for file in files:
+            self.assertFalse(storage.exists(file.name))
+        self.assertTrue(storage.exists(self.kept_upload.file.name))
+        self.assertEqual(TaskCheckpoint.objects.get().position, {})
+
+    def test_files_are_only_deleted_after_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            cleanup_old_uploads()
+
+        self.assertFalse(Upload.objects.filter(pk=self.expired_uploads[0].pk).exists())
+        self.assertTrue(self.expired_uploads[0].file.storage.exists(self.expired_uploads[0].file.name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.expired_uploads[0].file.storage.exists(self.expired_uploads[0].file.name))
+
+    def test_expired_tokens_are_deleted_in_a_single_statement_per_batch(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(Token.objects.delete_expired(2), 2)
+        self.assertEqual(Token.objects.delete_expired(2), 1)
+        self.assertEqual(Token.objects.delete_expired(2), 0)
+        self.assertEqual(list(Token.objects.all()), [self.kept_token])
+
+    def test_interrupted_run_is_resumed(self):
+        # The deadline is reached at the start of the second batch
+        with mock.patch('osis_document.cleanup.time.monotonic', side_effect=[0, 1, 100]):
+            report = cleanup_old_uploads()
+
+        self.assertFalse(report['complete'])
+        self.assertEqual(report['uploads'], 2)
+        self.assertEqual(TaskCheckpoint.objects.get().position['stage'], 'uploads')
+        self.assertEqual(Upload.objects.count(), 2)
+
+        report = cleanup_old_uploads()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['uploads'], 1)
+        self.assertEqual(report['tokens'], 3)
+        self.assertEqual(Upload.objects.count(), 1)
+
+    @override_settings(OSIS_DOCUMENT_PARTITIONED_TOKENS=True)
+    def test_expired_token_partitions_are_dropped(self):
+        with mock.patch('osis_document.cleanup.token_partitions') as token_partitions:
+            token_partitions.get_partitioned_models.return_value = [Token]
+            token_partitions.is_partitioned.return_value = True
+            token_partitions.drop_expired_partitions.return_value = ['osis_document_token_p20260101']
+            report = cleanup_old_uploads()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['tokens'], 0)
+        self.assertEqual(report['token_partitions'], 1)
+        token_partitions.create_partitions.assert_called_once_with(Token)
+        token_partitions.drop_expired_partitions.assert_called_once_with(Token)
+        # The tokens are not deleted row by row
+        self.assertEqual(Token.objects.count(), 4)
+
+    @override_settings(OSIS_DOCUMENT_PARTITIONED_TOKENS=True)
+    def test_expired_tokens_are_deleted_by_batches_until_the_table_is_partitioned(self):
+        with mock.patch('osis_document.cleanup.logger') as logger:
+            report = cleanup_old_uploads()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['tokens'], 3)
+        self.assertEqual(report['token_partitions'], 0)
+        self.assertEqual(list(Token.objects.all()), [self.kept_token])
+        logger.warning.assert_called()
+
+
+@override_settings(
+    OSIS_DOCUMENT_INTEGRITY_SCRUB_BATCH_SIZE=2,
+    OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_DURATION=60,
+    OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_BYTES_PER_SECOND=0,
+    OSIS_DOCUMENT_INTEGRITY_SCRUB_INTERVAL=3600,
+)
+class VerifyUploadsIntegrityTaskTestCase(TestCase):
+    def setUp(self):
+        self.valid_uploads = [PdfUploadFactory(status=FileStatus.UPLOADED.name) for _ in range(3)]
+        self.corrupted_upload = PdfUploadFactory(
+            status=FileStatus.UPLOADED.name,
+            metadata={'hash': 'wrong hash', 'name': 'the_file.pdf'},
+        )
+        self.missing_upload = PdfUploadFactory(status=FileStatus.UPLOADED.name)
+        self.missing_upload.file.delete(save=False)
+        self.modified_upload = ModifiedUploadFactory(upload=self.valid_uploads[0])
+        self.requested_upload = PdfUploadFactory()
+
+    def test_all_files_are_verified(self):
+        with mock.patch('osis_document.integrity_scrubber.logger') as logger:
+            report = verify_uploads_integrity()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['verified'], 6)
+        self.assertEqual(report[VerificationStatus.HASH_MISMATCH.name], [str(self.corrupted_upload.uuid)])
+        self.assertEqual(report[VerificationStatus.MISSING.name], [str(self.missing_upload.uuid)])
+        self.assertEqual(logger.error.call_count, 2)
+
+        for upload in self.valid_uploads:
+            upload.refresh_from_db()
+            self.assertEqual(upload.verification_status, VerificationStatus.VALID.name)
+            self.assertIsNotNone(upload.last_verified_at)
+        self.corrupted_upload.refresh_from_db()
+        self.assertEqual(self.corrupted_upload.verification_status, VerificationStatus.HASH_MISMATCH.name)
+        self.missing_upload.refresh_from_db()
+        self.assertEqual(self.missing_upload.verification_status, VerificationStatus.MISSING.name)
+        self.modified_upload.refresh_from_db()
+        self.assertEqual(self.modified_upload.verification_status, VerificationStatus.VALID.name)
+        self.requested_upload.refresh_from_db()
+        self.assertIsNone(self.requested_upload.last_verified_at)
+        self.assertEqual(TaskCheckpoint.objects.get().position, {})
+
+    def test_modification_date_is_kept(self):
+        modified_at = self.valid_uploads[1].modified_at
+        verify_uploads_integrity()
+        self.valid_uploads[1].refresh_from_db()
+        self.assertEqual(self.valid_uploads[1].modified_at, modified_at)
+
+    def test_recently_verified_files_are_skipped(self):
+        Upload.objects.update(last_verified_at=now() - timedelta(minutes=30))
+        ModifiedUpload.objects.update(last_verified_at=now() - timedelta(hours=2))
+
+        report = verify_uploads_integrity()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['verified'], 1)
+
+    def test_interrupted_run_is_resumed(self):
+        with mock.patch('osis_document.integrity_scrubber.logger'):
+            # The deadline is reached at the start of the second batch
+            with mock.patch('osis_document.integrity_scrubber.time.monotonic', side_effect=[0, 1, 2, 3, 100]):
+                report = verify_uploads_integrity()
+
+            self.assertFalse(report['complete'])
+            self.assertEqual(report['verified'], 2)
+            checkpoint = TaskCheckpoint.objects.get()
+            self.assertEqual(checkpoint.position['model'], 'Upload')
+            self.assertEqual(Upload.objects.filter(last_verified_at__isnull=False).count(), 2)
+
+            report = verify_uploads_integrity()
+
+        self.assertTrue(report['complete'])
+        self.assertEqual(report['verified'], 4)
+        self.assertFalse(
+            Upload.objects.filter(status=FileStatus.UPLOADED.name, last_verified_at__isnull=True).exists()
+        )
+
+    @override_settings(OSIS_DOCUMENT_INTEGRITY_SCRUB_MAX_BYTES_PER_SECOND=1024)
+    def test_reading_is_rate_limited(self):
+        with mock.patch('osis_document.integrity_scrubber.time.sleep') as sleep:
+            verify_uploads_integrity()
+        self.assertTrue(sleep.called)
+
+
 @override_settings(ROOT_URLCONF="osis_document.urls", OSIS_DOCUMENT_API_SHARED_SECRET='foobar')
 class MakePendingAsyncPostProcessTaskTestCase(TestCase):
     def setUp(self) -> None:
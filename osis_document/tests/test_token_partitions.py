@@ -0,0 +1,149 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from osis_document.models import Token
+from osis_document.tests.factories import ReadTokenFactory
+from osis_document.token_partitions import (
+    create_partitions,
+    drop_expired_partitions,
+    get_expired_partitions,
+    get_partition_day,
+    get_partition_name,
+    is_partitioned,
+    partition_table,
+)
+
+
+class TokenPartitionNamesTestCase(TestCase):
+    def test_partition_name_gives_its_day(self):
+        name = get_partition_name('osis_document_token', date(2026, 10, 17))
+
+        self.assertEqual(name, 'osis_document_token_p20261017')
+        self.assertEqual(get_partition_day('osis_document_token', name), date(2026, 10, 17))
+
+    def test_other_partitions_have_no_day(self):
+        self.assertIsNone(get_partition_day('osis_document_token', 'osis_document_token_default'))
+        self.assertIsNone(get_partition_day('osis_document_token', 'osis_document_token_pfoo'))
+        self.assertIsNone(get_partition_day('osis_document_token', 'external_storage_token_p20261017'))
+
+    def test_only_partitions_of_past_days_are_expired(self):
+        names = [
+            'osis_document_token_default',
+            'osis_document_token_p20261017',
+            'osis_document_token_p20261016',
+            'osis_document_token_p20261015',
+            'osis_document_token_p20261018',
+        ]
+
+        self.assertEqual(
+            get_expired_partitions('osis_document_token', names, date(2026, 10, 17)),
+            ['osis_document_token_p20261015', 'osis_document_token_p20261016'],
+        )
+
+
+class TokenPartitionCommandsTestCase(TestCase):
+    @mock.patch.object(connection, 'vendor', 'sqlite')
+    def test_commands_require_postgresql(self):
+        for command in ['partition_tokens', 'create_token_partitions', 'drop_expired_token_partitions']:
+            with self.subTest(command=command), self.assertRaisesMessage(CommandError, "PostgreSQL"):
+                call_command(command)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Token tables can only be partitioned on PostgreSQL")
+@override_settings(OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD=2)
+class TokenPartitioningTestCase(TestCase):
+    table = Token._meta.db_table
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.expired_token = ReadTokenFactory(expires_at=timezone.now() - timedelta(days=1))
+        self.token = ReadTokenFactory(expires_at=timezone.now() + timedelta(hours=1))
+        self.later_token = ReadTokenFactory(expires_at=timezone.now() + timedelta(days=5))
+        # The table can't be altered while checks of deferred foreign keys are pending in the transaction of the test
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def get_partition_name(self, days_after_today):
+        return get_partition_name(self.table, self.today + timedelta(days=days_after_today))
+
+    def get_partition(self, token):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tableoid::regclass::text FROM {} WHERE id = %s'.format(connection.ops.quote_name(self.table)),
+                [token.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_partition_table(self):
+        self.assertFalse(is_partitioned(Token))
+
+        self.assertTrue(partition_table(Token))
+
+        self.assertTrue(is_partitioned(Token))
+        self.assertFalse(partition_table(Token))
+        # Only the unexpired tokens are kept
+        self.assertFalse(Token.objects.filter(pk=self.expired_token.pk).exists())
+        self.assertEqual(self.get_partition(self.token), get_partition_name(self.table, self.token.expires_at.date()))
+        self.assertEqual(self.get_partition(self.later_token), self.table + '_default')
+
+        new_token = ReadTokenFactory()
+        self.assertGreater(new_token.pk, self.later_token.pk)
+        self.assertEqual(Token.objects.get(token=new_token.token), new_token)
+
+    def test_create_partitions_moves_their_tokens_out_of_the_default_partition(self):
+        partition_table(Token)
+
+        created = create_partitions(Token, days=6)
+
+        self.assertEqual(created, [self.get_partition_name(day) for day in range(3, 7)])
+        self.assertEqual(
+            self.get_partition(self.later_token),
+            get_partition_name(self.table, self.later_token.expires_at.date()),
+        )
+        self.assertEqual(create_partitions(Token, days=6), [])
+
+    def test_drop_expired_partitions(self):
+        partition_table(Token)
+
+        with mock.patch('osis_document.token_partitions.timezone.now', return_value=timezone.now() + timedelta(days=2)):
+            dropped = drop_expired_partitions(Token)
+
+        self.assertEqual(dropped, [self.get_partition_name(day) for day in range(2)])
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+        self.assertTrue(Token.objects.filter(pk=self.later_token.pk).exists())
+
+        with mock.patch('osis_document.token_partitions.timezone.now', return_value=timezone.now() + timedelta(days=6)):
+            drop_expired_partitions(Token)
+
+        # The expired tokens of the default partition are deleted
+        self.assertFalse(Token.objects.filter(pk=self.later_token.pk).exists())
@@ -0,0 +1,235 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldError
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.shortcuts import resolve_url
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from osis_document.api.serializers import TokenSerializer
+from osis_document.enums import FileStatus, TokenAccess
+from osis_document.models import Token, Upload
+from osis_document.tests.factories import ImageUploadFactory, PdfUploadFactory, ReadTokenFactory, WriteTokenFactory
+from osis_document.tests.views.test_save_editor_view import SMALLEST_PDF
+from osis_document.token_stores import CacheTokenStore, get_token_store
+from osis_document.utils import confirm_upload, get_token
+
+
+class ReadTokenCacheTestCase(TestCase):
+    def setUp(self):
+        get_token_store().read_token_cache.clear()
+
+    def test_read_token_is_served_without_the_store(self):
+        token = ReadTokenFactory()
+        self.assertEqual(Token.objects.resolve(token.token), token)
+        with CaptureQueriesContext(connection) as context:
+            resolved_token = Token.objects.resolve(token.token)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('osis_document_token', context.captured_queries[0]['sql'])
+        self.assertEqual(resolved_token.upload, token.upload)
+        self.assertEqual(resolved_token.access, TokenAccess.READ.name)
+        self.assertEqual(resolved_token.expires_at, token.expires_at)
+
+    def test_upload_status_is_not_cached(self):
+        token = ReadTokenFactory()
+        self.assertEqual(Upload.objects.from_token(token.token), token.upload)
+        Upload.objects.filter(pk=token.upload_id).update(status=FileStatus.DELETED.name)
+        self.assertIsNone(Upload.objects.from_token(token.token))
+
+    def test_writing_token_is_not_cached(self):
+        token = WriteTokenFactory()
+        Token.objects.resolve(token.token)
+        self.assertIsNone(get_token_store().read_token_cache.get(token.token))
+
+    def test_expired_token_is_not_cached(self):
+        token = ReadTokenFactory(expires_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(Token.objects.resolve(token.token), token)
+        self.assertIsNone(get_token_store().read_token_cache.get(token.token))
+
+    @override_settings(OSIS_DOCUMENT_TOKEN_CACHE_TTL=0)
+    def test_disabled_cache(self):
+        token = ReadTokenFactory()
+        Token.objects.resolve(token.token)
+        with self.assertNumQueries(1):
+            Token.objects.resolve(token.token)
+        self.assertIsNone(get_token_store().read_token_cache.get(token.token))
+
+
+@override_settings(
+    ROOT_URLCONF='osis_document.urls',
+    OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/',
+    OSIS_DOCUMENT_TOKEN_STORE='osis_document.token_stores.CacheTokenStore',
+    OSIS_DOCUMENT_TOKEN_STORE_CACHE='default',
+)
+class CacheTokenStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.upload = PdfUploadFactory()
+
+    def test_store(self):
+        self.assertIsInstance(get_token_store(), CacheTokenStore)
+
+    def test_tokens_are_not_stored_in_the_database(self):
+        read_token = get_token(self.upload.uuid, access=TokenAccess.READ.name)
+        other_upload = PdfUploadFactory()
+        write_token = get_token(other_upload.uuid, access=TokenAccess.WRITE.name, for_modified_upload=True)
+        self.assertFalse(Token.objects.exists())
+
+        tokens = Token.objects.resolve_many([read_token, write_token, 'unknown'])
+        self.assertEqual(set(tokens), {read_token, write_token})
+        self.assertEqual(tokens[read_token].access, TokenAccess.READ.name)
+        self.assertEqual(tokens[read_token].upload, self.upload)
+        self.assertEqual(tokens[write_token].access, TokenAccess.WRITE.name)
+        self.assertTrue(tokens[write_token].for_modified_upload)
+        self.assertEqual(async_to_sync(Token.objects.aresolve)(write_token).upload, other_upload)
+        self.assertEqual(Upload.objects.from_token(read_token), self.upload)
+
+    def test_get_file(self):
+        token = get_token(self.upload.uuid, access=TokenAccess.READ.name)
+        response = self.client.get(resolve_url('raw-file', token=token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'hello world')
+
+    def test_expired_token_is_not_found(self):
+        token = get_token(self.upload.uuid, expires_at=timezone.now() - timedelta(days=1))
+        self.assertIsNone(Token.objects.resolve(token))
+
+    def test_token_of_removed_upload_is_not_found(self):
+        token = get_token(self.upload.uuid)
+        self.upload.delete()
+        self.assertIsNone(Token.objects.resolve(token))
+
+    def test_writing_token_is_only_used_once(self):
+        token = get_token(self.upload.uuid)
+        self.assertEqual(confirm_upload(token, upload_to='path/'), self.upload.uuid)
+        self.assertIsNone(Token.objects.resolve(token))
+        with self.assertRaises(FieldError):
+            confirm_upload(token, upload_to='path/')
+
+    def test_read_token_is_not_consumed(self):
+        token = get_token(self.upload.uuid, access=TokenAccess.READ.name)
+        self.assertEqual(Token.objects.consume_writing([token]), {})
+        self.assertIsNotNone(Token.objects.resolve(token))
+
+    def test_writing_token_of_deleted_upload_is_not_consumed(self):
+        token = get_token(PdfUploadFactory(status=FileStatus.DELETED.name).uuid)
+        self.assertIsNone(Token.objects.get_writing(token))
+        self.assertEqual(Token.objects.consume_writing([token]), {})
+
+    @staticmethod
+    def _get_previous_token(upload):
+        # The token is signed earlier, so that it differs from the one issued again by the view
+        with mock.patch.object(signing.TimestampSigner, 'timestamp', return_value=signing.b62_encode(0)):
+            return get_token(upload.uuid, access=TokenAccess.WRITE.name)
+
+    def test_save_editor(self):
+        token = self._get_previous_token(self.upload)
+        url = resolve_url('save-editor', token=token)
+        response = self.client.post(url, {'file': ContentFile(SMALLEST_PDF, 'foo.pdf'), 'rotations': '{}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(Token.objects.resolve(token))
+        self.assertEqual(Token.objects.resolve(response.json()['token']).upload, self.upload)
+        response = self.client.post(url, {'file': ContentFile(SMALLEST_PDF, 'foo.pdf'), 'rotations': '{}'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_rotate_image(self):
+        upload = ImageUploadFactory()
+        token = self._get_previous_token(upload)
+        response = self.client.post(resolve_url('rotate-image', token=token))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(Token.objects.resolve(token))
+        self.assertEqual(Token.objects.resolve(response.json()['token']).upload, upload)
+        response = self.client.post(resolve_url('rotate-image', token=token))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW=300)
+class ReadTokenReuseTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.upload = PdfUploadFactory()
+
+    @staticmethod
+    def _issue_tokens(*tokens_data):
+        serializer = TokenSerializer(data=list(tokens_data), many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _issue_read_token(self, **kwargs):
+        return self._issue_tokens({'upload_id': self.upload.pk, 'access': TokenAccess.READ.name, **kwargs})[0]
+
+    def test_read_token_is_reused(self):
+        token = self._issue_read_token()
+        other_upload = PdfUploadFactory()
+        with self.assertNumQueries(2):
+            reused_token, other_token = self._issue_tokens(
+                {'upload_id': self.upload.pk, 'access': TokenAccess.READ.name},
+                {'upload_id': other_upload.pk, 'access': TokenAccess.READ.name},
+            )
+        self.assertEqual(reused_token.token, token.token)
+        self.assertEqual(reused_token.expires_at, token.expires_at)
+        self.assertNotEqual(other_token.token, token.token)
+        self.assertEqual(Token.objects.count(), 2)
+
+    def test_read_token_of_other_version_is_not_reused(self):
+        self._issue_read_token()
+        self._issue_read_token(for_modified_upload=True)
+        self.assertEqual(Token.objects.count(), 2)
+
+    def test_read_token_expiring_too_soon_or_too_late_is_not_reused(self):
+        token = self._issue_read_token()
+        self._issue_read_token(expires_at=token.expires_at + timedelta(seconds=301))
+        self._issue_read_token(expires_at=token.expires_at - timedelta(seconds=1))
+        self.assertEqual(Token.objects.count(), 3)
+
+    def test_writing_token_is_not_reused(self):
+        self._issue_tokens({'upload_id': self.upload.pk, 'access': TokenAccess.WRITE.name})
+        self._issue_read_token()
+        self.assertEqual(Token.objects.count(), 2)
+
+    @override_settings(OSIS_DOCUMENT_READ_TOKEN_REUSE_WINDOW=0)
+    def test_disabled_reuse(self):
+        self._issue_read_token(expires_at=timezone.now() + timedelta(minutes=10))
+        self._issue_read_token(expires_at=timezone.now() + timedelta(minutes=11))
+        self.assertEqual(Token.objects.count(), 2)
+
+    @override_settings(
+        OSIS_DOCUMENT_TOKEN_STORE='osis_document.token_stores.CacheTokenStore',
+        OSIS_DOCUMENT_TOKEN_STORE_CACHE='default',
+    )
+    def test_read_token_is_reused_with_cache_store(self):
+        token = self._issue_read_token(expires_at=timezone.now() + timedelta(minutes=14))
+        self.assertEqual(self._issue_read_token().expires_at, token.expires_at)
+        self.assertNotEqual(self._issue_read_token(for_modified_upload=True).expires_at, token.expires_at)
+        self.assertFalse(Token.objects.exists())
@@ -23,7 +23,10 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+import errno
+import hashlib
 import os
+import tracemalloc
 import uuid
 from datetime import date, datetime, timedelta
 from unittest import mock
@@ -31,9 +34,12 @@ from unittest.mock import Mock, patch
 
 import factory
 from django.core.exceptions import FieldError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
 from django.test import TestCase, override_settings
 from osis_document.enums import FileStatus, PageFormatEnums, PostProcessingType, DocumentExpirationPolicy
 from osis_document.exceptions import HashMismatch, FormatInvalidException, InvalidMergeFileDimension
+from osis_document.integrity import is_verified, mark_as_verified
 from osis_document.models import Upload, PostProcessing
 from osis_document.tests.factories import (
     PdfUploadFactory,
@@ -44,7 +50,7 @@ from osis_document.tests.factories import (
     TextDocumentUploadFactory,
 )
 from osis_document.utils import confirm_upload, generate_filename, is_uuid, post_process, \
-    stringify_uuid_and_check_uuid_validity
+    stringify_uuid_and_check_uuid_validity, calculate_hash
 from pypdf import PaperSize, PdfReader
 
 
@@ -102,6 +108,41 @@ class GenerateFilenameTestCase(TestCase):
         self.assertEqual(generated_filename, 'my_file.txt')
 
 
+class CalculateHashTestCase(TestCase):
+    content = b'hello world' * 100000
+    expected_hash = hashlib.sha256(content).hexdigest()
+
+    def test_hash_bytes(self):
+        self.assertEqual(calculate_hash(self.content), self.expected_hash)
+
+    def test_hash_stored_file(self):
+        upload = PdfUploadFactory(file=ContentFile(self.content, name='the_file.pdf'))
+        self.assertEqual(calculate_hash(upload.file), self.expected_hash)
+
+    def test_hash_uploaded_files(self):
+        self.assertEqual(calculate_hash(SimpleUploadedFile('the_file.pdf', self.content)), self.expected_hash)
+
+        temporary_file = TemporaryUploadedFile('the_file.pdf', 'application/pdf', len(self.content), None)
+        temporary_file.write(self.content)
+        self.addCleanup(temporary_file.close)
+        self.assertEqual(calculate_hash(temporary_file), self.expected_hash)
+
+    def test_hash_empty_file(self):
+        upload = PdfUploadFactory(file=ContentFile(b'', name='the_file.pdf'))
+        self.assertEqual(calculate_hash(upload.file), hashlib.sha256().hexdigest())
+
+    def test_memory_does_not_depend_on_file_size(self):
+        peak_memories = []
+        for size in [1, 32]:
+            upload = PdfUploadFactory(file=ContentFile(b'\0' * size * 1024 * 1024, name='the_file.pdf'))
+            tracemalloc.start()
+            calculate_hash(upload.file)
+            peak_memories.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        # The content of the files is never copied in Python objects
+        self.assertLess(max(peak_memories), 64 * 1024)
+
+
 @override_settings(OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/')
 class ConfirmUploadTestCase(TestCase):
     def test_with_token(self):
@@ -156,6 +197,61 @@ class ConfirmUploadTestCase(TestCase):
         self.assertTrue(original_upload.file.storage.exists(original_upload.file.name))
         self.assertEqual(original_upload.file.name, updated_upload.file.name)
 
+    def test_file_is_renamed_without_being_copied(self):
+        token = WriteTokenFactory()
+        original_upload = token.upload
+        original_inode = os.stat(original_upload.file.path).st_ino
+        mark_as_verified(original_upload.file, original_upload.metadata['hash'])
+
+        with mock.patch('osis_document.utils.calculate_hash') as calculate_hash_mock:
+            confirm_upload(token.token, upload_to='path/')
+
+        updated_upload = Upload.objects.get(uuid=original_upload.uuid)
+        self.assertTrue(updated_upload.file.name.startswith('path/'))
+        self.assertEqual(os.stat(updated_upload.file.path).st_ino, original_inode)
+        self.assertFalse(os.path.exists(original_upload.file.path))
+        self.assertEqual(updated_upload.metadata['hash'], original_upload.metadata['hash'])
+        calculate_hash_mock.assert_not_called()
+        # The file has been checked before being moved, it doesn't have to be checked again
+        self.assertTrue(is_verified(updated_upload.file, updated_upload.metadata['hash']))
+
+    def test_file_is_not_moved_over_an_existing_file(self):
+        token = WriteTokenFactory()
+        existing_name = Upload.file.field.storage.save('path/the_file.pdf', ContentFile(b'existing file'))
+
+        confirm_upload(token.token, upload_to='path/')
+
+        updated_upload = Upload.objects.get(uuid=token.upload_id)
+        self.assertNotEqual(updated_upload.file.name, existing_name)
+        self.assertEqual(updated_upload.file.read(), b'hello world')
+        with Upload.file.field.storage.open(existing_name) as existing_file:
+            self.assertEqual(existing_file.read(), b'existing file')
+
+    def test_file_is_copied_to_another_file_system(self):
+        token = WriteTokenFactory()
+        original_upload = token.upload
+
+        with mock.patch('osis_document.blob_storage.os.link', side_effect=OSError(errno.EXDEV, 'Cross-device link')):
+            confirm_upload(token.token, upload_to='path/')
+
+        updated_upload = Upload.objects.get(uuid=original_upload.uuid)
+        self.assertTrue(updated_upload.file.name.startswith('path/'))
+        self.assertEqual(updated_upload.file.read(), b'hello world')
+        self.assertFalse(os.path.exists(original_upload.file.path))
+
+    @override_settings(STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}})
+    def test_file_is_copied_on_a_storage_without_local_paths(self):
+        token = WriteTokenFactory()
+        original_upload = token.upload
+        storage = original_upload.file.storage
+
+        confirm_upload(token.token, upload_to='path/')
+
+        updated_upload = Upload.objects.get(uuid=original_upload.uuid)
+        self.assertTrue(updated_upload.file.name.startswith('path/'))
+        self.assertEqual(updated_upload.file.read(), b'hello world')
+        self.assertFalse(storage.exists(original_upload.file.name))
+
     def test_with_unknown_token(self):
         with self.assertRaises(FieldError):
             confirm_upload('unknown-token', upload_to='path/')
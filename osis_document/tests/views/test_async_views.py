@@ -0,0 +1,121 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from osis_document.api.views.metadata import AsyncMetadataListView, AsyncMetadataView
+from osis_document.api.views.raw_file import AsyncRawFileView
+from osis_document.enums import DocumentError, FileStatus
+from osis_document.metadata_cache import get_metadata_cache
+from osis_document.tests.factories import ReadTokenFactory
+
+urlpatterns = [
+    path('file/<path:token>', AsyncRawFileView.as_view(), name=AsyncRawFileView.name),
+    path('metadata/<path:token>', AsyncMetadataView.as_view(), name=AsyncMetadataView.name),
+    path('metadata', AsyncMetadataListView.as_view(), name=AsyncMetadataListView.name),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/')
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        get_metadata_cache().clear()
+        self.token = ReadTokenFactory()
+        self.infected_token = ReadTokenFactory(upload__status=FileStatus.INFECTED.name)
+        self.bad_hash_token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+
+    async def test_get_file(self):
+        response = await self.async_client.get(reverse('raw-file', kwargs={'token': self.token.token}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'hello world')
+        self.assertEqual(response['ETag'], '"{}"'.format(self.token.upload.metadata['hash']))
+
+    async def test_get_file_range(self):
+        response = await self.async_client.get(
+            reverse('raw-file', kwargs={'token': self.token.token}),
+            headers={'Range': 'bytes=0-4'},
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'hello')
+
+    @override_settings(OSIS_DOCUMENT_DOMAIN_LIST=['https://example.com'])
+    async def test_get_file_errors(self):
+        for token, status_code in [
+            ('unknown', 404),
+            (self.infected_token.token, 500),
+            (self.bad_hash_token.token, 409),
+        ]:
+            response = await self.async_client.get(
+                reverse('raw-file', kwargs={'token': token}),
+                headers={'Origin': 'https://example.com'},
+            )
+            self.assertEqual(response.status_code, status_code)
+            self.assertIn('detail', response.json())
+            self.assertEqual(response['Access-Control-Allow-Origin'], 'https://example.com')
+
+    async def test_get_metadata(self):
+        response = await self.async_client.get(reverse('get-metadata', kwargs={'token': self.token.token}))
+        self.assertEqual(response.status_code, 200)
+        metadata = response.json()
+        self.assertEqual(metadata['name'], 'the_file.pdf')
+        self.assertEqual(metadata['upload_uuid'], str(self.token.upload.uuid))
+        self.assertTrue(response.has_header('ETag'))
+
+    async def test_get_cached_metadata(self):
+        url = reverse('get-metadata', kwargs={'token': self.token.token})
+        response = await self.async_client.get(url)
+        with mock.patch('osis_document.models.UploadManager.afrom_token') as afrom_token:
+            cached_response = await self.async_client.get(url)
+        afrom_token.assert_not_called()
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.json(), response.json())
+
+    async def test_get_metadata_bad_hash(self):
+        response = await self.async_client.get(reverse('get-metadata', kwargs={'token': self.bad_hash_token.token}))
+        self.assertEqual(response.status_code, 409)
+
+    async def test_get_several_metadata(self):
+        response = await self.async_client.post(
+            reverse('get-several-metadata'),
+            json.dumps([self.token.token, 'unknown']),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        metadata = response.json()
+        self.assertEqual(metadata[self.token.token]['name'], 'the_file.pdf')
+        self.assertEqual(metadata['unknown']['error']['code'], DocumentError.TOKEN_NOT_FOUND.name)
+
+    async def test_get_several_metadata_bad_request(self):
+        response = await self.async_client.post(
+            reverse('get-several-metadata'),
+            'not json',
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
@@ -25,12 +25,16 @@
 # ##############################################################################
 from unittest import mock
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.shortcuts import resolve_url
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.datetime_safe import datetime
 from rest_framework.test import APITestCase
 
-from osis_document.models import Upload
+from osis_document.enums import FileStatus
+from osis_document.models import Token, Upload
 from osis_document.tests.factories import ReadTokenFactory, WriteTokenFactory
 
 
@@ -83,3 +87,130 @@ class ConfirmUploadViewTestCase(APITestCase):
             token = WriteTokenFactory()
         response = self.client.post(resolve_url('confirm-upload', token=token.token))
         self.assertEqual(400, response.status_code)
+
+
+@override_settings(ROOT_URLCONF="osis_document.urls", OSIS_DOCUMENT_API_SHARED_SECRET='foobar')
+class ConfirmUploadBatchViewTestCase(APITestCase):
+    def setUp(self):
+        self.client.defaults = {'HTTP_X_API_KEY': 'foobar'}
+        self.url = resolve_url('confirm-uploads')
+
+    def test_protected(self):
+        self.client.defaults = {}
+        token = WriteTokenFactory()
+        response = self.client.post(self.url, {'uploads': [{'token': token.token}]}, format='json')
+        self.assertEqual(403, response.status_code)
+
+    def test_confirm_uploads(self):
+        tokens = WriteTokenFactory.create_batch(3)
+        read_token = ReadTokenFactory()
+
+        response = self.client.post(
+            self.url,
+            {
+                'uploads': [
+                    {'token': tokens[0].token, 'upload_to': 'first-path/'},
+                    {'token': tokens[1].token, 'upload_to': 'second-path/', 'metadata': {'author': 'Joe'}},
+                    {'token': tokens[2].token, 'document_expiration_policy': 'EXPORT_EXPIRATION_POLICY'},
+                    {'token': read_token.token},
+                    {'token': 'unknown'},
+                ],
+            },
+            format='json',
+        )
+
+        self.assertEqual(201, response.status_code)
+        json = response.json()
+        self.assertEqual(json[tokens[0].token], {'uuid': str(tokens[0].upload_id)})
+        self.assertEqual(json[read_token.token]['error']['code'], 'TOKEN_NOT_FOUND')
+        self.assertEqual(json['unknown']['error']['code'], 'TOKEN_NOT_FOUND')
+
+        first_upload = Upload.objects.get(uuid=tokens[0].upload_id)
+        self.assertEqual(first_upload.status, FileStatus.UPLOADED.name)
+        self.assertRegex(first_upload.file.name, r'^first-path/')
+        self.assertEqual(first_upload.file.read(), b'hello world')
+        second_upload = Upload.objects.get(uuid=tokens[1].upload_id)
+        self.assertRegex(second_upload.file.name, r'^second-path/')
+        self.assertEqual(second_upload.metadata['author'], 'Joe')
+        self.assertEqual(second_upload.metadata['hash'], tokens[1].upload.metadata['hash'])
+        third_upload = Upload.objects.get(uuid=tokens[2].upload_id)
+        self.assertIsNotNone(third_upload.expires_at)
+        # The tokens can't be used again
+        self.assertFalse(Token.objects.filter(pk__in=[token.pk for token in tokens]).exists())
+        self.assertTrue(Token.objects.filter(pk=read_token.pk).exists())
+
+    def test_confirm_uploads_in_a_constant_number_of_queries(self):
+        def confirm_uploads(count):
+            tokens = WriteTokenFactory.create_batch(count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    self.url,
+                    {'uploads': [{'token': token.token, 'upload_to': 'path/'} for token in tokens]},
+                    format='json',
+                )
+            self.assertEqual(201, response.status_code)
+            return len(queries)
+
+        # Select the tokens, delete them, update the uploads (within the request transaction)
+        self.assertEqual(confirm_uploads(1), confirm_uploads(5))
+        self.assertEqual(Upload.objects.filter(status=FileStatus.UPLOADED.name).count(), 6)
+
+    def test_related_model_resolved_once(self):
+        tokens = WriteTokenFactory.create_batch(2)
+        related_model = {
+            'app': 'osis_document',
+            'model': 'upload',
+            'field': 'file',
+            'instance_filters': {'uuid': str(tokens[0].upload_id)},
+        }
+
+        with mock.patch.object(
+            ContentType,
+            'get_object_for_this_type',
+            return_value=tokens[0].upload,
+        ) as get_object_mock:
+            response = self.client.post(
+                self.url,
+                {'uploads': [{'token': token.token, 'related_model': related_model} for token in tokens]},
+                format='json',
+            )
+
+        self.assertEqual(201, response.status_code)
+        get_object_mock.assert_called_once_with(uuid=str(tokens[0].upload_id))
+
+    def test_already_confirmed_upload(self):
+        token = WriteTokenFactory(upload__status=FileStatus.UPLOADED.name)
+        file_name = token.upload.file.name
+
+        response = self.client.post(self.url, {'uploads': [{'token': token.token}]}, format='json')
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(response.json(), {token.token: {'uuid': str(token.upload_id)}})
+        self.assertEqual(Upload.objects.get().file.name, file_name)
+
+    def test_file_not_moved(self):
+        failing_token, token = WriteTokenFactory.create_batch(2)
+        original_move = Upload.file.field.storage.move
+
+        def move(old_name, new_name, max_length=None):
+            if old_name == failing_token.upload.file.name:
+                raise OSError()
+            return original_move(old_name, new_name, max_length)
+
+        with mock.patch.object(Upload.file.field.storage, 'move', side_effect=move):
+            response = self.client.post(
+                self.url,
+                {'uploads': [{'token': failing_token.token}, {'token': token.token}]},
+                format='json',
+            )
+
+        self.assertEqual(201, response.status_code)
+        json = response.json()
+        self.assertEqual(json[failing_token.token]['error']['code'], 'UPLOAD_NOT_MOVED')
+        self.assertEqual(json[token.token], {'uuid': str(token.upload_id)})
+        self.assertEqual(Upload.objects.get(pk=failing_token.upload_id).status, FileStatus.REQUESTED.name)
+        self.assertEqual(Upload.objects.get(pk=token.upload_id).status, FileStatus.UPLOADED.name)
+
+    def test_empty_list(self):
+        response = self.client.post(self.url, {'uploads': []}, format='json')
+        self.assertEqual(400, response.status_code)
@@ -0,0 +1,149 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import APIException
+
+from osis_document.enums import DocumentError, FileStatus
+from osis_document.tests.factories import ModifiedUploadFactory, ReadTokenFactory
+
+
+@override_settings(OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/')
+class FileBundleViewTestCase(TestCase):
+    def _get_bundle(self, tokens):
+        response = self.client.post(reverse('osis_document:file-bundle'), tokens, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_get_bundle(self):
+        first_token = ReadTokenFactory()
+        second_token = ReadTokenFactory(
+            upload__metadata={'name': 'other.txt', 'hash': first_token.upload.metadata['hash']},
+            upload__mimetype='text/plain',
+        )
+
+        bundle = self._get_bundle([first_token.token, second_token.token])
+
+        self.assertIsNone(bundle.testzip())
+        self.assertEqual(bundle.namelist(), ['the_file.pdf', 'other.txt', 'manifest.json'])
+        self.assertEqual(bundle.read('the_file.pdf'), b'hello world')
+        self.assertEqual(bundle.getinfo('the_file.pdf').compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(bundle.getinfo('other.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(
+            json.loads(bundle.read('manifest.json')),
+            {first_token.token: {'name': 'the_file.pdf'}, second_token.token: {'name': 'other.txt'}},
+        )
+
+    def test_files_are_checked_while_added(self):
+        token = ReadTokenFactory()
+
+        with mock.patch('osis_document.utils.calculate_hash') as calculate_hash:
+            bundle = self._get_bundle([token.token])
+
+        calculate_hash.assert_not_called()
+        self.assertEqual(bundle.read('the_file.pdf'), b'hello world')
+
+    def test_get_bundle_with_same_names(self):
+        tokens = [ReadTokenFactory(), ReadTokenFactory()]
+        bundle = self._get_bundle([token.token for token in tokens])
+        self.assertEqual(bundle.namelist(), ['the_file.pdf', 'the_file (2).pdf', 'manifest.json'])
+
+    def test_get_bundle_of_modified_file(self):
+        modified_upload = ModifiedUploadFactory()
+        token = ReadTokenFactory(upload=modified_upload.upload, for_modified_upload=True)
+        bundle = self._get_bundle([token.token])
+        self.assertEqual(bundle.read('the_file.pdf'), b'hello world modified')
+
+    def test_get_bundle_with_errors(self):
+        valid_token = ReadTokenFactory()
+        expired_token = ReadTokenFactory(expires_at=datetime.now() - timedelta(seconds=60))
+        infected_token = ReadTokenFactory(upload__status=FileStatus.INFECTED.name)
+        deleted_token = ReadTokenFactory(upload__status=FileStatus.DELETED.name)
+        bad_hash_token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+
+        bundle = self._get_bundle([
+            'unknown',
+            expired_token.token,
+            infected_token.token,
+            deleted_token.token,
+            bad_hash_token.token,
+            valid_token.token,
+        ])
+
+        # The partial entry of the file whose hash does not match is left out of the archive
+        self.assertIsNone(bundle.testzip())
+        self.assertEqual(bundle.namelist(), ['the_file.pdf', 'manifest.json'])
+        self.assertEqual(bundle.read('the_file.pdf'), b'hello world')
+        manifest = json.loads(bundle.read('manifest.json'))
+        self.assertEqual(manifest[valid_token.token], {'name': 'the_file.pdf'})
+        for token, error in [
+            ('unknown', DocumentError.TOKEN_NOT_FOUND.name),
+            (expired_token.token, DocumentError.TOKEN_EXPIRED.name),
+            (infected_token.token, DocumentError.INFECTED.name),
+            (deleted_token.token, DocumentError.UPLOAD_NOT_FOUND.name),
+            (bad_hash_token.token, DocumentError.HASH_MISMATCH.name),
+        ]:
+            self.assertEqual(manifest[token]['error']['code'], error)
+
+    def test_get_bundle_with_unlisted_error(self):
+        valid_token = ReadTokenFactory()
+        failing_token = ReadTokenFactory()
+
+        def get_readable_upload(token):
+            if token.token == failing_token.token:
+                raise APIException()
+            return token.upload
+
+        with mock.patch('osis_document.api.views.file_bundle.get_readable_upload', side_effect=get_readable_upload):
+            bundle = self._get_bundle([failing_token.token, valid_token.token])
+
+        self.assertEqual(bundle.namelist(), ['the_file.pdf', 'manifest.json'])
+        manifest = json.loads(bundle.read('manifest.json'))
+        self.assertEqual(manifest[failing_token.token]['error']['code'], DocumentError.UPLOAD_NOT_FOUND.name)
+        self.assertEqual(manifest[valid_token.token], {'name': 'the_file.pdf'})
+
+    def test_get_bundle_in_a_single_query(self):
+        tokens = [ReadTokenFactory(), ReadTokenFactory()]
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('osis_document:file-bundle'),
+                [token.token for token in tokens],
+                content_type='application/json',
+            )
+            b''.join(response.streaming_content)
+
+    @override_settings(OSIS_DOCUMENT_FILE_BUNDLE_MAX_FILES=1)
+    def test_get_bundle_bad_request(self):
+        for data in [[], {'token': 'foo'}, ['foo', 'bar']]:
+            response = self.client.post(reverse('osis_document:file-bundle'), data, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
@@ -24,11 +24,17 @@
 #
 # ##############################################################################
 
+from datetime import timedelta
+from unittest import mock
+
 from django.shortcuts import resolve_url
 from django.test import override_settings
+from django.utils.timezone import now
 from rest_framework.test import APITestCase
 
-from osis_document.enums import DocumentError
+from osis_document.enums import DocumentError, FileStatus
+from osis_document.metadata_cache import get_cached_metadata, get_metadata_cache
+from osis_document.models import Token, Upload
 from osis_document.tests import QueriesAssertionsMixin
 from osis_document.tests.factories import ReadTokenFactory, WriteTokenFactory
 
@@ -45,6 +51,28 @@ class MetadataViewTestCase(APITestCase):
         self.assertIn('name', metadata)
         self.assertIn('uploaded_at', metadata)
 
+    def test_get_metadata_not_modified(self):
+        token = ReadTokenFactory()
+        response = self.client.get(resolve_url('get-metadata', token=token.token))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+
+        with mock.patch('osis_document.api.views.metadata.is_valid_checksum') as is_valid_checksum:
+            response = self.client.get(
+                resolve_url('get-metadata', token=token.token),
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(response.status_code, 304)
+        is_valid_checksum.assert_not_called()
+
+        token.upload.metadata = {**token.upload.metadata, 'name': 'other_name.pdf'}
+        token.upload.save()
+        response = self.client.get(
+            resolve_url('get-metadata', token=token.token),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 200)
+
     def test_get_file_bad_token(self):
         response = self.client.get(resolve_url('get-metadata', token='token'))
         self.assertEqual(response.status_code, 404)
@@ -71,6 +99,33 @@ class MetadataViewTestCase(APITestCase):
         self.assertEqual(upload.metadata['name'], 'foobar')
         self.assertEqual(upload.metadata['new_property'], 'value')
 
+    def test_change_metadata_not_an_object(self):
+        token = WriteTokenFactory()
+        for data in [['name', 'foobar'], 'foobar', 42]:
+            with self.subTest(data=data):
+                response = self.client.post(resolve_url('change-metadata', token=token.token), data, format='json')
+                self.assertEqual(response.status_code, 400)
+        upload = token.upload
+        upload.refresh_from_db()
+        self.assertEqual(upload.metadata['name'], 'the_file.pdf')
+
+    def test_change_metadata_keeps_concurrent_changes(self):
+        token = WriteTokenFactory()
+
+        def get_token_then_change_metadata(*args, **kwargs):
+            # Changed by another request once the token is loaded
+            Upload.objects.filter(pk=token.upload_id).update(metadata={**token.upload.metadata, 'other': 'value'})
+            return token
+
+        with mock.patch.object(Token.objects, 'get_writing', side_effect=get_token_then_change_metadata):
+            response = self.client.post(resolve_url('change-metadata', token=token.token), {'name': 'foobar'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['other'], 'value')
+        upload = Upload.objects.get(pk=token.upload_id)
+        self.assertEqual(upload.metadata['name'], 'foobar')
+        self.assertEqual(upload.metadata['other'], 'value')
+
     def test_change_metadata_hash_is_forbidden(self):
         token = WriteTokenFactory()
         original_hash = token.upload.metadata['hash']
@@ -111,3 +166,108 @@ class MetadataListViewTestCase(QueriesAssertionsMixin, APITestCase):
         self.assertIn('error', metadata[tokens[0]])
         self.assertEqual(metadata[tokens[0]]['error']['code'], DocumentError.TOKEN_NOT_FOUND.name)
         self.assertEqual(metadata[tokens[0]]['error']['message'], DocumentError.TOKEN_NOT_FOUND.value)
+
+
+@override_settings(
+    ROOT_URLCONF='osis_document.urls',
+    OSIS_DOCUMENT_BASE_URL='http://dummyurl.com/document/',
+    OSIS_DOCUMENT_API_SHARED_SECRET='foobar',
+    OSIS_DOCUMENT_METADATA_CACHE_TTL=300,
+)
+class MetadataCacheTestCase(QueriesAssertionsMixin, APITestCase):
+    def setUp(self):
+        get_metadata_cache().clear()
+        self.token = ReadTokenFactory()
+
+    def test_cached_metadata_are_served_without_database_nor_file(self):
+        response = self.client.get(resolve_url('get-metadata', token=self.token.token))
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch('osis_document.api.views.metadata.is_valid_checksum') as is_valid_checksum:
+            with self.assertNumQueries(0):
+                cached_response = self.client.get(resolve_url('get-metadata', token=self.token.token))
+        is_valid_checksum.assert_not_called()
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertEqual(cached_response['ETag'], response['ETag'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                resolve_url('get-metadata', token=self.token.token),
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_upload_is_cached_once_for_all_its_tokens(self):
+        other_token = ReadTokenFactory(upload=self.token.upload)
+        self.client.get(resolve_url('get-metadata', token=self.token.token))
+        self.client.get(resolve_url('get-metadata', token=other_token.token))
+
+        self.token.upload.save()
+
+        self.assertEqual(get_cached_metadata([self.token.token, other_token.token]), {})
+
+    def test_change_metadata_invalidates_cache(self):
+        write_token = WriteTokenFactory(upload=self.token.upload)
+        self.client.get(resolve_url('get-metadata', token=self.token.token))
+
+        self.client.post(resolve_url('change-metadata', token=write_token.token), {'name': 'foobar.pdf'})
+
+        response = self.client.get(resolve_url('get-metadata', token=self.token.token))
+        self.assertEqual(response.json()['name'], 'foobar.pdf')
+
+    def test_declare_files_as_deleted_invalidates_cache(self):
+        self.client.get(resolve_url('get-metadata', token=self.token.token))
+
+        self.client.post(
+            resolve_url('declare-files-as-deleted'),
+            {'files': [str(self.token.upload_id)]},
+            HTTP_X_API_KEY='foobar',
+        )
+
+        self.assertEqual(Upload.objects.get().status, FileStatus.DELETED.name)
+        response = self.client.get(resolve_url('get-metadata', token=self.token.token))
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_is_not_cached_after_its_expiry(self):
+        token = ReadTokenFactory(expires_at=now() + timedelta(seconds=10), upload=self.token.upload)
+        with mock.patch.object(get_metadata_cache(), 'set', wraps=get_metadata_cache().set) as cache_set:
+            self.client.get(resolve_url('get-metadata', token=token.token))
+        self.assertEqual(cache_set.call_args_list[0].args[2], 300)
+        self.assertLessEqual(cache_set.call_args_list[1].args[2], 10)
+
+    @override_settings(OSIS_DOCUMENT_METADATA_CACHE_TTL=0)
+    def test_disabled_cache(self):
+        self.client.get(resolve_url('get-metadata', token=self.token.token))
+        self.assertEqual(get_cached_metadata([self.token.token]), {})
+
+    def test_bad_hash_is_not_cached(self):
+        token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+        self.assertEqual(self.client.get(resolve_url('get-metadata', token=token.token)).status_code, 409)
+        self.assertEqual(self.client.get(resolve_url('get-metadata', token=token.token)).status_code, 409)
+
+    def test_several_metadata_only_query_missing_tokens(self):
+        other_token = ReadTokenFactory()
+        response = self.client.post(resolve_url('get-several-metadata'), data=[self.token.token])
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                resolve_url('get-several-metadata'),
+                data=[self.token.token, other_token.token, 'bad-token'],
+            )
+        metadata = response.json()
+        self.assertEqual(metadata[self.token.token]['upload_uuid'], str(self.token.upload_id))
+        self.assertEqual(metadata[self.token.token]['url'], 'http://dummyurl.com/document/file/' + self.token.token)
+        self.assertEqual(metadata[other_token.token]['upload_uuid'], str(other_token.upload_id))
+        self.assertEqual(metadata['bad-token']['error']['code'], DocumentError.TOKEN_NOT_FOUND.name)
+
+        with self.assertNumQueries(0):
+            self.client.post(resolve_url('get-several-metadata'), data=[self.token.token, other_token.token])
+
+    def test_several_metadata_entries_do_not_spare_the_file_check(self):
+        self.client.post(resolve_url('get-several-metadata'), data=[self.token.token])
+
+        with mock.patch('osis_document.api.views.metadata.is_valid_checksum', return_value=True) as is_valid:
+            self.client.get(resolve_url('get-metadata', token=self.token.token))
+        is_valid.assert_called_once()
@@ -24,11 +24,16 @@
 #
 # ##############################################################################
 
+import time
+from unittest import mock
+
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils.datetime_safe import datetime
+from django.utils.http import http_date
 
 from osis_document.enums import FileStatus
+from osis_document.exceptions import HashMismatch
 from osis_document.tests.factories import PdfUploadFactory, ReadTokenFactory, ModifiedUploadFactory
 
 
@@ -135,6 +140,46 @@ class FileViewTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 403)
 
+    def test_get_file_deleted_upload(self):
+        token = ReadTokenFactory(upload__status=FileStatus.DELETED.name)
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_file_in_a_single_query(self):
+        token = ReadTokenFactory()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse(
+                    'osis_document:raw-file',
+                    kwargs={
+                        'token': token.token,
+                    },
+                )
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_modified_file_in_a_single_query(self):
+        modified_upload = ModifiedUploadFactory()
+        token = ReadTokenFactory(upload=modified_upload.upload, for_modified_upload=True)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse(
+                    'osis_document:raw-file',
+                    kwargs={
+                        'token': token.token,
+                    },
+                )
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), modified_upload.file.read())
+
     def test_get_modified_file(self):
         modified_upload = ModifiedUploadFactory()
         token = ReadTokenFactory(upload=modified_upload.upload, for_modified_upload=True)
@@ -176,3 +221,256 @@ class FileViewTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(b''.join(response.streaming_content), modified_upload.upload.file.read())
+
+    @override_settings(OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK=True)
+    def test_get_file_with_streaming_integrity_check(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'hello world')
+
+    @override_settings(OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK=True)
+    def test_get_file_bad_hash_with_streaming_integrity_check(self):
+        token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(HashMismatch):
+            b''.join(response.streaming_content)
+
+    def test_get_file_range(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=6-',
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Range'], 'bytes 6-10/11')
+        self.assertEqual(response['Content-Length'], '5')
+        self.assertEqual(b''.join(response.streaming_content), b'world')
+
+    def test_get_file_multiple_ranges(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=0-1, -2',
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        boundary = response['Content-Type'].split('boundary=')[1]
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(content), int(response['Content-Length']))
+        self.assertEqual(
+            content,
+            (
+                '--{boundary}\r\nContent-Type: application/pdf\r\nContent-Range: bytes 0-1/11\r\n\r\nhe\r\n'
+                '--{boundary}\r\nContent-Type: application/pdf\r\nContent-Range: bytes 9-10/11\r\n\r\nld\r\n'
+                '--{boundary}--\r\n'
+            ).format(boundary=boundary).encode(),
+        )
+
+    def test_get_file_unsatisfiable_range(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=20-30',
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */11')
+
+    def test_get_file_range_with_unmatched_if_range(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=6-',
+            HTTP_IF_RANGE='"another-version"',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'hello world')
+
+    def test_get_file_range_bad_hash(self):
+        token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=6-',
+        )
+        self.assertEqual(response.status_code, 409)
+
+    @override_settings(OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK=True)
+    def test_get_file_range_bad_hash_with_streaming_integrity_check(self):
+        token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_RANGE='bytes=6-',
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_get_file_validators(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"{}"'.format(token.upload.metadata['hash']))
+        self.assertEqual(response['Last-Modified'], http_date(int(token.upload.modified_at.timestamp())))
+
+    def test_get_file_not_modified(self):
+        token = ReadTokenFactory()
+        url = reverse(
+            'osis_document:raw-file',
+            kwargs={
+                'token': token.token,
+            },
+        )
+        with mock.patch('osis_document.api.views.raw_file.is_valid_checksum') as is_valid_checksum:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"{}"'.format(token.upload.metadata['hash']))
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], '"{}"'.format(token.upload.metadata['hash']))
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+            self.assertEqual(response.status_code, 304)
+        is_valid_checksum.assert_not_called()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"another-version"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_modified_file_validators(self):
+        modified_upload = ModifiedUploadFactory()
+        token = ReadTokenFactory(upload=modified_upload.upload, for_modified_upload=True)
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            ),
+            HTTP_IF_NONE_MATCH='"{}"'.format(modified_upload.upload.metadata['hash']),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"{}"'.format(modified_upload.upload.metadata['modified_hash']))
+
+    def test_head_file(self):
+        token = ReadTokenFactory()
+        response = self.client.head(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '11')
+
+    @override_settings(OSIS_DOCUMENT_FILE_DELIVERY='X_ACCEL_REDIRECT', OSIS_DOCUMENT_X_ACCEL_REDIRECT_PREFIX='/protected/')
+    def test_get_file_with_x_accel_redirect(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+            + '?dl=1'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + token.upload.file.name)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="{}"'.format(token.upload.metadata['name']))
+        self.assertEqual(response.content, b'')
+
+    @override_settings(
+        OSIS_DOCUMENT_FILE_DELIVERY='X_ACCEL_REDIRECT',
+        STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}},
+    )
+    def test_get_file_without_local_path_with_x_accel_redirect(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+        self.assertEqual(b''.join(response.streaming_content), b'hello world')
+
+    @override_settings(OSIS_DOCUMENT_FILE_DELIVERY='X_SENDFILE')
+    def test_get_file_with_x_sendfile(self):
+        token = ReadTokenFactory()
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], token.upload.file.path)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(OSIS_DOCUMENT_FILE_DELIVERY='X_SENDFILE', OSIS_DOCUMENT_STREAMING_INTEGRITY_CHECK=True)
+    def test_get_file_bad_hash_with_x_sendfile(self):
+        token = ReadTokenFactory(upload__metadata={'hash': 'badvalue'})
+        response = self.client.get(
+            reverse(
+                'osis_document:raw-file',
+                kwargs={
+                    'token': token.token,
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 409)
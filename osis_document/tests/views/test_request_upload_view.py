@@ -23,9 +23,12 @@
 #    see http://www.gnu.org/licenses/.
 #
 # ##############################################################################
+import hashlib
 from pathlib import Path
+from unittest import mock
 
 from django.core.files.base import ContentFile, File
+from django.core.files.move import file_move_safe
 from django.shortcuts import resolve_url
 from django.test import TestCase, override_settings
 
@@ -72,6 +75,25 @@ class RequestUploadViewTestCase(TestCase):
         self.assertEqual(Upload.objects.first().status, FileStatus.REQUESTED.name)
         self.assertTrue(Token.objects.first().access, TokenAccess.WRITE.name)
 
+    @override_settings(ENABLE_MIMETYPE_VALIDATION=True)
+    def test_upload_is_hashed_and_sniffed_while_received(self):
+        file = ContentFile(SMALLEST_PDF, 'foo.pdf')
+
+        with mock.patch('osis_document.utils._update_hash_from_descriptor') as hash_from_disk, mock.patch(
+            'django.core.files.storage.filesystem.file_move_safe',
+            wraps=file_move_safe,
+        ) as move:
+            response = self.client.post(resolve_url('request-upload'), {'file': file})
+
+        self.assertEqual(201, response.status_code)
+        upload = Upload.objects.get()
+        self.assertEqual(upload.metadata['hash'], hashlib.sha256(SMALLEST_PDF).hexdigest())
+        self.assertEqual(upload.size, len(SMALLEST_PDF))
+        self.assertEqual(upload.file.read(), SMALLEST_PDF)
+        hash_from_disk.assert_not_called()
+        # The temporary file is moved to the storage instead of being copied
+        move.assert_called_once()
+
     def test_upload_long_filename(self):
         file = ContentFile(SMALLEST_PDF, 'a' * 300 + '.pdf')
         self.assertFalse(Upload.objects.exists())
@@ -24,6 +24,8 @@
 #
 # ##############################################################################
 
+import hashlib
+
 from django.core.files.base import ContentFile
 from django.shortcuts import resolve_url
 from django.test import TestCase, override_settings
@@ -58,6 +60,7 @@ class SaveEditorViewTestCase(TestCase):
         self.assertEqual(200, response.status_code)
         self.upload.refresh_from_db()
         self.assertEqual(self.upload.file.read(), SMALLEST_PDF)
+        self.assertEqual(self.upload.metadata['hash'], hashlib.sha256(SMALLEST_PDF).hexdigest())
         with self.assertRaises(Upload.modified_upload.RelatedObjectDoesNotExist):
             self.upload.modified_upload
 
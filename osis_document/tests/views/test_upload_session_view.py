@@ -0,0 +1,232 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from uuid import UUID
+
+from django.core.cache import cache
+from django.shortcuts import resolve_url
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from osis_document import upload_sessions
+from osis_document.blob_storage import get_blob_name
+from osis_document.enums import FileStatus, TokenAccess
+from osis_document.models import Token, Upload, UploadSession
+from osis_document.tasks import cleanup_old_uploads
+from osis_document.tests.views.test_request_upload_view import SMALLEST_PDF
+from osis_document.utils import calculate_hash
+
+CHUNK_SIZE = 50
+
+
+@override_settings(ROOT_URLCONF='osis_document.urls', OSIS_DOCUMENT_UPLOAD_CHUNK_SIZE=CHUNK_SIZE)
+class UploadSessionViewTestCase(TestCase):
+    def setUp(self):
+        self.session_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.session_dir, ignore_errors=True)
+        settings_override = override_settings(OSIS_DOCUMENT_UPLOAD_SESSION_DIR=self.session_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        upload_sessions.get_hash_cache().clear()
+        # The throttling history is kept in the cache
+        cache.clear()
+
+    def create_session(self, content=SMALLEST_PDF, name='foo.pdf'):
+        response = self.client.post(
+            resolve_url('create-upload-session'),
+            {'name': name, 'mimetype': 'application/pdf', 'size': len(content)},
+            content_type='application/json',
+        )
+        self.assertEqual(201, response.status_code, response.content)
+        return response.json()['uuid']
+
+    def send_chunk(self, session_uuid, index, content=SMALLEST_PDF):
+        return self.client.put(
+            resolve_url('upload-chunk', pk=session_uuid, index=index),
+            content[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE],
+            content_type='application/octet-stream',
+        )
+
+    def send_all_chunks(self, session_uuid, content=SMALLEST_PDF):
+        for index in range(-(-len(content) // CHUNK_SIZE)):
+            self.assertEqual(200, self.send_chunk(session_uuid, index, content).status_code)
+
+    def test_create_session(self):
+        response = self.client.post(
+            resolve_url('create-upload-session'),
+            {'name': 'foo.pdf', 'mimetype': 'application/pdf', 'size': len(SMALLEST_PDF)},
+            content_type='application/json',
+        )
+        self.assertEqual(201, response.status_code)
+        json = response.json()
+        self.assertEqual(json['size'], len(SMALLEST_PDF))
+        self.assertEqual(json['chunk_size'], CHUNK_SIZE)
+        self.assertEqual(json['received'], 0)
+        self.assertTrue(UploadSession.objects.filter(pk=json['uuid']).exists())
+
+    @override_settings(OSIS_DOCUMENT_ALLOWED_EXTENSIONS=['txt'])
+    def test_create_session_with_bad_extension(self):
+        response = self.client.post(
+            resolve_url('create-upload-session'),
+            {'name': 'foo.pdf', 'mimetype': 'application/pdf', 'size': 10},
+            content_type='application/json',
+        )
+        self.assertEqual(400, response.status_code)
+
+    @override_settings(OSIS_DOCUMENT_MAX_UPLOAD_SIZE=100)
+    def test_create_session_too_large(self):
+        response = self.client.post(
+            resolve_url('create-upload-session'),
+            {'name': 'foo.pdf', 'mimetype': 'application/pdf', 'size': 101},
+            content_type='application/json',
+        )
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_upload_in_chunks(self):
+        session_uuid = self.create_session()
+        self.send_all_chunks(session_uuid)
+
+        response = self.client.get(resolve_url('upload-session', pk=session_uuid))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(response.json()['received'], len(SMALLEST_PDF))
+
+        response = self.client.post(resolve_url('finalize-upload-session', pk=session_uuid))
+        self.assertEqual(201, response.status_code)
+        token = Token.objects.get(token=response.json()['token'])
+        self.assertEqual(token.access, TokenAccess.WRITE.name)
+        upload = Upload.objects.get()
+        self.assertEqual(upload.uuid, token.upload_id)
+        self.assertEqual(upload.status, FileStatus.REQUESTED.name)
+        self.assertEqual(upload.size, len(SMALLEST_PDF))
+        self.assertEqual(upload.metadata['name'], 'foo.pdf')
+        with upload.file.open('rb') as file:
+            self.assertEqual(file.read(), SMALLEST_PDF)
+            file.seek(0)
+            self.assertEqual(upload.metadata['hash'], calculate_hash(file))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.session_dir), [])
+
+    def test_finalize_hashes_the_file_when_the_hash_is_unknown(self):
+        session_uuid = self.create_session()
+        self.send_all_chunks(session_uuid)
+        # As if the chunks had been received by another process
+        upload_sessions.get_hash_cache().clear()
+
+        response = self.client.post(resolve_url('finalize-upload-session', pk=session_uuid))
+        self.assertEqual(201, response.status_code)
+        upload = Upload.objects.get()
+        with upload.file.open('rb') as file:
+            self.assertEqual(upload.metadata['hash'], calculate_hash(file))
+
+    @override_settings(OSIS_DOCUMENT_CONTENT_ADDRESSED_STORAGE=True)
+    def test_finalize_does_not_read_the_file_to_hash_it(self):
+        session_uuid = self.create_session()
+        self.send_all_chunks(session_uuid)
+
+        with mock.patch('osis_document.utils._update_hash_from_descriptor') as read_file_mock:
+            response = self.client.post(resolve_url('finalize-upload-session', pk=session_uuid))
+        self.assertEqual(201, response.status_code)
+        read_file_mock.assert_not_called()
+        upload = Upload.objects.get()
+        self.assertTrue(upload.file.name.startswith(get_blob_name(upload.metadata['hash'])))
+        with upload.file.open('rb') as file:
+            self.assertEqual(upload.metadata['hash'], calculate_hash(file))
+
+    def test_resend_chunk(self):
+        session_uuid = self.create_session()
+        self.send_chunk(session_uuid, 0)
+        self.send_chunk(session_uuid, 1)
+
+        response = self.send_chunk(session_uuid, 0)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(response.json()['received'], 2 * CHUNK_SIZE)
+
+    def test_chunk_out_of_order(self):
+        session_uuid = self.create_session()
+        response = self.send_chunk(session_uuid, 1)
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+
+    def test_chunk_with_wrong_size(self):
+        session_uuid = self.create_session()
+        response = self.client.put(
+            resolve_url('upload-chunk', pk=session_uuid, index=0),
+            SMALLEST_PDF[: CHUNK_SIZE - 1],
+            content_type='application/octet-stream',
+        )
+        self.assertEqual(400, response.status_code)
+        response = self.client.put(
+            resolve_url('upload-chunk', pk=session_uuid, index=0),
+            SMALLEST_PDF[: CHUNK_SIZE + 1],
+            content_type='application/octet-stream',
+        )
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+
+    def test_finalize_incomplete_upload(self):
+        session_uuid = self.create_session()
+        self.send_chunk(session_uuid, 0)
+
+        response = self.client.post(resolve_url('finalize-upload-session', pk=session_uuid))
+        self.assertEqual(409, response.status_code)
+        self.assertFalse(Upload.objects.exists())
+
+    def test_expired_session(self):
+        session_uuid = self.create_session()
+        UploadSession.objects.update(expires_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(404, self.client.get(resolve_url('upload-session', pk=session_uuid)).status_code)
+        self.assertEqual(404, self.send_chunk(session_uuid, 0).status_code)
+        response = self.client.post(resolve_url('finalize-upload-session', pk=session_uuid))
+        self.assertEqual(404, response.status_code)
+
+    @override_settings(OSIS_DOCUMENT_DOMAIN_LIST=['http://dummyurl.com/'])
+    def test_cors(self):
+        session_uuid = self.create_session()
+        response = self.send_chunk(session_uuid, 0)
+        self.assertEqual(response["Access-Control-Allow-Methods"], "PUT")
+        response = self.client.options(
+            resolve_url('upload-chunk', pk=session_uuid, index=0),
+            HTTP_ORIGIN="http://dummyurl.com/",
+        )
+        self.assertEqual(response["Access-Control-Allow-Origin"], "http://dummyurl.com/")
+
+    def test_cleanup_expired_sessions(self):
+        expired_uuid = self.create_session()
+        self.send_chunk(expired_uuid, 0)
+        ongoing_uuid = self.create_session()
+        self.send_chunk(ongoing_uuid, 0)
+        UploadSession.objects.filter(pk=expired_uuid).update(expires_at=timezone.now() - timedelta(days=1))
+
+        cleanup_old_uploads()
+
+        self.assertEqual(list(UploadSession.objects.values_list('uuid', flat=True)), [UUID(ongoing_uuid)])
+        self.assertEqual(os.listdir(self.session_dir), ['{}.part'.format(ongoing_uuid)])
@@ -0,0 +1,257 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Type
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from osis_document.exceptions import TokenPartitioningException
+
+PARTITION_KEY = 'expires_at'
+PARTITION_SUFFIX = '_p'
+PARTITION_DATE_FORMAT = '%Y%m%d'
+DEFAULT_PARTITION_SUFFIX = '_default'
+UNPARTITIONED_SUFFIX = '_unpartitioned'
+
+
+def get_partitioned_models() -> List[Type[models.Model]]:
+    """Return the token models whose tables may be partitioned by day of expiration"""
+    from osis_document.models import Token
+
+    token_models = [Token]
+    if apps.is_installed('external_storage'):
+        token_models.append(apps.get_model('external_storage', 'Token'))
+    return token_models
+
+
+def get_partition_name(table: str, day: date) -> str:
+    return '{}{}{}'.format(table, PARTITION_SUFFIX, day.strftime(PARTITION_DATE_FORMAT))
+
+
+def get_partition_day(table: str, name: str) -> Optional[date]:
+    """Return the day of the tokens stored by the partition, or None if it is not a daily partition of the table"""
+    prefix = table + PARTITION_SUFFIX
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], PARTITION_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def get_expired_partitions(table: str, names: Iterable[str], today: date) -> List[str]:
+    """Return the daily partitions whose tokens have all expired before the day, in the order of their days"""
+    days = {name: get_partition_day(table, name) for name in names}
+    return sorted((name for name, day in days.items() if day is not None and day < today), key=days.get)
+
+
+def _get_bounds(day: date):
+    # The bounds are given as literals, read in the time zone of the connection as the expiration dates are
+    return (
+        datetime.combine(day, time.min).isoformat(sep=' '),
+        datetime.combine(day + timedelta(days=1), time.min).isoformat(sep=' '),
+    )
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise TokenPartitioningException("Token tables can only be partitioned on PostgreSQL")
+
+
+def _get_partitions(cursor, table: str) -> List[str]:
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+        """,
+        [table],
+    )
+    return [name for name, in cursor.fetchall()]
+
+
+def is_partitioned(model: Type[models.Model]) -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table
+                JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+                WHERE pg_class.relname = %s AND pg_table_is_visible(pg_class.oid)
+            )
+            """,
+            [model._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def _check_partitioned(model: Type[models.Model]):
+    if not is_partitioned(model):
+        raise TokenPartitioningException("The table {} is not partitioned".format(model._meta.db_table))
+
+
+def partition_table(model: Type[models.Model]) -> bool:
+    """
+    Convert the table of the model to a table partitioned by day of expiration, with a default partition for the
+    tokens outside of the daily partitions. Only the unexpired tokens are copied, while the table is locked. The primary
+    key of a partitioned table has to include the expiration date. Return False if the table already is partitioned.
+    """
+    _check_vendor()
+    table = model._meta.db_table
+    old_table = table + UNPARTITIONED_SUFFIX
+    pk = model._meta.pk.column
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(model):
+            return False
+        cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(qn(table)))
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE confrelid = %s::regclass)", [table])
+        if cursor.fetchone()[0]:
+            raise TokenPartitioningException("The table {} is referenced by foreign keys".format(table))
+
+        # The secondary indexes and the foreign keys are created again on the partitioned table
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [table],
+        )
+        index_definitions = [definition for definition, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        # The primary key is either an identity column or a serial column, whose default takes the values of a sequence
+        # owned by the column
+        cursor.execute(
+            "SELECT attidentity != '', pg_get_serial_sequence(%s, %s) FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attname = %s",
+            [table, pk, table, pk],
+        )
+        is_identity, sequence = cursor.fetchone()
+
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(qn(table), qn(old_table)))
+        cursor.execute(
+            'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE ({})'.format(qn(table), qn(old_table), qn(PARTITION_KEY))
+        )
+        if sequence is not None and not is_identity:
+            # The copied default still takes the values of the sequence of the old table, which would be dropped with it
+            cursor.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(sequence, qn(table), qn(pk)))
+        cursor.execute('CREATE TABLE {} PARTITION OF {} DEFAULT'.format(qn(table + DEFAULT_PARTITION_SUFFIX), qn(table)))
+        create_partitions(model)
+        cursor.execute(
+            'INSERT INTO {} SELECT * FROM {} WHERE {} > %s'.format(qn(table), qn(old_table), qn(PARTITION_KEY)),
+            [timezone.now()],
+        )
+        if is_identity:
+            # The identity of the new table has its own sequence, owned by its column, which goes on from the last key
+            # given by the old one
+            cursor.execute(
+                'SELECT setval(pg_get_serial_sequence(%s, %s), (SELECT COALESCE(MAX({}), 0) + 1 FROM {}), false)'.format(
+                    qn(pk),
+                    qn(old_table),
+                ),
+                [table, pk],
+            )
+        cursor.execute('DROP TABLE {}'.format(qn(old_table)))
+
+        cursor.execute('ALTER TABLE {} ADD PRIMARY KEY ({}, {})'.format(qn(table), qn(pk), qn(PARTITION_KEY)))
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(qn(table), qn(name), definition))
+    return True
+
+
+def create_partitions(model: Type[models.Model], days: Optional[int] = None) -> List[str]:
+    """
+    Create the missing partitions of today and of the `days` next days (OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD by
+    default), moving their tokens out of the default partition. Return the names of the created partitions.
+    """
+    _check_vendor()
+    _check_partitioned(model)
+    if days is None:
+        days = settings.OSIS_DOCUMENT_TOKEN_PARTITIONS_AHEAD
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+    today = timezone.now().date()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = set(_get_partitions(cursor, table))
+        for day in (today + timedelta(days=offset) for offset in range(days + 1)):
+            name = get_partition_name(table, day)
+            if name in existing:
+                continue
+            start, end = _get_bounds(day)
+            cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(
+                qn(name),
+                qn(table),
+            ))
+            # The partition can only be attached once no tokens of its day are left in the default partition
+            cursor.execute(
+                'WITH moved AS (DELETE FROM {default} WHERE {key} >= %s AND {key} < %s RETURNING *) '
+                'INSERT INTO {partition} SELECT * FROM moved'.format(
+                    default=qn(table + DEFAULT_PARTITION_SUFFIX),
+                    key=qn(PARTITION_KEY),
+                    partition=qn(name),
+                ),
+                [start, end],
+            )
+            cursor.execute(
+                'ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)'.format(qn(table), qn(name)),
+                [start, end],
+            )
+            created.append(name)
+    return created
+
+
+def drop_expired_partitions(model: Type[models.Model]) -> List[str]:
+    """
+    Drop the daily partitions whose tokens have all expired, each one in its own short transaction, and delete the
+    expired tokens of the default partition. Return the names of the dropped partitions.
+    """
+    _check_vendor()
+    _check_partitioned(model)
+    table = model._meta.db_table
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        expired = get_expired_partitions(table, _get_partitions(cursor, table), timezone.now().date())
+        for name in expired:
+            with transaction.atomic():
+                cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(qn(table), qn(name)))
+                cursor.execute('DROP TABLE {}'.format(qn(name)))
+        cursor.execute(
+            'DELETE FROM {} WHERE {} <= %s'.format(qn(table + DEFAULT_PARTITION_SUFFIX), qn(PARTITION_KEY)),
+            [timezone.now()],
+        )
+    return expired
@@ -0,0 +1,320 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import math
+from collections import defaultdict
+from datetime import timedelta
+from operator import attrgetter
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Subquery
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from osis_document.cache import LRUCache
+from osis_document.enums import FileStatus, TokenAccess
+
+TOKEN_KEY_PREFIX = 'osis_document:token:'
+# The last read token of each upload (and version) is also referenced by the cache store, to be reused
+READ_TOKEN_KEY_PREFIX = 'osis_document:read-token:'
+
+_token_store = None
+
+
+def get_token_store() -> 'TokenStore':
+    """Return the process-wide store of the tokens, the class of which is set by OSIS_DOCUMENT_TOKEN_STORE"""
+    global _token_store
+    if _token_store is None:
+        _token_store = import_string(settings.OSIS_DOCUMENT_TOKEN_STORE)()
+    return _token_store
+
+
+@receiver(setting_changed)
+def reset_token_store(setting, **kwargs):
+    global _token_store
+    if setting.startswith('OSIS_DOCUMENT_TOKEN_'):
+        _token_store = None
+
+
+class TokenStore:
+    """
+    Store of the tokens whose properties are not embedded in their value (all but the stateless read tokens). The tokens
+    are returned with their upload and modified upload. The read tokens are also kept in a small per-process cache, in
+    front of the store: unlike the writing tokens, they are never consumed.
+    """
+
+    def __init__(self):
+        self.read_token_cache = LRUCache(
+            max_size=settings.OSIS_DOCUMENT_TOKEN_CACHE_SIZE,
+            ttl=settings.OSIS_DOCUMENT_TOKEN_CACHE_TTL,
+        )
+
+    def save_many(self, tokens: List) -> None:
+        raise NotImplementedError
+
+    def consume_writing_many(self, values: Iterable[str]) -> Dict:
+        """Remove the writing tokens of the values and return them by value, leaving out the expired ones and the ones
+        of deleted uploads. Each token is only returned once, whatever the number of concurrent calls."""
+        raise NotImplementedError
+
+    def delete_expired(self, limit: int) -> int:
+        """Delete at most `limit` expired tokens, the ones which expired first, and return their number: there may be
+        expired tokens left only if it is `limit`."""
+        return 0
+
+    def reuse_read_tokens(self, tokens: List, window: int) -> List:
+        """
+        Give the new read tokens the value and expiration date of a stored read token for the same upload (and version)
+        expiring at most `window` seconds before them, never after. Return the tokens which still have to be stored.
+        """
+        read_tokens = [token for token in tokens if token.access == TokenAccess.READ.name]
+        if not read_tokens:
+            return tokens
+        window = timedelta(seconds=window)
+        candidates = sorted(self._get_read_tokens(read_tokens, window), key=attrgetter('expires_at'), reverse=True)
+        reused_tokens = set()
+        for token in read_tokens:
+            for candidate in candidates:
+                if (
+                    str(candidate.upload_id) == str(token.upload_id)
+                    and candidate.for_modified_upload == token.for_modified_upload
+                    and token.expires_at - window <= candidate.expires_at <= token.expires_at
+                ):
+                    token.pk = candidate.pk
+                    token.token = candidate.token
+                    token.expires_at = candidate.expires_at
+                    token.created_at = candidate.created_at
+                    reused_tokens.add(id(token))
+                    break
+        return [token for token in tokens if id(token) not in reused_tokens]
+
+    def _get_read_tokens(self, tokens: List, window: timedelta) -> List:
+        """Return the stored read tokens of the uploads of the tokens which may be reused for them"""
+        raise NotImplementedError
+
+    def _get_many(self, values: List[str]) -> Dict:
+        raise NotImplementedError
+
+    async def _aget_many(self, values: List[str]) -> Dict:
+        raise NotImplementedError
+
+    def get(self, value: str):
+        return self.get_many([value]).get(value)
+
+    async def aget(self, value: str):
+        return (await self.aget_many([value])).get(value)
+
+    def get_many(self, values: Iterable[str]) -> Dict:
+        """Return the tokens of the values by value, whatever their expiration date"""
+        from osis_document.models import Token
+
+        cached_tokens, missing_values = self._get_cached_read_tokens(values)
+        tokens = self._get_many(missing_values) if missing_values else {}
+        self._cache_read_tokens(tokens.values())
+        tokens.update(Token.objects.attach_uploads(cached_tokens))
+        return tokens
+
+    async def aget_many(self, values: Iterable[str]) -> Dict:
+        from osis_document.models import Token
+
+        cached_tokens, missing_values = self._get_cached_read_tokens(values)
+        tokens = await self._aget_many(missing_values) if missing_values else {}
+        self._cache_read_tokens(tokens.values())
+        tokens.update(await Token.objects.aattach_uploads(cached_tokens))
+        return tokens
+
+    def _get_cached_read_tokens(self, values: Iterable[str]):
+        from osis_document.models import Token
+
+        cached_tokens, missing_values = [], []
+        for value in values:
+            properties = self.read_token_cache.get(value)
+            if properties is None:
+                missing_values.append(value)
+            else:
+                cached_tokens.append(Token(token=value, access=TokenAccess.READ.name, **properties))
+        return cached_tokens, missing_values
+
+    def _cache_read_tokens(self, tokens):
+        now = timezone.now()
+        for token in tokens:
+            if token.access == TokenAccess.READ.name:
+                # The token is not cached after it expires, so that it is then reported as such by the store
+                self.read_token_cache.set(token.token, {
+                    'upload_id': token.upload_id,
+                    'for_modified_upload': token.for_modified_upload,
+                    'expires_at': token.expires_at,
+                }, ttl=(token.expires_at - now).total_seconds())
+
+
+class DatabaseTokenStore(TokenStore):
+    """The tokens are rows of the Token table, the expired ones being deleted by the cleanup task"""
+
+    def save_many(self, tokens: List) -> None:
+        from osis_document.models import Token
+
+        Token.objects.bulk_create(tokens)
+
+    def consume_writing_many(self, values: Iterable[str]) -> Dict:
+        from osis_document.models import Token
+
+        with transaction.atomic(savepoint=False):
+            # The rows are locked until they are deleted: a concurrent consumer waits for them, and then no longer
+            # finds them
+            tokens = {
+                token.token: token
+                for token in Token.objects.writing_not_expired().with_tokens(list(values)).select_related(
+                    'upload',
+                ).select_for_update(of=('self',))
+            }
+            Token.objects.filter(pk__in=[token.pk for token in tokens.values()]).delete()
+        return tokens
+
+    def delete_expired(self, limit: int) -> int:
+        from osis_document.models import Token
+
+        # A single statement, which only reads the expired rows through the index of the expiration dates
+        batch = Token.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at').values('pk')[:limit]
+        deleted, _ = Token.objects.filter(pk__in=Subquery(batch)).delete()
+        return deleted
+
+    def _get_read_tokens(self, tokens: List, window: timedelta) -> List:
+        from osis_document.models import Token
+
+        # A single query through the index of the uploads, which only have a few tokens each
+        return list(Token.objects.filter(
+            upload_id__in={token.upload_id for token in tokens},
+            access=TokenAccess.READ.name,
+            expires_at__gt=timezone.now(),
+            expires_at__gte=min(token.expires_at for token in tokens) - window,
+            expires_at__lte=max(token.expires_at for token in tokens),
+        ))
+
+    def _get_many(self, values: List[str]) -> Dict:
+        return {token.token: token for token in self._get_queryset(values)}
+
+    async def _aget_many(self, values: List[str]) -> Dict:
+        return {token.token: token async for token in self._get_queryset(values)}
+
+    @staticmethod
+    def _get_queryset(values: List[str]):
+        from osis_document.models import Token
+
+        return Token.objects.with_tokens(values).select_related('upload__modified_upload')
+
+
+class CacheTokenStore(TokenStore):
+    """
+    The tokens are entries of a cache (OSIS_DOCUMENT_TOKEN_STORE_CACHE, e.g. Redis) which expire with them: they don't
+    need to be cleaned up, and an expired token is not found anymore.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cache: BaseCache = caches[settings.OSIS_DOCUMENT_TOKEN_STORE_CACHE]
+
+    def save_many(self, tokens: List) -> None:
+        # The tokens issued together usually share their expiration date, they are then stored at once
+        now = timezone.now()
+        entries_by_timeout = defaultdict(dict)
+        for token in tokens:
+            timeout = math.ceil((token.expires_at - now).total_seconds())
+            if timeout > 0:
+                entries_by_timeout[timeout][self._get_key(token.token)] = {
+                    'token': token.token,
+                    'upload_id': token.upload_id,
+                    'access': token.access,
+                    'for_modified_upload': token.for_modified_upload,
+                    'expires_at': token.expires_at,
+                }
+                if token.access == TokenAccess.READ.name:
+                    entries_by_timeout[timeout][self._get_read_token_key(token)] = token.token
+        for timeout, entries in entries_by_timeout.items():
+            self.cache.set_many(entries, timeout)
+
+    def consume_writing_many(self, values: Iterable[str]) -> Dict:
+        from osis_document.models import Token
+
+        keys = self._get_keys(values)
+        # Only one of the concurrent consumers of a token deletes its entry
+        tokens = [
+            token
+            for token in self._build_tokens(keys, self.cache.get_many(keys.values()))
+            if token.access == TokenAccess.WRITE.name and self.cache.delete(keys[token.token])
+        ]
+        now = timezone.now()
+        return {
+            value: token
+            for value, token in Token.objects.attach_uploads(tokens).items()
+            if token.expires_at > now and token.upload.status != FileStatus.DELETED.name
+        }
+
+    def _get_read_tokens(self, tokens: List, window: timedelta) -> List:
+        values = self.cache.get_many({self._get_read_token_key(token) for token in tokens}).values()
+        keys = self._get_keys(values)
+        return self._build_tokens(keys, self.cache.get_many(keys.values()))
+
+    def _get_many(self, values: List[str]) -> Dict:
+        from osis_document.models import Token
+
+        keys = self._get_keys(values)
+        return Token.objects.attach_uploads(self._build_tokens(keys, self.cache.get_many(keys.values())))
+
+    async def _aget_many(self, values: List[str]) -> Dict:
+        from osis_document.models import Token
+
+        keys = self._get_keys(values)
+        return await Token.objects.aattach_uploads(self._build_tokens(keys, await self.cache.aget_many(keys.values())))
+
+    @staticmethod
+    def _get_key(value: str) -> str:
+        from osis_document.models import get_token_digest
+
+        # The tokens are long signed values: their digest fits in the key length limit of the cache backends
+        return TOKEN_KEY_PREFIX + get_token_digest(value).hex
+
+    @staticmethod
+    def _get_read_token_key(token) -> str:
+        return '{}{}:{:d}'.format(READ_TOKEN_KEY_PREFIX, token.upload_id, token.for_modified_upload)
+
+    @classmethod
+    def _get_keys(cls, values: Iterable[str]) -> Dict[str, str]:
+        return {value: cls._get_key(value) for value in values}
+
+    @staticmethod
+    def _build_tokens(keys: Dict[str, str], entries: Dict[str, Dict]) -> List:
+        from osis_document.models import Token
+
+        return [
+            Token(**entries[key])
+            for value, key in keys.items()
+            # The value is compared to rule out the collisions of the digests
+            if key in entries and entries[key]['token'] == value
+        ]
@@ -0,0 +1,88 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import hashlib
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+
+# Enough to sniff the content type of any supported file
+HEAD_SIZE = 4096
+
+
+class HashedFileMixin:
+    """A file whose hash is already known, which calculate_hash() and the storages don't read again"""
+
+    hash = None
+
+
+class IngestedUploadedFile(HashedFileMixin, TemporaryUploadedFile):
+    """A file uploaded to disk, with its hash and first bytes computed while it was received"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.head = b''
+
+
+class IngestUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream the uploaded files to disk and compute their hash and keep their first bytes in the same pass, so that they
+    are not read again before being stored. The file system storage moves the temporary file instead of copying it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # The temporary file created by the parent handler is replaced, it is not created at all
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = IngestedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hash.update(raw_data)
+        if len(self.file.head) < HEAD_SIZE:
+            self.file.head += raw_data[: HEAD_SIZE - len(self.file.head)]
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.hash = self.hash.hexdigest()
+        return super().file_complete(file_size)
+
+
+class IngestUploadMixin:
+    """Receive the files uploaded to the view with the ingest upload handler only"""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [IngestUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+
+def read_head(file, size=HEAD_SIZE) -> bytes:
+    """Return the first bytes of a file, kept when it was received or read from its beginning"""
+    head = getattr(file, 'head', None)
+    if head is not None and (len(head) >= size or len(head) == file.size):
+        return head[:size]
+    file.seek(0)
+    head = file.read(size)
+    file.seek(0)
+    return head
@@ -0,0 +1,169 @@
+# ##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2026 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+# ##############################################################################
+import contextlib
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from osis_document.cache import LRUCache
+from osis_document.exceptions import InvalidChunkSize, UnexpectedChunk, UploadIncomplete, UploadSessionNotFound
+from osis_document.models import OsisDocumentMimeMatchValidator, Upload, UploadSession
+from osis_document.upload_handlers import HashedFileMixin
+from osis_document.utils import calculate_hash
+
+_hash_cache = None
+
+
+def get_hash_cache() -> LRUCache:
+    """
+    Return the process-wide cache of the hash of the content received by the sessions, with its length. As the state
+    of a hash can't be stored in the database, it is only known by the process which received the previous chunk, so
+    it only spares reading the file again in single-process deployments: the file is read once more to be hashed when
+    finalizing a session whose chunks were received by several processes (e.g. several workers of the server), or
+    whose hash has been evicted by more recent sessions.
+    """
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = LRUCache(max_size=128, ttl=settings.OSIS_DOCUMENT_UPLOAD_SESSION_MAX_AGE)
+    return _hash_cache
+
+
+def get_partial_file_path(session: UploadSession) -> str:
+    return os.path.join(settings.OSIS_DOCUMENT_UPLOAD_SESSION_DIR, '{}.part'.format(session.uuid))
+
+
+def delete_partial_file(session: UploadSession):
+    get_hash_cache().delete(session.uuid)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(get_partial_file_path(session))
+
+
+class UploadSessionFile(HashedFileMixin, File):
+    """
+    The content received by a session, moved by the file system storage instead of being copied. Its hash, once known,
+    is not computed again when it is stored.
+    """
+
+    def __init__(self, session: UploadSession):
+        self._path = get_partial_file_path(session)
+        super().__init__(open(self._path, 'rb'), name=session.name)
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def get_session(session_uuid, lock=False) -> UploadSession:
+    """Return the session if it has not expired, locked until the end of the transaction if asked"""
+    queryset = UploadSession.objects.select_for_update() if lock else UploadSession.objects
+    session = queryset.filter(pk=session_uuid, expires_at__gt=Now()).first()
+    if session is None:
+        raise UploadSessionNotFound()
+    return session
+
+
+def write_chunk(session_uuid, index: int, data: bytes) -> UploadSession:
+    """
+    Write the chunk of the given index of a session and return the updated session. The chunks must be sent in order:
+    a chunk already received is ignored, so that it can be sent again when its response was lost.
+    """
+    with transaction.atomic():
+        session = get_session(session_uuid, lock=True)
+        offset = index * session.chunk_size
+        if offset < session.received:
+            return session
+        if offset > session.received:
+            raise UnexpectedChunk()
+        if len(data) != min(session.chunk_size, session.size - offset):
+            raise InvalidChunkSize()
+
+        os.makedirs(settings.OSIS_DOCUMENT_UPLOAD_SESSION_DIR, exist_ok=True)
+        fd = os.open(get_partial_file_path(session), os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            with memoryview(data) as view:
+                while view:
+                    view = view[os.write(fd, view):]
+            # Anything written after this chunk by an interrupted request is discarded
+            os.ftruncate(fd, offset + len(data))
+        finally:
+            os.close(fd)
+
+        received_length, hash_state = get_hash_cache().get(session.uuid, (None, None))
+        if offset == 0:
+            hash_state = hashlib.sha256()
+        elif received_length != offset:
+            hash_state = None
+        if hash_state is None:
+            get_hash_cache().delete(session.uuid)
+        else:
+            hash_state.update(data)
+            get_hash_cache().set(session.uuid, (offset + len(data), hash_state))
+
+        session.received = offset + len(data)
+        session.save(update_fields=['received'])
+    return session
+
+
+def finalize(session_uuid) -> Upload:
+    """Create the requested upload of a complete session, from its received content"""
+    with transaction.atomic():
+        session = get_session(session_uuid, lock=True)
+        if session.received != session.size:
+            raise UploadIncomplete()
+
+        with UploadSessionFile(session) as file:
+            OsisDocumentMimeMatchValidator()(file)
+            received_length, hash_state = get_hash_cache().get(session.uuid, (None, None))
+            if received_length == session.size:
+                file.hash = hash_state.hexdigest()
+            else:
+                file.seek(0)
+                file.hash = calculate_hash(file)
+            upload = Upload(
+                file=file,
+                mimetype=session.mimetype,
+                size=session.size,
+                metadata={'hash': file.hash, 'name': session.name},
+            )
+            upload.save()
+
+        # The content has been moved by the file system storage, but copied by the other ones
+        delete_partial_file(session)
+        session.delete()
+    return upload
+
+
+def delete_expired_sessions() -> int:
+    """Delete the sessions which were not finalized in time, with their received content, and return their number"""
+    expired_sessions = list(UploadSession.objects.filter(expires_at__lte=timezone.now()))
+    for session in expired_sessions:
+        delete_partial_file(session)
+    return UploadSession.objects.filter(pk__in=[session.pk for session in expired_sessions]).delete()[0]
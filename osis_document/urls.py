@@ -31,7 +31,20 @@ from .enums import TokenAccess
 app_name = 'osis_document'
 urlpatterns = [
     path('request-upload', views.RequestUploadView.as_view(), name=views.RequestUploadView.name),
+    path('upload-session', views.CreateUploadSessionView.as_view(), name=views.CreateUploadSessionView.name),
+    path('upload-session/<uuid:pk>', views.UploadSessionView.as_view(), name=views.UploadSessionView.name),
+    path(
+        'upload-session/<uuid:pk>/chunk/<int:index>',
+        views.UploadChunkView.as_view(),
+        name=views.UploadChunkView.name,
+    ),
+    path(
+        'upload-session/<uuid:pk>/finalize',
+        views.FinalizeUploadSessionView.as_view(),
+        name=views.FinalizeUploadSessionView.name,
+    ),
     path('confirm-upload/<path:token>', views.ConfirmUploadView.as_view(), name=views.ConfirmUploadView.name),
+    path('confirm-uploads', views.ConfirmUploadBatchView.as_view(), name=views.ConfirmUploadBatchView.name),
     path('declare-file-as-infected', views.DeclareFileAsInfectedView.as_view(), name='declare-file-as-infected'),
     path('declare-files-as-deleted', views.DeclareFilesAsDeletedView.as_view(), name='declare-files-as-deleted'),
     path('read-token/<uuid:pk>', views.GetTokenView.as_view(token_access=TokenAccess.READ.name), name='read-token'),
@@ -47,6 +60,7 @@ urlpatterns = [
     path('rotate-image/<path:token>', views.RotateImageView.as_view(), name=views.RotateImageView.name),
     path('save-editor/<path:token>', views.SaveEditorView.as_view(), name=views.SaveEditorView.name),
     path('file/<path:token>', utils.get_raw_file_view().as_view(), name=utils.get_raw_file_view().name),
+    path('file-bundle', views.FileBundleView.as_view(), name=views.FileBundleView.name),
     path('post-processing', views.PostProcessingView.as_view(), name=views.PostProcessingView.name),
     path('duplicate', views.UploadDuplicationView.as_view(), name=views.UploadDuplicationView.name),
     path(
@@ -26,24 +26,35 @@
 import contextlib
 import datetime
 import hashlib
+import mmap
 import os
 import posixpath
+import stat
 import uuid
-from typing import Union, List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Dict, Optional
 from uuid import UUID
 
 from django.conf import settings
 from django.core import signing
 from django.core.exceptions import FieldError
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from osis_document.enums import FileStatus, PostProcessingStatus, PostProcessingType, DocumentExpirationPolicy, \
-    MimeTypeEnums
+    MimeTypeEnums, DocumentError
 from osis_document.exceptions import InvalidPostProcessorAction
-from osis_document.models import Token, Upload, PostProcessAsync
+from osis_document.blob_storage import is_blob_name, is_local_storage
+from osis_document.integrity import keeping_verified_hash
+from osis_document.metadata_cache import invalidate_metadata
+from osis_document.models import Token, Upload, PostProcessAsync, merge_metadata
+from osis_document.upload_handlers import HashedFileMixin
 
 FILENAME_MAX_LENGTH = os.pathconf('/', 'PC_NAME_MAX')
 
+CONFIRM_UPLOADS_MAX_WORKERS = 8
+
 
 def confirm_upload(
     token,
@@ -52,42 +63,120 @@ def confirm_upload(
     metadata=None,
     model_instance=None,
 ) -> UUID:
-    # Verifier si le token n'est pas expiré et existant
-    token = Token.objects.writing_not_expired().filter(token=token).select_related('upload').first()
+    # Verifier si le token n'est pas expiré et existant, et le supprimer en premier pour éviter les réutilisations
+    token = Token.objects.consume_writing([token]).get(token)
     if not token:
         raise FieldError(_("Token non-existent or expired"))
     upload = token.upload
 
-    # Supprimer le token en premier pour éviter les réutilisations
-    token.delete()
     if upload.status == FileStatus.UPLOADED.name:
         return upload.uuid
 
     # Processus de confirmation
-    previous_file_name = upload.file.name
-    new_file_name = generate_filename(
-        instance=model_instance,
-        filename=upload.metadata['name'],
-        upload_to=upload_to,
+    # Les fichiers partagés par le stockage adressé par le contenu ne sont jamais déplacés
+    if not is_blob_name(upload.file.name):
+        move_upload_file(upload, generate_filename(
+            instance=model_instance,
+            filename=upload.metadata['name'],
+            upload_to=upload_to,
+        ))
+
+    Upload.objects.update_metadata(
+        upload.uuid,
+        metadata if metadata and isinstance(metadata, dict) else {},
+        file=upload.file,
+        status=FileStatus.UPLOADED.name,
+        expires_at=DocumentExpirationPolicy.compute_expiration_date(document_expiration_policy),
     )
+    return upload.uuid
+
+
+def confirm_uploads(confirmations: List[Dict]) -> Dict[str, Dict]:
+    """
+    Confirm several uploads at once, each confirmation being a dict with the 'token' of the upload and the arguments of
+    confirm_upload(). Return the result of each confirmation by token: the uuid of the upload, or an error.
+    """
+    results = {
+        confirmation['token']: {'error': DocumentError.get_dict_error(DocumentError.TOKEN_NOT_FOUND.name)}
+        for confirmation in confirmations
+    }
+    # Supprimer les tokens en premier pour éviter les réutilisations
+    tokens = Token.objects.consume_writing(list(results))
+
+    moves = {}
+    for confirmation in confirmations:
+        token = tokens.get(confirmation['token'])
+        if token is None:
+            continue
+        upload = token.upload
+        results[confirmation['token']] = {'uuid': upload.uuid}
+        if upload.status == FileStatus.UPLOADED.name or upload.uuid in moves:
+            continue
+        # The names are computed here, as upload_to may query the database, which the moving threads must not do
+        new_file_name = None
+        if not is_blob_name(upload.file.name):
+            new_file_name = generate_filename(
+                instance=confirmation.get('model_instance'),
+                filename=upload.metadata['name'],
+                upload_to=confirmation.get('upload_to'),
+            )
+        moves[upload.uuid] = (upload, confirmation, new_file_name)
+
+    def move(upload, new_file_name):
+        try:
+            move_upload_file(upload, new_file_name)
+        except FieldError:
+            return False
+        return True
+
+    # The files are moved concurrently, as they may have to be copied to another file system
+    files_to_move = [
+        (upload, new_file_name) for upload, confirmation, new_file_name in moves.values() if new_file_name is not None
+    ]
+    not_moved_uuids = set()
+    if files_to_move:
+        with ThreadPoolExecutor(max_workers=min(len(files_to_move), CONFIRM_UPLOADS_MAX_WORKERS)) as executor:
+            for (upload, new_file_name), is_moved in zip(files_to_move, executor.map(move, *zip(*files_to_move))):
+                if not is_moved:
+                    not_moved_uuids.add(upload.uuid)
+
+    for token, result in results.items():
+        if result.get('uuid') in not_moved_uuids:
+            results[token] = {'error': DocumentError.get_dict_error(DocumentError.UPLOAD_NOT_MOVED.name)}
+
+    confirmed_uploads = []
+    modified_at = timezone.now()
+    for upload, confirmation, new_file_name in moves.values():
+        if upload.uuid in not_moved_uuids:
+            continue
+        metadata = confirmation.get('metadata')
+        upload.metadata = merge_metadata(metadata if metadata and isinstance(metadata, dict) else {})
+        upload.status = FileStatus.UPLOADED.name
+        upload.expires_at = DocumentExpirationPolicy.compute_expiration_date(
+            confirmation.get('document_expiration_policy'),
+        )
+        upload.modified_at = modified_at
+        confirmed_uploads.append(upload)
+
+    Upload.objects.bulk_update(confirmed_uploads, ['file', 'metadata', 'status', 'expires_at', 'modified_at'])
+    invalidate_metadata(*[upload.uuid for upload in confirmed_uploads])
+    return results
+
 
-    # Déplacer le fichier de manière sécurisée
+def move_upload_file(upload: Upload, new_file_name: str):
+    """Move the file of an upload to a new name, without copying it when the storage allows it (see UploadStorage)"""
+    previous_file_name = upload.file.name
+    storage = upload.file.storage
     try:
-        with upload.file.open('rb') as source_file:
-            upload.file.save(name=new_file_name, content=source_file, save=False)
-        upload.file.storage.delete(previous_file_name)
+        with keeping_verified_hash(upload.file):
+            upload.file.name = storage.move(
+                previous_file_name,
+                storage.generate_filename(new_file_name),
+                max_length=upload.file.field.max_length,
+            )
     except Exception as e:
         raise FieldError(_("Failed to move uploaded file"))
 
-    upload.status = FileStatus.UPLOADED.name
-    upload.expires_at = DocumentExpirationPolicy.compute_expiration_date(document_expiration_policy)
-    if metadata and isinstance(metadata, dict):
-        if not upload.metadata:
-            upload.metadata = {}
-        upload.metadata.update(metadata)
-    upload.save()
-    return upload.uuid
-
 
 def get_file_url(token: str) -> str:
     """Get the raw file url given a token"""
@@ -123,11 +212,13 @@ def get_upload_metadata(token: str, upload: Upload, filename: str):
     }
 
 def get_token(uuid, **kwargs):
-    return Token.objects.create(
+    token = Token(
         upload_id=uuid,
         token=signing.dumps(str(uuid)),
         **kwargs,
-    ).token
+    )
+    Token.objects.save_many([token])
+    return token.token
 
 
 def is_uuid(value: Union[str, uuid.UUID]) -> bool:
@@ -139,16 +230,68 @@ def is_uuid(value: Union[str, uuid.UUID]) -> bool:
     return False
 
 
+# Size of the windows mapped in memory, or of the chunks read, while hashing a file (a multiple of the mmap granularity)
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
 def calculate_hash(file):
+    """
+    Return the SHA-256 hash of the content of a file, in constant memory whatever its size. The files stored on the
+    local file system are mapped in memory window by window and hashed without being copied, the other files are read
+    by chunks. The files hashed while they were received (by the ingest upload handler or an upload session) are not
+    read again.
+    """
+    if isinstance(file, HashedFileMixin) and file.hash is not None:
+        # Already hashed while it was received
+        return file.hash
+
     hash = hashlib.sha256()
     if isinstance(file, bytes):
         hash.update(file)
+        return hash.hexdigest()
+
+    if isinstance(file, FieldFile) and is_local_storage(file.storage):
+        with open(file.path, 'rb') as local_file:
+            _update_hash_from_descriptor(hash, local_file.fileno())
+        return hash.hexdigest()
+
+    descriptor = _get_regular_file_descriptor(file)
+    if descriptor is not None:
+        _update_hash_from_descriptor(hash, descriptor)
     else:
-        for chunk in file.chunks():
+        if isinstance(file, FieldFile):
+            file.open('rb')
+        for chunk in file.chunks(chunk_size=HASH_CHUNK_SIZE):
             hash.update(chunk)
     return hash.hexdigest()
 
 
+def _get_regular_file_descriptor(file) -> Optional[int]:
+    """Return the descriptor of the file on disk underlying an opened file (e.g. a temporary uploaded file)"""
+    if isinstance(file, FieldFile):
+        return None
+    file = getattr(file, 'file', file)
+    with contextlib.suppress(AttributeError, OSError, ValueError):
+        descriptor = file.fileno()
+        if stat.S_ISREG(os.fstat(descriptor).st_mode):
+            # Pending writes must reach the disk before the file is mapped in memory
+            file.flush()
+            return descriptor
+    return None
+
+
+def _update_hash_from_descriptor(hash, descriptor: int):
+    size = os.fstat(descriptor).st_size
+    for offset in range(0, size, HASH_CHUNK_SIZE):
+        length = min(HASH_CHUNK_SIZE, size - offset)
+        with mmap.mmap(descriptor, length, access=mmap.ACCESS_READ, offset=offset) as window:
+            if hasattr(window, 'madvise'):
+                window.madvise(mmap.MADV_SEQUENTIAL)
+            # The mapped pages are released when the window is closed, so the resident memory stays bounded
+            with memoryview(window) as view:
+                hash.update(view)
+
+
 def post_process(
         uuid_list: List[UUID],
         post_process_actions: List[str],